@@ -1,158 +1,25 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog, ttk
-import requests, time, os, threading, shutil
-from concurrent.futures import ThreadPoolExecutor
+import os, threading, queue
+from collections import deque
 from datetime import datetime
-import json
-
-# --- Core Logic ---
-def get_live_rate():
-    try: return requests.get("https://open.er-api.com/v6/latest/USD", timeout=2).json()['rates']['THB']
-    except: return 36.50
-
-TARGET_PRESETS = {
-    "Google (Standard)": {
-        "url": "http://google.com/generate_204",
-        "purpose": "stability/latency",
-        "method": "GET",
-    },
-    "HttpBin (Anonymity)": {
-        "url": "https://httpbin.org/get",
-        "purpose": "connectivity + anonymity check",
-        "method": "GET",
-    },
-    "IP-API (Geolocation)": {
-        "url": "http://ip-api.com/json/?fields=status,country,countryCode,city,isp,query",
-        "purpose": "connectivity + geo info",
-        "method": "GET",
-    },
-    "Amazon (Target Test)": {
-        "url": "https://www.amazon.com/robots.txt",
-        "purpose": "anti-bot / blacklist smoke test",
-        "method": "GET",
-    },
-    "Custom URL": {
-        "url": "",
-        "purpose": "custom",
-        "method": "GET",
-    },
-}
-
-def check_anonymous(proxy_url):
-    """ตรวจสอบว่า proxy เป็น anonymous หรือไม่"""
-    try:
-        with requests.Session() as sess:
-            sess.proxies = {"http": proxy_url, "https": proxy_url}
-            # ใช้บริการที่ตรวจสอบ headers
-            resp = sess.get("http://httpbin.org/headers", timeout=5)
-            if resp.status_code == 200:
-                data = resp.json()
-                headers = data.get('headers', {})
-                # ตรวจสอบว่ามี X-Forwarded-For, X-Real-Ip, หรือ Via headers หรือไม่
-                # ถ้ามี headers เหล่านี้ แสดงว่า proxy ไม่ anonymous
-                if 'X-Forwarded-For' in headers or 'X-Real-Ip' in headers or 'Via' in headers:
-                    return False, "Transparent"
-                return True, "Anonymous"
-    except:
-        pass
-    return None, "Unknown"
-
-def get_geo_info(proxy_url):
-    """ตรวจสอบ Geo (ประเทศ) ของ proxy"""
-    try:
-        with requests.Session() as sess:
-            sess.proxies = {"http": proxy_url, "https": proxy_url}
-            # ใช้ ip-api.com (free, no API key needed)
-            resp = sess.get("http://ip-api.com/json/?fields=status,country,countryCode,city,isp", timeout=5)
-            if resp.status_code == 200:
-                data = resp.json()
-                if data.get('status') == 'success':
-                    country = data.get('country', 'Unknown')
-                    country_code = data.get('countryCode', '')
-                    city = data.get('city', '')
-                    isp = data.get('isp', '')
-                    return {
-                        'country': country,
-                        'country_code': country_code,
-                        'city': city,
-                        'isp': isp
-                    }
-    except:
-        pass
-    return {'country': 'Unknown', 'country_code': '', 'city': '', 'isp': ''}
-
-def test_target(sess, target_key, custom_url=""):
-    """
-    ทดสอบ proxy กับ target ที่เลือก
-    return: (ok: bool, status_code: int|None, extra: dict)
-    """
-    preset = TARGET_PRESETS.get(target_key) or TARGET_PRESETS["Google (Standard)"]
-    url = (custom_url or "").strip() if target_key == "Custom URL" else preset.get("url", "")
-    if not url:
-        return False, None, {"error": "empty_target_url"}
-
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
-        "Accept": "*/*",
-        "Connection": "close",
-    }
-    try:
-        resp = sess.get(url, timeout=6, headers=headers, allow_redirects=True)
-        extra = {"target_url": url}
-
-        # Google: 204 is ideal, but <400 is fine
-        if target_key == "Google (Standard)":
-            extra["google_status"] = resp.status_code
-            return (resp.status_code < 400), resp.status_code, extra
-
-        # HttpBin: connectivity here; anonymity checked separately via /headers
-        if target_key == "HttpBin (Anonymity)":
-            extra["httpbin_status"] = resp.status_code
-            return (resp.status_code == 200), resp.status_code, extra
-
-        # IP-API: if success, we can extract geo directly from response
-        if target_key == "IP-API (Geolocation)":
-            extra["ipapi_status"] = resp.status_code
-            if resp.status_code == 200:
-                try:
-                    data = resp.json()
-                    if data.get("status") == "success":
-                        extra.update({
-                            "country": data.get("country", "Unknown"),
-                            "country_code": data.get("countryCode", ""),
-                            "city": data.get("city", ""),
-                            "isp": data.get("isp", ""),
-                            "exit_ip": data.get("query", ""),
-                        })
-                        return True, resp.status_code, extra
-                except:
-                    pass
-            return False, resp.status_code, extra
-
-        # Amazon: very rough anti-bot smoke test (robots.txt is lightweight)
-        if target_key == "Amazon (Target Test)":
-            extra["amazon_status"] = resp.status_code
-            body = (resp.text or "")[:5000].lower()
-            is_captcha = ("captcha" in body) or ("robot check" in body) or ("enter the characters you see" in body)
-            is_block = resp.status_code in (403, 429, 503) or is_captcha
-            extra["amazon_blocked"] = bool(is_block)
-            extra["amazon_signal"] = "captcha" if is_captcha else ("status_block" if resp.status_code in (403, 429, 503) else "ok")
-            return (not is_block and resp.status_code < 400), resp.status_code, extra
-
-        # Custom URL: consider <400 ok
-        extra["custom_status"] = resp.status_code
-        return (resp.status_code < 400), resp.status_code, extra
-    except Exception as e:
-        return False, None, {"target_url": url, "error": str(e)}
-
-def parse_proxy(r):
-    r = r.strip()
-    if not r: return None
-    if r.count(':') >= 4 and "://" in r:
-        proto, rest = r.split("://", 1)
-        p = rest.split(':')
-        return f"{proto}://{p[2]}:{p[3]}@{p[0]}:{p[1]}"
-    return r if "://" in r else f"http://{r}"
+
+from hydra_core import TARGET_PRESETS, TARGET_SHORT, JUDGE_KEY, Checker, result_badges, matrix_badges, matrix_name, parse_matrix, target_url
+from hydra_input import ProxySource
+from hydra_geo import load_resolver
+from hydra_history import History
+from hydra_checkpoint import CHECKPOINT_PATH, Checkpoint
+from hydra_store import ResultStore
+from hydra_export import EXPORT_PATH, ExportSink, render_report
+from hydra_plan import FxRate, PoolModel, plan, sweep, format_duration
+from hydra_metrics import format_bytes
+from hydra_gateway import GATEWAY_PORT, Gateway
+from hydra_judge import unreachable
+
+ENGINE_NAMES = {"Threads": "thread", "AsyncIO": "async"}
+UI_TICK_MS = 100        # how often the main loop drains worker results
+UI_BATCH_MAX = 20000    # results applied per tick at most (rest waits for the next tick)
+PANE_MAX_LINES = 2000   # ALIVE / DEAD panes keep only the most recent lines
 
 class HydraFinal:
     def __init__(self, root):
@@ -163,10 +30,17 @@ class HydraFinal:
         self.is_running = False
         self.is_paused = False
         self.stop_requested = False
-        self.pause_event = threading.Event()
-        self.pause_event.set() 
+        self.checker = None
+        self.proxy_path = "proxies.txt"
+        self.src = None
+        self.geo = None  # exit-IP cache + offline DB, loaded once (off the UI thread) and kept across runs
+        self.history = None  # hydra_history.db: every result recorded, SKIP FRESH reuses recent ones
+        self.ui_queue = queue.SimpleQueue()
+        self.fx = FxRate()  # USD -> THB, cached with a TTL and fetched off the UI thread
         
-        self.alive_list = []
+        self.results = ResultStore()  # alive results, columnar (summaries kept as they arrive)
+        self.export = None  # every result streamed to hydra_results.ndjson; SAVE renders the report from it
+        self.gateway = None  # rotating local proxy over the alive pool (GATEWAY button)
         self.dead_count = 0
         self.total_count = 0
         
@@ -209,12 +83,45 @@ class HydraFinal:
         self.target_combo.bind("<<ComboboxSelected>>", _on_target_change)
         _on_target_change()
 
+        # matrix mode: alive proxies are also probed once against these (e.g. HBN,AMZ or a URL), dead ones never are
+        row2 = tk.Frame(target_frame, bg="#0A0A0A")
+        row2.pack(fill="x", pady=(4, 0))
+        tk.Label(row2, text="+ MATRIX", bg="#0A0A0A", fg="#00FF00", font=("Courier", 9, "bold")).pack(side="left")
+        self.matrix_var = tk.StringVar(value="")
+        self.entry_matrix = tk.Entry(row2, textvariable=self.matrix_var, font=("Courier", 10), bg="#1A1A1A", fg="white", borderwidth=0)
+        self.entry_matrix.pack(side="left", padx=8, fill="x", expand=True)
+
         self.mode = tk.IntVar(value=1)
         self.f_mode = tk.Frame(self.root, bg="#0A0A0A"); self.f_mode.pack(pady=5)
         self.rb_manual = tk.Radiobutton(self.f_mode, text="Manual IP", variable=self.mode, value=1, command=self.toggle_input, bg="#0A0A0A", fg="white", selectcolor="#333")
         self.rb_manual.pack(side="left", padx=10)
         self.rb_file = tk.Radiobutton(self.f_mode, text="From File", variable=self.mode, value=2, command=self.toggle_input, bg="#0A0A0A", fg="white", selectcolor="#333")
         self.rb_file.pack(side="left", padx=10)
+        tk.Label(self.f_mode, text="ENGINE", bg="#0A0A0A", fg="#00FF00", font=("Courier", 9, "bold")).pack(side="left", padx=(20, 4))
+        self.engine_var = tk.StringVar(value="Threads")
+        self.engine_combo = ttk.Combobox(self.f_mode, textvariable=self.engine_var, state="readonly",
+                                         values=["Threads", "AsyncIO"], width=9)
+        self.engine_combo.pack(side="left")
+        # SHARDS > 1: that many checker processes, proxies split by hash (one interpreter tops out on CPU / GIL)
+        tk.Label(self.f_mode, text="SHARDS", bg="#0A0A0A", fg="#00FF00", font=("Courier", 9, "bold")).pack(side="left", padx=(10, 4))
+        self.shards_var = tk.StringVar(value="1")
+        self.spin_shards = tk.Spinbox(self.f_mode, from_=1, to=max(1, os.cpu_count() or 1) * 2, textvariable=self.shards_var,
+                                      width=3, bg="#202020", fg="white", buttonbackground="#333")
+        self.spin_shards.pack(side="left")
+        self.prescreen_var = tk.BooleanVar(value=True)
+        self.cb_prescreen = tk.Checkbutton(self.f_mode, text="PRE-SCREEN", variable=self.prescreen_var, bg="#0A0A0A", fg="white", selectcolor="#333")
+        self.cb_prescreen.pack(side="left", padx=10)
+        # ADAPTIVE: 'T' is only the starting concurrency, hydra_adapt moves it to the knee during the run
+        self.adaptive_var = tk.BooleanVar(value=False)
+        self.cb_adaptive = tk.Checkbutton(self.f_mode, text="ADAPTIVE", variable=self.adaptive_var, bg="#0A0A0A", fg="white", selectcolor="#333")
+        self.cb_adaptive.pack(side="left", padx=10)
+        # FRUGAL: HEAD / Range / capped bodies where the target allows (pay-per-GB proxies)
+        self.frugal_var = tk.BooleanVar(value=False)
+        self.cb_frugal = tk.Checkbutton(self.f_mode, text="FRUGAL", variable=self.frugal_var, bg="#0A0A0A", fg="white", selectcolor="#333")
+        self.cb_frugal.pack(side="left", padx=10)
+        self.incremental_var = tk.BooleanVar(value=False)
+        self.cb_incremental = tk.Checkbutton(self.f_mode, text="SKIP FRESH", variable=self.incremental_var, bg="#0A0A0A", fg="white", selectcolor="#333")
+        self.cb_incremental.pack(side="left", padx=10)
 
         self.manual_container = tk.Frame(self.root, bg="#0A0A0A")
         tk.Label(self.manual_container, text="▼ INSERT PROXY URL HERE ▼", font=("Tahoma", 8, "bold"), bg="#0A0A0A", fg="#00FF00").pack()
@@ -232,6 +139,8 @@ class HydraFinal:
         self.alive_box = tk.Text(f_alive, height=10, width=60, bg="#050505", fg="#00FF00", font=("Consolas", 8), borderwidth=1, relief="flat")
         self.alive_box.pack(fill="both", expand=True)
         tk.Button(f_alive, text="💾 SAVE & LOG RESULT", command=self.save_alive_to_file, bg="#004400", fg="white", font=("Tahoma", 8, "bold")).pack(fill="x", pady=2)
+        self.btn_gateway = tk.Button(f_alive, text=f"🔀 GATEWAY 127.0.0.1:{GATEWAY_PORT} (OFF)", command=self.toggle_gateway, bg="#333", fg="white", font=("Tahoma", 8, "bold"))
+        self.btn_gateway.pack(fill="x", pady=2)
 
         f_dead = tk.Frame(log_frame, bg="#0A0A0A")
         f_dead.pack(side="right", fill="both", expand=True, padx=5)
@@ -255,7 +164,7 @@ class HydraFinal:
         self.lbl_status.pack()
 
         self.ins = {}
-        fields = [("T", "20", "THREADS"), ("R", "2", "RPC"), ("L", "0.000", "LATENCY"), ("D", "1.0", "DATA GB"), ("P", "5.0", "PRICE $")]
+        fields = [("T", "20", "THREADS"), ("R", "2", "RPC"), ("L", "0.000", "LATENCY"), ("K", "5", "PAYLOAD KB"), ("D", "1.0", "DATA GB"), ("P", "5.0", "PRICE $")]
         for k, v, en in fields:
             f = tk.Frame(self.root, bg="#0A0A0A", pady=1); f.pack(fill="x", padx=50)
             tk.Label(f, text=en, bg="#0A0A0A", fg="#00FF00", font=("Courier", 9)).pack(side="left")
@@ -276,6 +185,11 @@ class HydraFinal:
         self.entry_manual.config(state=state); self.btn_upload.config(state=state)
         self.btn_check.config(state=state)
         self.target_combo.config(state=("disabled" if locked else "readonly"))
+        self.engine_combo.config(state=("disabled" if locked else "readonly"))
+        self.spin_shards.config(state=state)
+        self.cb_prescreen.config(state=state); self.cb_incremental.config(state=state); self.cb_adaptive.config(state=state)
+        self.cb_frugal.config(state=state)
+        self.entry_matrix.config(state=state)
         if self.target_var.get() == "Custom URL":
             self.entry_custom_target.config(state=("disabled" if locked else "normal"))
         else:
@@ -285,17 +199,20 @@ class HydraFinal:
 
     def toggle_pause(self):
         if not self.is_paused:
-            self.is_paused = True; self.pause_event.clear()
+            self.is_paused = True
+            if self.checker: self.checker.pause()
             self.btn_pause.config(text="RESUME", bg="#005500")
             self.lbl_status.config(text="PAUSED", fg="orange")
             self.lock_ui(False); self.btn_check.config(state="disabled")
         else:
-            self.is_paused = False; self.pause_event.set()
+            self.is_paused = False
+            if self.checker: self.checker.resume()
             self.btn_pause.config(text="PAUSE", bg="#444"); self.lock_ui(True)
 
     def stop_check(self):
         if messagebox.askyesno("STOP", "ยกเลิกงานที่เหลือทั้งหมดใช่หรือไม่?"):
-            self.stop_requested = True; self.pause_event.set()
+            self.stop_requested = True
+            if self.checker: self.checker.stop()
             self.lbl_status.config(text="STOPPING...", fg="red")
             self.btn_stop.config(state="disabled"); self.btn_pause.config(state="disabled")
 
@@ -309,272 +226,250 @@ class HydraFinal:
 
     def upload_file(self):
         p = filedialog.askopenfilename(filetypes=[("Text", "*.txt")])
-        if p: shutil.copy(p, "proxies.txt"); self.lbl_status.config(text=f"Loaded: {os.path.basename(p)}", fg="#00FF00")
+        # read in place (streamed by ProxySource), no copy of multi-GB lists
+        if p: self.proxy_path = p; self.lbl_status.config(text=f"Loaded: {os.path.basename(p)}", fg="#00FF00")
 
     def save_alive_to_file(self):
-        if not self.alive_list and self.dead_count == 0:
+        if not len(self.results) and self.dead_count == 0:
             messagebox.showwarning("Warning", "ไม่มีข้อมูลสำหรับบันทึก!")
             return
         f = filedialog.asksaveasfile(mode='w', defaultextension=".txt", filetypes=[("Text files", "*.txt")])
         if f:
-            f.write("--- ALIVE PROXIES LIST ---\n")
-            f.write(f"{'Proxy':<50} {'Latency':<10} {'Target':<18} {'T-OK':<5} {'T-Status':<8} {'Anonymous':<12} {'Country':<20} {'City':<20} {'ISP':<30} {'ExitIP':<16} {'AMZ':<8}\n")
-            f.write("-" * 150 + "\n")
-            for item in self.alive_list:
-                if len(item) >= 3:
-                    p, avg, data = item[0], item[1], item[2]
-                    anon_str = "Yes" if data.get('anonymous') else ("No" if data.get('anonymous') is False else "Unknown")
-                    country = data.get('country', 'Unknown')
-                    city = data.get('city', '')
-                    isp = data.get('isp', '')
-                    tgt = data.get("target", "")
-                    tok = "Y" if data.get("target_ok") is True else ("N" if data.get("target_ok") is False else "")
-                    tsc = str(data.get("target_status") or "")
-                    exit_ip = data.get("exit_ip", "") or ""
-                    amz = ""
-                    if data.get("target") == "Amazon (Target Test)":
-                        if data.get("amazon_blocked") is True:
-                            amz = "BLOCKED"
-                        elif data.get("amazon_blocked") is False:
-                            amz = "OK"
-                    f.write(f"{p:<50} {avg:.3f}s{'':<5} {tgt:<18} {tok:<5} {tsc:<8} {anon_str:<12} {country:<20} {city:<20} {isp:<30} {exit_ip:<16} {amz:<8}\n")
-                else:
-                    # สำหรับข้อมูลเก่าที่ไม่มี geo info
-                    p, avg = item[0], item[1]
-                    f.write(f"{p:<50} {avg:.3f}s{'':<5} {'':<18} {'':<5} {'':<8} {'Unknown':<12} {'Unknown':<20} {'':<20} {'':<30} {'':<16} {'':<8}\n")
-            f.write("\n" + "="*40 + "\n")
-            f.write(f"HYDRA  - SESSION LOG SUMMARY\n")
-            f.write(f"DATE: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"STATUS: {'PAUSED' if self.is_paused else ('COMPLETED' if not self.is_running else 'RUNNING')}\n")
-            f.write(f"TOTAL CHECKED: {self.total_count}\n")
-            f.write(f"ALIVE: {len(self.alive_list)}\n")
-            f.write(f"DEAD: {self.dead_count}\n")
-            f.write(f"TARGET: {self.target_var.get()}\n")
-            if self.target_var.get() == "Custom URL":
-                f.write(f"CUSTOM URL: {self.custom_target_var.get().strip()}\n")
-            
-            # สรุปข้อมูล Geo
-            if self.alive_list and len(self.alive_list[0]) >= 3:
-                countries = {}
-                anonymous_count = 0
-                for item in self.alive_list:
-                    if len(item) >= 3:
-                        data = item[2]
-                        country = data.get('country', 'Unknown')
-                        countries[country] = countries.get(country, 0) + 1
-                        if data.get('anonymous'):
-                            anonymous_count += 1
-                
-                f.write("\n" + "="*40 + "\n")
-                f.write("GEO SUMMARY:\n")
-                for country, count in sorted(countries.items(), key=lambda x: x[1], reverse=True):
-                    f.write(f"  {country}: {count} proxies\n")
-                f.write(f"\nAnonymous Proxies: {anonymous_count}/{len(self.alive_list)}\n")
-            
-            f.write("="*40 + "\n")
+            # rendered from the streamed export in one pass: nothing has to be held in memory
+            if self.export is not None: self.export.flush()
+            status = 'PAUSED' if self.is_paused else ('COMPLETED' if not self.is_running else 'RUNNING')
+            custom = self.custom_target_var.get().strip() if self.target_var.get() == "Custom URL" else ""
+            render_report(self.export.path, f, status, self.target_var.get(), custom)
             f.close()
             messagebox.showinfo("Success", "บันทึกเรียบร้อยแล้ว!")
 
+    def toggle_gateway(self):
+        """เปิด / ปิด proxy ในเครื่อง (HTTP CONNECT + SOCKS5) ที่กระจาย connection ไปยัง proxy ที่ alive"""
+        if self.gateway is not None:
+            gw, self.gateway = self.gateway, None
+            gw.stop()
+            self.btn_gateway.config(text=f"🔀 GATEWAY 127.0.0.1:{GATEWAY_PORT} (OFF)", bg="#333")
+            return
+        gw = Gateway("127.0.0.1", GATEWAY_PORT)
+        gw.load(self.results)  # alive so far; the running check keeps adding (and dropping) upstreams
+        try:
+            gw.start()
+        except OSError as e:
+            messagebox.showerror("Gateway", f"127.0.0.1:{GATEWAY_PORT}: {e}"); return
+        self.gateway = gw
+        self.btn_gateway.config(bg="#005555")
+        self.gateway_tick()
+
+    def gateway_tick(self):
+        if self.gateway is None: return
+        st = self.gateway.stats()
+        self.btn_gateway.config(text=f"🔀 GATEWAY {st['listen']} (ON) | {st['rps']:,.1f} conn/s | "
+                                     f"{st['mbps_down'] + st['mbps_up']:.2f} Mbps | {st['upstreams']} upstreams")
+        self.root.after(1000, self.gateway_tick)
+
     def start_check(self):
+        if self.mode.get() == 1:
+            manual = self.entry_manual.get().strip()
+            src = ProxySource([manual]) if manual else None
+            if src: src.total = 1
+        else:
+            src = ProxySource(self.proxy_path) if os.path.exists(self.proxy_path) else None
+        if src is None or not src.total:
+            return
+        try:
+            matrix = parse_matrix(self.matrix_var.get())
+        except ValueError as e:
+            messagebox.showerror("Matrix", str(e)); return
+        if self.target_var.get() == JUDGE_KEY:
+            if src.path:
+                with open(src.path, encoding="utf-8", errors="replace") as f:
+                    problem = unreachable(target_url(JUDGE_KEY), f)
+            else:
+                problem = unreachable(target_url(JUDGE_KEY), src.src)
+            if problem:
+                messagebox.showerror("Judge", problem); return
+        self.src = src
+        checkpoint = None
+        if src.path:
+            # file runs checkpoint their position + results; a crashed / stopped run can pick up where it was
+            checkpoint = Checkpoint(CHECKPOINT_PATH, src.path, target=" ".join([target_url(self.target_var.get(), self.custom_target_var.get())]
+                                                                               + [matrix_name(*m) for m in matrix]))
+            low = checkpoint.stored()
+            if low is not None and not messagebox.askyesno("Resume", f"พบ checkpoint ของไฟล์นี้ (เสร็จแล้ว {low:,} บรรทัด)\nทำต่อจากเดิมไหม? (No = เริ่มใหม่)"):
+                checkpoint.discard()
+        # same Checker the CLI uses; THREADS = worker threads (Threads) or in-flight checks (AsyncIO)
+        self.checker = Checker(self.target_var.get(), self.custom_target_var.get(), concurrency=int(self.ins['T'].get()),
+                               engine=ENGINE_NAMES.get(self.engine_var.get(), "thread"),
+                               prescreen=self.prescreen_var.get(), incremental=self.incremental_var.get(),
+                               checkpoint=checkpoint, shards=int(self.shards_var.get() or 1), matrix=matrix,
+                               adaptive=self.adaptive_var.get(), frugal=self.frugal_var.get())
+
         self.is_running = True; self.is_paused = False; self.stop_requested = False
-        self.pause_event.set()
         self.btn_pause.config(state="normal", text="PAUSE", bg="#444")
         self.btn_stop.config(state="normal")
-        self.alive_list = []; self.dead_count = 0; self.total_count = 0
+        self.results = ResultStore(); self.dead_count = 0; self.total_count = 0
+        if self.export is not None: self.export.close()
+        self.export = ExportSink(EXPORT_PATH)
         self.lbl_alive_count.config(text="ALIVE: 0")
         self.lbl_dead_count.config(text="DEAD: 0")
         self.ins['L'].config(state='normal')
         self.ins['L'].configure(bg="#202020", fg="white") # Reset color
         self.ins['L'].config(state='readonly')
+        self.ins['K'].configure(bg="#1A1A1A", fg="white")
         self.lock_ui(True)
+        self.prog_container.pack(fill="x", before=self.lbl_status)
+        self.alive_box.delete('1.0', tk.END); self.dead_box.delete('1.0', tk.END)
+        self.progress["value"] = 0; self.progress["maximum"] = src.total
         threading.Thread(target=self.worker, daemon=True).start()
+        self.root.after(UI_TICK_MS, self.drain_ui)
 
     def worker(self):
-        self.prog_container.pack(fill="x", before=self.lbl_status)
-        self.alive_box.delete('1.0', tk.END); self.dead_box.delete('1.0', tk.END)
-        m = self.mode.get()
-        raw = [self.entry_manual.get()] if m==1 else (open("proxies.txt").read().splitlines() if os.path.exists("proxies.txt") else [])
-        raw = [r for r in raw if r.strip()]
-        if not raw: 
-            self.lock_ui(False); self.btn_pause.config(state="disabled")
-            self.btn_stop.config(state="disabled"); self.prog_container.pack_forget()
-            return
-        self.progress["value"] = 0; self.progress["maximum"] = len(raw)
-        checked = 0
-        target_key = self.target_var.get()
-        custom_url = self.custom_target_var.get().strip()
-        target_short = {
-            "Google (Standard)": "GGL",
-            "HttpBin (Anonymity)": "HBN",
-            "IP-API (Geolocation)": "GEO",
-            "Amazon (Target Test)": "AMZ",
-            "Custom URL": "CUS",
-        }.get(target_key, "TGT")
-
-        with ThreadPoolExecutor(max_workers=int(self.ins['T'].get())) as exe:
-            def check(p):
-                nonlocal checked
-                if self.stop_requested: return
-                self.pause_event.wait()
-                if self.stop_requested: return
-                u = parse_proxy(p); s = []
-                now = datetime.now().strftime("%H:%M:%S")
-                try:
-                    with requests.Session() as sess:
-                        sess.proxies = {"http": u, "https": u}
-                        # warm up: nothing, but keep consistent session
-                        for _ in range(3):
-                            if self.stop_requested: break
-                            try:
-                                st = time.time()
-                                ok, _, _ = test_target(sess, target_key, custom_url=custom_url)
-                                if ok:
-                                    s.append(time.time()-st)
-                            except: break
-                except: pass
-                checked += 1; self.total_count = checked
-                if not self.stop_requested:
-                    if len(s)==3:
-                        avg = sum(s)/3
-                        # ตรวจสอบ anonymous / geo ตาม target ที่เลือก
-                        is_anon, anon_type = (None, "Unknown")
-                        geo_info = {'country': 'Unknown', 'country_code': '', 'city': '', 'isp': ''}
-                        target_info = {}
-                        try:
-                            with requests.Session() as sess2:
-                                sess2.proxies = {"http": u, "https": u}
-                                # target-specific enrichment
-                                ok2, sc2, extra2 = test_target(sess2, target_key, custom_url=custom_url)
-                                target_info = {"target": target_key, "target_ok": ok2, "target_status": sc2}
-                                target_info.update(extra2 if isinstance(extra2, dict) else {})
-
-                                if target_key == "HttpBin (Anonymity)":
-                                    is_anon, anon_type = check_anonymous(u)
-                                elif target_key == "IP-API (Geolocation)":
-                                    # prefer parsed data from IP-API call if present; fallback to old function
-                                    if extra2 and extra2.get("country") and extra2.get("country") != "Unknown":
-                                        geo_info = {
-                                            "country": extra2.get("country", "Unknown"),
-                                            "country_code": extra2.get("country_code", ""),
-                                            "city": extra2.get("city", ""),
-                                            "isp": extra2.get("isp", ""),
-                                        }
-                                    else:
-                                        geo_info = get_geo_info(u)
-                                elif target_key == "Amazon (Target Test)":
-                                    # also keep basic geo for display
-                                    geo_info = get_geo_info(u)
-                                else:
-                                    # default: keep both checks like before (useful overall)
-                                    is_anon, anon_type = check_anonymous(u)
-                                    geo_info = get_geo_info(u)
-                        except:
-                            pass
-
-                        country = geo_info.get('country', 'Unknown')
-                        country_code = geo_info.get('country_code', '')
-                        city = geo_info.get('city', '')
-                        
-                        # สร้างข้อมูลสำหรับแสดงผล
-                        anon_status = "ANON" if is_anon else ("TRANS" if anon_type == "Transparent" else "UNK")
-                        country_display = f"{country} ({country_code})" if country_code else country
-                        if city:
-                            country_display += f" - {city}"
-                        
-                        # เก็บข้อมูลทั้งหมด
-                        proxy_data = {
-                            'proxy': p,
-                            'latency': avg,
-                            'anonymous': is_anon,
-                            'anon_type': anon_type,
-                            'country': country,
-                            'country_code': country_code,
-                            'city': city,
-                            'isp': geo_info.get('isp', '')
-                        }
-                        proxy_data.update(target_info)
-                        self.alive_list.append((p, avg, proxy_data))
-                        
-                        # แสดงผลในกล่องข้อความ
-                        tgt_badge = target_short
-                        if target_key == "Amazon (Target Test)" and isinstance(target_info, dict):
-                            if target_info.get("amazon_blocked") is True:
-                                tgt_badge = f"{target_short}:BLK"
-                            elif target_info.get("target_ok") is True:
-                                tgt_badge = f"{target_short}:OK"
-                        elif isinstance(target_info, dict) and target_info.get("target_ok") is True:
-                            tgt_badge = f"{target_short}:OK"
-                        elif isinstance(target_info, dict) and target_info.get("target_ok") is False:
-                            tgt_badge = f"{target_short}:NO"
-
-                        display_text = f"[{now}] [{tgt_badge}] [{anon_status}] {country_display} | {avg:.3f}s\n  {p}\n"
-                        self.alive_box.insert(tk.END, display_text)
-                        self.lbl_alive_count.config(text=f"ALIVE: {len(self.alive_list)}")
-                    else:
-                        self.dead_count += 1
-                        self.dead_box.insert(tk.END, f"[{now}] [DEAD] {p}\n")
-                        self.lbl_dead_count.config(text=f"DEAD: {self.dead_count}")
-                    self.alive_box.see(tk.END); self.dead_box.see(tk.END)
-                    self.progress["value"] = checked
-                    self.lbl_status.config(text=f"Checking ({target_short}): {checked}/{len(raw)}")
-            list(exe.map(check, raw))
+        # no Tk calls from here: results go through ui_queue and drain_ui applies them on the main loop
+        def on_result(p, avg, proxy_data):
+            self.export.write(p, avg, proxy_data)
+            gw = self.gateway
+            if gw is not None: gw.update(p, avg, proxy_data)
+            self.ui_queue.put((datetime.now().strftime("%H:%M:%S"), p, avg, proxy_data))
+        try:
+            if self.geo is None: self.geo = load_resolver()
+            if self.history is None: self.history = History()
+            self.history.fresh = 0
+            self.checker.geo = self.geo; self.checker.history = self.history
+            self.checker.run(self.src, on_result)
+        finally:
+            self.ui_queue.put(None)  # run finished
+
+    def append_capped(self, box, text, max_lines):
+        """เขียนต่อท้าย Text แล้วตัดบรรทัดเก่าทิ้ง ให้เหลือไม่เกิน max_lines (UI ไม่โตตามขนาด run)"""
+        box.insert(tk.END, text)
+        excess = int(box.index("end-1c").split(".")[0]) - max_lines
+        if excess > 0:
+            box.delete("1.0", f"{excess + 1}.0")
+        box.see(tk.END)
+
+    def drain_ui(self):
+        target_key = self.checker.target_key
+        alive_lines, dead_lines, finished = deque(maxlen=PANE_MAX_LINES // 2), deque(maxlen=PANE_MAX_LINES), False
+        for _ in range(UI_BATCH_MAX):
+            try:
+                item = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                finished = True; break
+            now, p, avg, proxy_data = item
+            if avg is not None:
+                self.results.add(p, avg, proxy_data)
+                # แสดงผลในกล่องข้อความ
+                tgt_badge, anon_status, country_display = result_badges(target_key, proxy_data)
+                grid = matrix_badges(proxy_data)
+                alive_lines.append(f"[{now}] [{tgt_badge}] [{anon_status}] {country_display} | {avg:.3f}s (hs {proxy_data.get('handshake', 0):.3f}s)\n  {p}\n"
+                                   + (f"  {grid}\n" if grid else ""))
+            else:
+                self.dead_count += 1
+                dead_lines.append(f"[{now}] [DEAD] {p}\n")
+
+        # one insert + one label/progress update per tick, however many results arrived
+        if alive_lines:
+            self.append_capped(self.alive_box, "".join(alive_lines), PANE_MAX_LINES)
+            self.lbl_alive_count.config(text=f"ALIVE: {len(self.results)}")
+        if dead_lines:
+            self.append_capped(self.dead_box, "".join(dead_lines), PANE_MAX_LINES)
+            self.lbl_dead_count.config(text=f"DEAD: {self.dead_count}")
+        self.total_count = self.checker.checked
+        done = self.checker.checked + self.src.skipped
+        self.progress["value"] = done
+        if not (self.is_paused or self.stop_requested):
+            self.lbl_status.config(text=f"Checking ({TARGET_SHORT.get(target_key, 'TGT')}): {done}/{self.src.total} (dup: {self.src.duplicates}, reused: {self.history.fresh if self.history else 0})"
+                                       + (f" | {self.checker.adapt.status()}" if self.checker.adapt is not None else ""))
+
+        if finished:
+            self.finish_run()
+        else:
+            self.root.after(UI_TICK_MS, self.drain_ui)
 
+    def finish_run(self):
         self.prog_container.pack_forget(); self.is_running = False
+        self.export.flush()
         self.lock_ui(False); self.btn_pause.config(state="disabled"); self.btn_stop.config(state="disabled")
-        if self.alive_list and not self.stop_requested:
-            self.alive_list.sort(key=lambda x: x[1])
+        if len(self.results) and not self.stop_requested:
             self.ins['L'].config(state='normal')
-            self.ins['L'].delete(0, tk.END); self.ins['L'].insert(0, f"{self.alive_list[0][1]:.3f}")
+            # median of the whole alive pool (the planner itself uses the full distribution)
+            self.ins['L'].delete(0, tk.END); self.ins['L'].insert(0, f"{self.results.latency_hist.quantile(0.5):.3f}")
             # เปลี่ยนเป็นสีเขียวและตัวหนาให้อ่านง่าย
             self.ins['L'].configure(bg="#004400", fg="#00FF00") 
             self.ins['L'].config(state='readonly')
+            if self.checker.traffic.requests:
+                # measured bytes per request of this run instead of the 5KB guess (still editable)
+                self.ins['K'].delete(0, tk.END); self.ins['K'].insert(0, f"{self.checker.traffic.per_request() / 1024:.2f}")
+                self.ins['K'].configure(bg="#004400", fg="#00FF00")
             self.calculate()
             
-            # แสดงสรุปข้อมูล Geo
-            if len(self.alive_list) > 0 and len(self.alive_list[0]) >= 3:
-                countries = {}
-                anonymous_count = 0
-                for item in self.alive_list:
-                    if len(item) >= 3:
-                        data = item[2]
-                        country = data.get('country', 'Unknown')
-                        countries[country] = countries.get(country, 0) + 1
-                        if data.get('anonymous'):
-                            anonymous_count += 1
-                top_countries = ", ".join([f"{k}({v})" for k, v in sorted(countries.items(), key=lambda x: x[1], reverse=True)[:3]])
-                self.lbl_status.config(text=f"DONE: {len(self.alive_list)} ALIVE | ANON: {anonymous_count} | Top: {top_countries}", fg="#00FF00")
-            else:
-                self.lbl_status.config(text=f"DONE: {len(self.alive_list)} ALIVE", fg="#00FF00")
+            # แสดงสรุปข้อมูล Geo (country / anonymous นับไว้แล้วระหว่าง run)
+            top_countries = ", ".join(f"{k}({v})" for k, v in self.results.top_countries(3))
+            self.lbl_status.config(text=f"DONE: {len(self.results)} ALIVE | ANON: {self.results.anon_count} | Top: {top_countries}{self.latency_summary()}", fg="#00FF00")
         else:
-            self.lbl_status.config(text="STOPPED" if self.stop_requested else "FAILED", fg="orange")
+            # nothing alive: say why (dead proxies by error class), not just FAILED
+            errors = self.checker.metrics.snapshot()["errors"] if self.checker else {}
+            top_errors = ", ".join(f"{k}({v})" for k, v in list(errors.items())[:3])
+            self.lbl_status.config(text=("STOPPED" if self.stop_requested else "FAILED")
+                                   + (f" | DEAD by error: {top_errors}" if top_errors else ""), fg="orange")
+
+    def latency_summary(self):
+        """p50 / p99 ของ latency ทั้ง run (จาก histogram ของ Checker)"""
+        hist = self.checker.latency_hist if self.checker else None
+        if not hist: return ""
+        return f" | p50 {hist.quantile(0.5):.3f}s p99 {hist.quantile(0.99):.3f}s"
+
+    def pool_model(self, latency):
+        """alive pool ของ run ล่าสุด (latency / success / p95 ทุกตัว) หรือ proxy สมมติ 1 ตัวจากช่อง LATENCY"""
+        if len(self.results):
+            return PoolModel(self.results.pool_rows()), None
+        return PoolModel([(latency, 1.0, None)]), float("inf")  # no pool measured: no per-proxy cap
 
     def calculate(self):
         try:
-            t, r, l, d, p = [float(self.ins[k].get()) for k in 'TRLDP']
-            rate = get_live_rate()
-            
-            # --- Logic คำนวณความเร็ว ---
-            rps = ((t * r) / l) * 0.8 if l > 0 else 0
-            mb_s = (rps * 5) / 1024 # ยิงเฉลี่ยครั้งละ 5KB
-            
-            # --- Logic คำนวณระยะเวลา (Duration) ---
-            total_seconds = (d * 1024) / mb_s if mb_s > 0 else 0
-            if total_seconds > 3600: dur = f"{total_seconds/3600:.2f} Hours"
-            elif total_seconds > 60: dur = f"{total_seconds/60:.2f} Mins"
-            else: dur = f"{total_seconds:.2f} Secs"
-            
-            # --- ข้อแนะนำเพิ่มเติม: จำนวน Proxy ที่แนะนำ (ไม่ให้ IP ร้อนเกินไป) ---
-            # คำนวณจาก RPS / 2 (สมมติ 1 proxy รับได้ 2 request/sec เพื่อความปลอดภัย)
-            suggest_proxies = max(1, int(rps / 2))
-
-            self.res_label.config(text=(
-                f"ESTIMATED RPS: {rps:,.0f}\n"
-                f"BW: {mb_s*8:.2f} Mbps\n"
-                f"DURATION: {dur}\n"
-                f"SUGGEST PROXIES: {suggest_proxies} IPs\n"
-                f"COST: ฿{d*p*rate:,.2f}"
-            ))
-        except: pass
+            t, r, l, kb, d, p = [float(self.ins[k].get()) for k in 'TRLKDP']
+            t = int(t)
+            rate = self.fx.get()  # cached; a stale rate is refreshed in the background
+            if self.fx.fetching:
+                self.root.after(250, self.calculate)  # redraw once the fresh rate lands
+            pool, cap = self.pool_model(l)
+            safe = {"safe_rps": cap} if cap else {}
+
+            # --- RPS / BW / DURATION / COST จากการกระจายของทั้ง pool (รวม tail latency + success ratio) ---
+            res = plan(pool, t, r, kb, d, p, rate, **safe)
+            lines = [
+                f"ESTIMATED RPS: {res['rps']:,.0f}  (pool {res['pool']}, limited by {res['bound']})",
+                f"BW: {res['mb_s']*8:.2f} Mbps",
+                f"DURATION: {format_duration(res['seconds'])}",
+                f"SUGGEST PROXIES: {res['suggest']} IPs",
+                f"COST: ฿{res['cost']:,.2f}  (1$ = ฿{rate:.2f}{'' if self.fx.live else ' offline'})",
+            ]
+            tr = self.checker.traffic if self.checker else None
+            if tr is not None and tr.requests:
+                # what the check itself cost through the proxies, at the same PRICE $ / GB
+                lines.append(f"CHECK TRAFFIC: {format_bytes(tr.total)} in {tr.requests:,} requests "
+                             f"({format_bytes(tr.per_request())}/req) = ฿{tr.total / 1024 ** 3 * p * rate:,.4f}")
+            if self.gateway is not None:
+                # what the gateway actually pushes over the pool, next to the estimate
+                st = self.gateway.stats()
+                lines.append(f"MEASURED (gateway): {st['rps']:,.1f} conn/s | BW {st['mbps_down'] + st['mbps_up']:.2f} Mbps | "
+                             f"{st['routed']:,} routed, {st['failed']:,} failed over {st['upstreams']} upstreams")
+
+            # --- sweep: threads x pool size (RPS) แล้ว payload (duration) ---
+            threads = sorted({max(1, t // 2), t, t * 2, t * 4})
+            sizes = sorted({max(1, len(pool) // 4), max(1, len(pool) // 2), len(pool)})
+            grid = {(row["threads"], row["pool"]): row["rps"]
+                    for row in sweep(pool, threads, sizes, (kb,), r, d, p, rate, **safe)}
+            lines.append("THREADS \\ POOL " + "".join(f"{k:>9}" for k in sizes))
+            for n in threads:
+                lines.append(f"{n:>14} " + "".join(f"{grid[(n, k)]:>9,.0f}" for k in sizes))
+            lines.append("PAYLOAD " + " | ".join(f"{row['payload_kb']:g}KB {format_duration(row['seconds'])}"
+                                                 for row in sweep(pool, (t,), (), (1, kb, kb * 10), r, d, p, rate, **safe)))
+            self.res_label.config(text="\n".join(lines))
+        except (ValueError, ZeroDivisionError) as e:
+            self.res_label.config(text=f"INPUT ERROR: {e}")  # half-typed field etc.: shown instead of a stale result
 
 if __name__ == "__main__":
     root = tk.Tk(); HydraFinal(root); root.mainloop()
\ No newline at end of file
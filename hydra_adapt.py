@@ -0,0 +1,138 @@
+import asyncio, threading, time
+from collections import deque
+
+from hydra_metrics import median
+
+# --- Adaptive concurrency: AIMD on in-flight probes from completions/s, timeout share and latency inflation ---
+# slow start (x2 per window) until the first sign of congestion, then +step per window and x0.7 on congestion
+
+ADAPT_WINDOW = 2.0          # seconds per decision ...
+ADAPT_MIN_SAMPLES = 20      # ... and at least this many finished probes in it
+ADAPT_BACKOFF = 0.7         # multiplicative decrease on congestion
+ADAPT_STEP = 0.05           # additive increase per window after slow start (share of the limit, >= 1)
+ADAPT_LAT_INFLATION = 1.5   # window median latency above baseline x this = our own queueing
+ADAPT_TIMEOUT_MARGIN = 0.10 # timeout share above baseline + this = our own congestion (dead proxies time out anyway)
+ADAPT_PLATEAU = 1.05        # a bigger limit must buy this much more completions/s, else it is past the knee
+ADAPT_BOUND = 0.9           # the window counts as limit-bound when in-flight reached this share of the limit
+ADAPT_DRIFT = 1.02          # baselines creep up per window, so a slower stretch of the list is not read as congestion
+ADAPT_MAX = {"thread": 500, "async": 5000}  # default ceiling per engine
+ADAPT_LOG = 50              # changes kept for display
+
+class AdaptiveLimit:
+    """
+    เพดาน probe ที่วิ่งพร้อมกัน ปรับเองทุก window: ช่วงแรกเพิ่มเท่าตัว (slow start) จนเจอสัญญาณ แล้ว +step / x0.7 (AIMD)
+    สัญญาณว่าเราเองทำให้ช้า: timeout มากกว่า baseline, latency กลางของตัวที่ผ่านพองเกิน baseline, เพิ่มแล้ว completions/s ไม่เพิ่ม
+    acquire() / release() สำหรับ thread engine, acquire_async() สำหรับ async engine (release ใช้ร่วมกัน)
+    """
+    def __init__(self, start, lo=1, hi=ADAPT_MAX["thread"], window=ADAPT_WINDOW, on_change=None):
+        self.lo, self.hi = max(1, int(lo)), max(1, int(hi))
+        self.limit = min(self.hi, max(self.lo, int(start)))
+        self.window = window
+        self.on_change = on_change  # on_change(old, new, reason)
+        self.inflight = 0
+        self.reason = "start"
+        self.log = deque(maxlen=ADAPT_LOG)  # (time, old, new, reason)
+        self.slow_start = True
+        self.lat_base = self.timeout_base = None
+        self.last_rate = None
+        self._grew = False  # the previous window raised the limit
+        self._cond = threading.Condition()
+        self._waiters = deque()  # async engine: futures waiting for a slot
+        self._reset_window()
+
+    def _reset_window(self):
+        self._t0 = time.monotonic()
+        self._done = self._timeouts = 0
+        self._lat = []
+        self._peak = self.inflight
+
+    def status(self):
+        return f"C={self.limit} ({self.reason})"
+
+    # --- gate ---
+
+    def acquire(self, stopped=lambda: False):
+        """รอ slot (thread engine) - False ถ้า STOP ระหว่างรอ"""
+        with self._cond:
+            while self.inflight >= self.limit:
+                if stopped(): return False
+                self._cond.wait(0.25)
+            self.inflight += 1
+            self._peak = max(self._peak, self.inflight)
+            return True
+
+    async def acquire_async(self):
+        while self.inflight >= self.limit:
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            try:
+                await fut
+            finally:
+                if not fut.done(): fut.cancel()
+        self.inflight += 1
+        self._peak = max(self._peak, self.inflight)
+
+    def _wake(self):
+        free = self.limit - self.inflight
+        self._cond.notify(max(0, free))
+        while self._waiters and free > 0:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None); free -= 1
+
+    def release(self, done=False, timeout=False, latency=None):
+        """คืน slot - done=True คือ probe จบจริง (นับเข้า window): timeout / latency ของตัวที่ผ่าน"""
+        with self._cond:
+            self.inflight -= 1
+            if done:
+                self._done += 1
+                self._timeouts += bool(timeout)
+                if latency is not None: self._lat.append(latency)
+                if time.monotonic() - self._t0 >= self.window and self._done >= ADAPT_MIN_SAMPLES:
+                    self._decide()
+            self._wake()
+
+    def hold(self):
+        """PAUSE / resume: window นี้ไม่เอามาตัดสิน (ช่วงที่หยุดไม่ใช่ throughput จริง)"""
+        with self._cond:
+            self._reset_window(); self._grew = False
+
+    # --- decision ---
+
+    def _decide(self):
+        dt = time.monotonic() - self._t0
+        rate = self._done / dt
+        tshare = self._timeouts / self._done
+        lat = median(self._lat)
+        bound = self._peak >= self.limit * ADAPT_BOUND
+        old, new = self.limit, self.limit
+        if self.timeout_base is not None and tshare > self.timeout_base + ADAPT_TIMEOUT_MARGIN:
+            new, reason = int(old * ADAPT_BACKOFF), f"timeouts {tshare:.0%} > {self.timeout_base:.0%}"
+        elif lat is not None and self.lat_base and lat > self.lat_base * ADAPT_LAT_INFLATION:
+            new, reason = int(old * ADAPT_BACKOFF), f"latency x{lat / self.lat_base:.1f}"
+        elif self._grew and bound and self.last_rate and rate < self.last_rate * ADAPT_PLATEAU:
+            new, reason = old - self._step(old), f"plateau {rate:.0f}/s"
+        elif not bound:
+            new, reason = old, f"input-bound ({self._peak} in flight)"
+        elif self.slow_start:
+            new, reason = old * 2, f"slow start {rate:.0f}/s"
+        else:
+            new, reason = old + self._step(old), f"probe up {rate:.0f}/s"
+        wanted, new = new, min(self.hi, max(self.lo, new))
+        if new < old: self.slow_start = False
+        # baselines: the best window seen, creeping up a little so they follow the list
+        self.timeout_base = tshare if self.timeout_base is None else min(self.timeout_base + 0.01, tshare)
+        if lat is not None:
+            self.lat_base = lat if self.lat_base is None else min(self.lat_base * ADAPT_DRIFT, lat)
+        self._grew = new > old
+        self.last_rate = rate
+        if wanted != new:
+            reason = f"at {'max' if new == self.hi else 'min'} {new}"
+        if new != old:
+            self.log.append((time.time(), old, new, reason))
+            if self.on_change: self.on_change(old, new, reason)
+        self.limit, self.reason = new, reason
+        self._reset_window()
+
+    def _step(self, limit):
+        return max(1, int(limit * ADAPT_STEP))
@@ -0,0 +1,675 @@
+import asyncio, ssl, socket, struct, base64, json, queue, threading, time
+from urllib.parse import urlsplit, urljoin, unquote
+
+import certifi
+
+from hydra_core import (PROBE_HEADERS, PROBE_TIMEOUT, ENRICH_TIMEOUT, PROBE_COUNT, PROBE_MIN_OK,
+                        PRESCREEN_TIMEOUT, PRESCREEN_CONCURRENCY, request_plan, inflate,
+                        target_url, classify_target, parse_proxy,
+                        enrich_steps, build_proxy_data, probe_error, dead_data, timing_data, error_class,
+                        error_text, TIMEOUT_ERRORS,
+                        matrix_name, matrix_cell, matrix_plan)
+from hydra_limit import hold_async
+from hydra_metrics import RunMetrics, Traffic
+
+# --- AsyncIO engine: one event loop, thousands of in-flight checks, no thread per proxy ---
+# ใช้ stdlib ล้วน (asyncio streams) คุย HTTP/1.1 + HTTP CONNECT / SOCKS4 / SOCKS5 เอง
+
+SSL_CTX = ssl.create_default_context(cafile=certifi.where())  # same CA bundle as requests
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+class ProxyError(Exception):
+    """handshake กับ proxy ไม่ผ่าน หรือ proxy ตอบกลับผิดรูปแบบ"""
+
+class Response:
+    """response แบบย่อ หน้าตาเหมือน requests.Response เท่าที่ classify_target / parse_* ใช้"""
+    __slots__ = ("status_code", "headers", "content", "url", "handshake", "elapsed", "phases")
+
+    def __init__(self, status_code, headers, content, url, handshake=0.0, elapsed=0.0, phases=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+        self.handshake = handshake  # seconds spent opening the proxy connection (0 = reused keep-alive)
+        self.elapsed = elapsed      # request -> full body, without the handshake
+        self.phases = phases or {}  # connect / proxy / tls / ttfb / body seconds (perf_counter)
+
+    @property
+    def text(self):
+        ctype = self.headers.get("content-type", "")
+        charset = ctype.split("charset=", 1)[1].split(";")[0].strip() if "charset=" in ctype else "utf-8"
+        try:
+            return self.content.decode(charset, errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+def split_proxy(proxy_url):
+    """proxy url -> (scheme, host, port, user, password)"""
+    sp = urlsplit(proxy_url)
+    scheme = (sp.scheme or "http").lower()
+    port = sp.port or (1080 if scheme.startswith("socks") else 80)
+    user = unquote(sp.username) if sp.username is not None else None
+    pwd = unquote(sp.password) if sp.password is not None else None
+    return scheme, sp.hostname, port, user, pwd
+
+def raise_nofile_limit(concurrency):
+    """ขยาย ulimit -n ให้พอกับ socket ที่จะเปิดพร้อมกัน (ไม่มีผลบน Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    need = concurrency * 2 + 64
+    if soft == resource.RLIM_INFINITY or soft >= need:
+        return
+    if hard != resource.RLIM_INFINITY:
+        need = min(need, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (need, hard))
+    except (ValueError, OSError):
+        pass
+
+_dns_cache = {}
+
+async def _resolve(host):
+    """DNS ฝั่งเรา (socks4 / socks5 แบบไม่ใช่ remote dns) - target มีไม่กี่ host เลย cache ไว้ทั้ง run"""
+    try:
+        socket.inet_aton(host)
+        return host
+    except OSError:
+        pass
+    ip = _dns_cache.get(host)
+    if ip is None:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        ip = _dns_cache[host] = infos[0][4][0]
+    return ip
+
+def _basic_auth(user, pwd):
+    return base64.b64encode(f"{user}:{pwd or ''}".encode()).decode()
+
+async def _socks5_greeting(reader, writer, user, pwd):
+    methods = b"\x00\x02" if user is not None else b"\x00"
+    writer.write(b"\x05" + bytes([len(methods)]) + methods)
+    ver, method = await reader.readexactly(2)
+    if ver != 5:
+        raise ProxyError("socks5: bad greeting")
+    if method == 2:
+        u, pw = user.encode(), (pwd or "").encode()
+        writer.write(b"\x01" + bytes([len(u)]) + u + bytes([len(pw)]) + pw)
+        _, status = await reader.readexactly(2)
+        if status != 0:
+            raise ProxyError("socks5: auth failed")
+    elif method != 0:
+        raise ProxyError("socks5: no acceptable auth method")
+
+async def _socks5(reader, writer, host, port, user, pwd, rdns, greeted=False):
+    if not greeted:
+        await _socks5_greeting(reader, writer, user, pwd)
+    if rdns:
+        try:
+            addr = b"\x01" + socket.inet_aton(host)
+        except OSError:
+            h = host.encode("idna")
+            addr = b"\x03" + bytes([len(h)]) + h
+    else:
+        addr = b"\x01" + socket.inet_aton(await _resolve(host))
+    writer.write(b"\x05\x01\x00" + addr + struct.pack(">H", port))
+    ver, rep, _, atyp = await reader.readexactly(4)
+    if ver != 5 or rep != 0:
+        raise ProxyError(f"socks5: connect failed ({rep})")
+    if atyp == 1:
+        await reader.readexactly(4 + 2)
+    elif atyp == 3:
+        n = (await reader.readexactly(1))[0]
+        await reader.readexactly(n + 2)
+    elif atyp == 4:
+        await reader.readexactly(16 + 2)
+    else:
+        raise ProxyError("socks5: bad bind address")
+
+async def _socks4(reader, writer, host, port, user, rdns):
+    uid = (user or "").encode() + b"\x00"
+    if rdns:
+        # socks4a: 0.0.0.x + hostname
+        req = b"\x04\x01" + struct.pack(">H", port) + b"\x00\x00\x00\x01" + uid + host.encode("idna") + b"\x00"
+    else:
+        req = b"\x04\x01" + struct.pack(">H", port) + socket.inet_aton(await _resolve(host)) + uid
+    writer.write(req)
+    reply = await reader.readexactly(8)
+    if reply[1] != 0x5A:
+        raise ProxyError(f"socks4: rejected ({reply[1]})")
+
+async def _read_raw_head(reader):
+    try:
+        return await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        raise ProxyError("connection closed before response") from e
+    except asyncio.LimitOverrunError as e:
+        raise ProxyError("response header too large") from e
+
+async def _read_head(reader):
+    """อ่าน status line + headers -> (status, headers dict ตัวพิมพ์เล็ก, version)"""
+    return _parse_head(await _read_raw_head(reader))
+
+def _parse_head(raw):
+    lines = raw.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+        raise ProxyError(f"bad status line: {lines[0][:60]!r}")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+    return int(parts[1]), headers, parts[0]
+
+async def _http_connect(reader, writer, host, port, user, pwd):
+    hp = f"{host}:{port}"
+    req = f"CONNECT {hp} HTTP/1.1\r\nHost: {hp}\r\n"
+    if user is not None:
+        req += f"Proxy-Authorization: Basic {_basic_auth(user, pwd)}\r\n"
+    writer.write((req + "\r\n").encode())
+    status, _, _ = await _read_head(reader)
+    if status != 200:
+        raise ProxyError(f"http connect: {status}")
+
+async def proxy_greeting(reader, writer, scheme, user, pwd):
+    """ส่วนของ handshake ที่ยังไม่ต้องรู้ปลายทาง (SOCKS5 greeting / auth) ทำล่วงหน้าได้ - return: True ถ้าทำไปแล้ว"""
+    if scheme in ("socks5", "socks5h"):
+        await _socks5_greeting(reader, writer, user, pwd)
+        return True
+    return False
+
+async def proxy_handshake(reader, writer, scheme, host, port, user, pwd, greeted=False):
+    """ขอให้ proxy ต่อไปที่ host:port บน connection ที่เปิดไว้แล้ว (SOCKS5 / SOCKS4 / HTTP CONNECT)"""
+    if scheme in ("socks5", "socks5h"):
+        await _socks5(reader, writer, host, port, user, pwd, scheme == "socks5h", greeted)
+    elif scheme in ("socks4", "socks4a"):
+        await _socks4(reader, writer, host, port, user, scheme == "socks4a")
+    else:
+        await _http_connect(reader, writer, host, port, user, pwd)
+
+async def prescreen_one(proxy_url, host, port, timeout=PRESCREEN_TIMEOUT):
+    """
+    คัดกรองเร็วก่อน probe จริง: TCP connect ไป proxy ด้วย timeout สั้นๆ
+    + SOCKS5 greeting/auth หรือ SOCKS4 CONNECT ไป target (socks4 ไม่มี greeting แยก)
+    return: None ถ้าผ่าน, ข้อความ error ถ้าไม่ผ่าน
+    """
+    scheme, phost, pport, user, pwd = split_proxy(proxy_url)
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(phost, pport), timeout)
+    except asyncio.TimeoutError:
+        return "prescreen: connect timeout"
+    except (OSError, ValueError) as e:
+        return f"prescreen: {e or type(e).__name__}"
+    try:
+        if scheme in ("socks5", "socks5h"):
+            await asyncio.wait_for(_socks5_greeting(reader, writer, user, pwd), timeout)
+        elif scheme in ("socks4", "socks4a"):
+            await asyncio.wait_for(_socks4(reader, writer, host, port, user, scheme == "socks4a"), timeout)
+        return None
+    except asyncio.TimeoutError:
+        return "prescreen: handshake timeout"
+    except (ProxyError, OSError, asyncio.IncompleteReadError) as e:
+        return f"prescreen: {e or type(e).__name__}"
+    finally:
+        writer.transport.abort()
+
+def _screen_target(target_key, custom_url):
+    sp = urlsplit(target_url(target_key, custom_url) or "http://example.com/")
+    return sp.hostname or "example.com", sp.port or (443 if sp.scheme == "https" else 80)
+
+async def _wait_paused(pause_event):
+    while pause_event is not None and not pause_event.is_set():
+        await asyncio.sleep(0.2)
+
+async def _cancel_on_stop(coro, stopped, extra=(), poll=0.1):
+    """
+    รอ coro จนเสร็จ แต่ถ้า STOP ระหว่างนั้น -> cancel ทิ้งทันที (รวม task ใน extra)
+    งานที่ยังไม่เริ่มไม่ได้เริ่ม, connection ที่ค้างอยู่ถูก abort ใน finally ของแต่ละตัว (ไม่ต้องรอ timeout)
+    """
+    work = asyncio.ensure_future(coro)
+    while not work.done():
+        await asyncio.wait((work,), timeout=poll)
+        if stopped() and not work.done():
+            tasks = [work, *extra]
+            for t in tasks: t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            return
+    work.result()
+
+async def _screen_into(it, put, target_key, custom_url, concurrency, timeout, on_dead, stopped, pause_event):
+    """lanes ของ pre-screen: ตัวที่ผ่านส่งต่อด้วย put(p), ตัวที่ตายแจ้ง on_dead(p, error) ทันที"""
+    host, port = _screen_target(target_key, custom_url)
+
+    async def lane():
+        for p in it:
+            if stopped(): return
+            await _wait_paused(pause_event)
+            if stopped(): return
+            err = await prescreen_one(parse_proxy(p), host, port, timeout)
+            if err is None:
+                await put(p)
+            elif on_dead and not stopped():
+                on_dead(p, err)
+
+    await asyncio.gather(*(lane() for _ in range(max(1, concurrency))))
+
+def prescreen_stream(lines, target_key, custom_url="", concurrency=PRESCREEN_CONCURRENCY, timeout=PRESCREEN_TIMEOUT,
+                     on_dead=None, stopped=lambda: False, pause_event=None, maxsize=1000):
+    """
+    pre-screen สำหรับ thread engine: event loop แยก thread คัดกรอง แล้ว yield เฉพาะตัวที่รอด
+    (queue มีขนาดจำกัด -> memory คงที่ และ loop ไม่วิ่งนำ thread pool ไปไกล)
+    """
+    q = queue.Queue(maxsize)
+    done = object()
+
+    async def put(p):
+        while True:
+            try:
+                return q.put_nowait(p)
+            except queue.Full:
+                if stopped(): return
+                await asyncio.sleep(0.02)
+
+    def runner():
+        try:
+            raise_nofile_limit(concurrency)
+            asyncio.run(_cancel_on_stop(_screen_into(iter(lines), put, target_key, custom_url, concurrency, timeout,
+                                                     on_dead, stopped, pause_event), stopped))
+        finally:
+            while True:  # nobody reads any more after STOP: don't block forever on a full queue
+                try:
+                    q.put(done, timeout=0.2); break
+                except queue.Full:
+                    if stopped(): break
+
+    threading.Thread(target=runner, daemon=True).start()
+    while True:
+        p = q.get()
+        if p is done: return
+        yield p
+
+async def _within(aw, timeout, phase):
+    # wait_for whose timeout says which phase ran out (asyncio's TimeoutError carries no message)
+    try:
+        return await asyncio.wait_for(aw, timeout)
+    except asyncio.TimeoutError:
+        raise asyncio.TimeoutError(f"{phase} timed out") from None
+
+async def open_tunnel(proxy_url, host, port, tls, timeout=PROBE_TIMEOUT, phases=None):
+    """
+    ต่อ TCP ไป proxy แล้ว handshake ให้ถึง host:port ของ target
+    phases (dict): ใส่เวลาแต่ละช่วงให้ - connect (TCP), proxy (SOCKS / CONNECT), tls
+    return: (reader, writer, forward) - forward=True คือ http proxy + http target (ส่ง absolute-URI ตรงๆ)
+    """
+    phases = {} if phases is None else phases
+    scheme, phost, pport, user, pwd = split_proxy(proxy_url)
+    t0 = time.perf_counter()
+    reader, writer = await _within(asyncio.open_connection(phost, pport), timeout, "connect")
+    t1 = time.perf_counter()
+    phases.update(connect=t1 - t0, proxy=0.0, tls=0.0)
+    try:
+        if not scheme.startswith("socks") and not tls:
+            return reader, writer, True
+        await _within(proxy_handshake(reader, writer, scheme, host, port, user, pwd), timeout, "proxy handshake")
+        t2 = time.perf_counter(); phases["proxy"] = t2 - t1
+        if tls:
+            await _within(writer.start_tls(SSL_CTX, server_hostname=host), timeout, "tls handshake")
+            phases["tls"] = time.perf_counter() - t2
+        return reader, writer, False
+    except BaseException:
+        writer.transport.abort()
+        raise
+
+def _has_body(method, status):
+    return not (method == "HEAD" or status in (204, 304) or 100 <= status < 200)
+
+async def _read_body(reader, headers, method, status, cap=None):
+    """
+    อ่าน body -> (body, ไบต์บนสาย, อ่านครบไหม)
+    cap: หยุดเมื่อได้ body (ก่อนแตก gzip) ครบ cap ไบต์ - ที่เหลือไม่ถูกดึง, connection นั้นใช้ต่อไม่ได้
+    """
+    if not _has_body(method, status):
+        return b"", 0, True
+    left = float("inf") if cap is None else cap
+    wire, done = 0, True
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        chunks = []
+        while True:
+            line = await reader.readline()
+            size = int(line.split(b";", 1)[0].strip() or b"0", 16)
+            wire += len(line)
+            if size == 0:
+                wire += len(await reader.readline())
+                break
+            if size > left:
+                chunks.append(await reader.readexactly(int(left))); wire += int(left); done = False
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+            wire += size + 2; left -= size
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        length = int(headers["content-length"])
+        body = await reader.readexactly(int(min(length, left)))
+        wire, done = len(body), len(body) == length
+    elif cap is None:
+        body = await reader.read()
+        wire = len(body)
+    else:
+        chunks = []
+        while wire < cap and (data := await reader.read(cap - wire)):
+            chunks.append(data); wire += len(data)
+        body, done = b"".join(chunks), wire < cap  # stopped at the cap: EOF not seen
+    return inflate(body, headers.get("content-encoding", "").lower()), wire, done
+
+def _keep_alive(version, headers, method, status):
+    """connection นี้ใช้ต่อได้ไหม (HTTP/1.1 ไม่มี Connection: close และ body มีขอบเขตชัด)"""
+    conn = (headers.get("connection", "") + "," + headers.get("proxy-connection", "")).lower()
+    if "close" in conn or (version == "HTTP/1.0" and "keep-alive" not in conn):
+        return False
+    return (not _has_body(method, status) or "content-length" in headers
+            or "chunked" in headers.get("transfer-encoding", "").lower())
+
+class ProxySession:
+    """
+    connection ผ่าน proxy ตัวเดียว แบบ keep-alive: 1 connection ต่อ target host ตลอดการเช็ค
+    (probe 3 ครั้ง + enrichment ไม่ต้อง handshake TCP/SOCKS/TLS ใหม่ทุกครั้ง)
+    """
+    def __init__(self, proxy_url, timeout=PROBE_TIMEOUT, frugal=False, traffic=None):
+        self.proxy_url = proxy_url
+        self.timeout = timeout
+        self.frugal = frugal  # request_plan: HEAD / Range / capped bodies / few redirects
+        self.traffic = traffic if traffic is not None else Traffic()  # HTTP bytes of every request on this session
+        self._conns = {}  # (host, port, tls) -> (reader, writer, forward)
+        _, _, _, self._user, self._pwd = split_proxy(proxy_url)
+
+    def close(self):
+        for _, writer, _ in self._conns.values():
+            writer.transport.abort()
+        self._conns.clear()
+
+    async def request(self, url, timeout=None, headers=PROBE_HEADERS, method="GET", cap=None):
+        """request เดียว (ไม่ตาม redirect) - ใช้ connection เดิมถ้ายังเปิดอยู่, body อ่านไม่เกิน cap ไบต์"""
+        timeout = timeout or self.timeout
+        sp = urlsplit(url)
+        tls = sp.scheme == "https"
+        host, port = sp.hostname, sp.port or (443 if tls else 80)
+        key = (host, port, tls)
+        clock = time.perf_counter
+        for attempt in (0, 1):
+            conn = self._conns.pop(key, None)
+            reused = conn is not None
+            phases = {"connect": 0.0, "proxy": 0.0, "tls": 0.0}
+            st = clock()
+            if conn is None:
+                conn = await open_tunnel(self.proxy_url, host, port, tls, timeout, phases)
+            reader, writer, forward = conn
+            t0 = clock()
+            handshake = t0 - st if not reused else 0.0
+            path = url if forward else (sp.path or "/") + (f"?{sp.query}" if sp.query else "")
+            lines = [f"{method} {path} HTTP/1.1", f"Host: {sp.netloc.rsplit('@', 1)[-1]}", "Accept-Encoding: gzip, deflate"]
+            lines += [f"{k}: {v}" for k, v in headers.items()]
+            if forward and self._user is not None:
+                lines.append(f"Proxy-Authorization: Basic {_basic_auth(self._user, self._pwd)}")
+            head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+            recv = 0
+            try:
+                writer.write(head)
+                raw = await _within(_read_raw_head(reader), timeout, "read")
+                recv = len(raw)
+                status, resp_headers, version = _parse_head(raw)
+                phases["ttfb"] = clock() - t0
+                body, wire, done = await _within(_read_body(reader, resp_headers, method, status, cap), timeout, "read")
+                recv += wire
+            except (ProxyError, ConnectionError, asyncio.IncompleteReadError):
+                writer.transport.abort()
+                if reused and attempt == 0:
+                    continue  # idle keep-alive connection was closed by the far end: retry once on a fresh one
+                raise
+            except BaseException:
+                writer.transport.abort()
+                raise
+            finally:
+                self.traffic.add(len(head), recv)
+            if done and _keep_alive(version, resp_headers, method, status) and key not in self._conns:
+                self._conns[key] = conn
+            else:
+                writer.transport.abort()
+            elapsed = clock() - t0
+            phases["body"] = elapsed - phases["ttfb"]
+            return Response(status, resp_headers, body, url, handshake, elapsed, phases)
+
+    async def fetch(self, url, timeout=None, headers=PROBE_HEADERS, method="GET", target_key=""):
+        """GET ผ่าน proxy แบบเดียวกับ sess.get(..., allow_redirects=True) - frugal: ตาม request_plan ของ target_key"""
+        method, extra, cap, redirects = request_plan(target_key, self.frugal, method)
+        if extra:
+            headers = dict(headers, **extra)
+        handshake = elapsed = 0.0; phases = {}
+        for _ in range(redirects + 1):
+            resp = await self.request(url, timeout, headers, method, cap)
+            handshake += resp.handshake; elapsed += resp.elapsed
+            for k, v in resp.phases.items():
+                phases[k] = phases.get(k, 0.0) + v
+            location = resp.headers.get("location")
+            if resp.status_code not in REDIRECT_CODES or not location:
+                resp.handshake, resp.elapsed, resp.phases = handshake, elapsed, phases
+                return resp
+            url = urljoin(url, location)
+            if resp.status_code == 303:
+                method = "GET"
+        raise ProxyError(f"exceeded {redirects} redirects")
+
+async def probe_target_async(sess, target_key, custom_url="", timeout=PROBE_TIMEOUT, limiter=None):
+    """probe_target สำหรับ async engine - return: (ok, status_code, extra, resp)"""
+    url = target_url(target_key, custom_url)
+    if not url:
+        return False, None, {"error": "empty_target_url"}, None
+    try:
+        async with hold_async(limiter, url):
+            resp = await sess.fetch(url, timeout, target_key=target_key)
+        return classify_target(target_key, url, resp) + (resp,)
+    except Exception as e:
+        return False, None, {"target_url": url, "error": error_text(e)}, None
+
+async def probe_matrix_async(sess, matrix, timeout=ENRICH_TIMEOUT, limiter=None):
+    """probe_matrix สำหรับ async engine - return: {ชื่อ target: cell}"""
+    grid = {}
+    for key, url in matrix:
+        ok, sc, extra, resp = await probe_target_async(sess, key, url, timeout, limiter)
+        # whole request incl. a new tunnel when the host differs (same as the thread engine's resp.took)
+        took = resp.elapsed + resp.handshake if resp is not None else None
+        grid[matrix_name(key, url)] = matrix_cell(key, ok, sc, extra, took, resp)
+    return grid
+
+async def drive_enrich_async(steps, sess, timeout=ENRICH_TIMEOUT, limiter=None):
+    """ขับ enrich_steps บน event loop: URL ในขั้นเดียวกันยิงพร้อมกัน"""
+    async def get(url):
+        try:
+            async with hold_async(limiter, url):
+                return await sess.fetch(url, timeout, headers={})
+        except Exception:
+            return None
+    try:
+        urls = next(steps)
+        while True:
+            urls = steps.send(tuple(await asyncio.gather(*map(get, urls))))
+    except StopIteration as e:
+        return e.value
+
+async def probe_proxy_async(p, target_key, custom_url="", stopped=lambda: False, probe_timeout=PROBE_TIMEOUT,
+                            limiter=None, min_ok=PROBE_MIN_OK, frugal=False, traffic=None):
+    """probe_proxy เวอร์ชัน async - return: ((sess, stats, last_probe), None) หรือ (None, error) ถ้า dead"""
+    u = parse_proxy(p); s = []; hs = []; phases = []; attempts = fails = 0; last = None; err = "stopped"
+    sess = ProxySession(u, probe_timeout, frugal, traffic)
+    try:
+        for _ in range(PROBE_COUNT):
+            if stopped(): break
+            attempts += 1
+            ok, sc, extra, resp = await probe_target_async(sess, target_key, custom_url, probe_timeout, limiter)
+            if ok:
+                s.append(resp.elapsed); hs.append(resp.handshake); phases.append(resp.phases); last = (ok, sc, extra)
+                continue
+            err = probe_error(sc, extra); fails += 1
+            # the first probe gates liveness; after that a flaky probe is tolerated while min_ok is still reachable
+            if not s or fails > PROBE_COUNT - min_ok: break
+        if len(s) >= min_ok and not stopped():
+            # handshake measured directly: the first probe opens the connection, the rest reuse it
+            keep, sess = sess, None  # handed over to enrich_proxy_async, which closes it
+            return (keep, timing_data(s, attempts, max(hs), phases), last), None
+        return None, err
+    finally:
+        if sess is not None: sess.close()
+
+async def enrich_proxy_async(p, probed, target_key, enrich_timeout=ENRICH_TIMEOUT, geo=None, limiter=None, matrix=()):
+    """enrich_proxy เวอร์ชัน async (ปิด session ให้) - return: (p, avg, proxy_data)"""
+    sess, stats, (ok2, sc2, extra2) = probed
+    avg = stats["latency"]
+    try:
+        target_info = {"target": target_key, "target_ok": ok2, "target_status": sc2}
+        target_info.update(extra2 if isinstance(extra2, dict) else {})
+
+        is_anon, anon_type, geo_info, exit_ip = await drive_enrich_async(enrich_steps(target_key, extra2, geo),
+                                                                         sess, enrich_timeout, limiter)
+        if exit_ip: target_info["exit_ip"] = exit_ip
+        if matrix:
+            target_info["matrix"] = dict({matrix_name(target_key, (extra2 or {}).get("target_url", "")):
+                                          matrix_cell(target_key, ok2, sc2, extra2, avg)},
+                                         **await probe_matrix_async(sess, matrix, enrich_timeout, limiter))
+        proxy_data = build_proxy_data(p, avg, is_anon, anon_type, geo_info, target_info, stats["handshake"], stats)
+        proxy_data.update(sess.traffic.data())
+        return p, avg, proxy_data
+    except Exception as e:
+        return p, None, dead_data(error_text(e), sess.traffic)
+    finally:
+        sess.close()
+
+async def check_proxy_async(p, target_key, custom_url="", stopped=lambda: False,
+                            probe_timeout=PROBE_TIMEOUT, enrich_timeout=ENRICH_TIMEOUT, geo=None, limiter=None,
+                            min_ok=PROBE_MIN_OK, matrix=(), frugal=False):
+    """check_proxy เวอร์ชัน async - ผลลัพธ์รูปแบบเดียวกันทุกอย่าง"""
+    traffic = Traffic()
+    probed, err = await probe_proxy_async(p, target_key, custom_url, stopped, probe_timeout, limiter, min_ok, frugal,
+                                          traffic)
+    if probed is None:
+        return p, None, dead_data(err, traffic)
+    return await enrich_proxy_async(p, probed, target_key, enrich_timeout, geo, limiter,
+                                    matrix_plan(target_key, custom_url, matrix))
+
+async def run_checks(lines, target_key, custom_url="", concurrency=1000, on_result=None,
+                     stopped=lambda: False, pause_event=None,
+                     probe_timeout=PROBE_TIMEOUT, enrich_timeout=ENRICH_TIMEOUT,
+                     prescreen=False, prescreen_concurrency=PRESCREEN_CONCURRENCY, prescreen_timeout=PRESCREEN_TIMEOUT,
+                     geo=None, limiter=None, min_ok=PROBE_MIN_OK, matrix=(), adapt=None, frugal=False, metrics=None):
+    """
+    เช็คทุกบรรทัดด้วย `concurrency` lanes บน event loop เดียว
+    prescreen=True: มี lanes คัดกรอง (connect สั้นๆ, พร้อมกันได้หลายพัน) อยู่ก่อน เฉพาะตัวที่รอดถึงจะได้ probe จริง
+    adapt (hydra_adapt.AdaptiveLimit): lanes เท่าเพดาน adapt.hi แต่ probe พร้อมกันได้แค่ adapt.limit
+    on_result(p, avg, proxy_data) ถูกเรียกบน thread ของ loop (avg=None คือ dead)
+    metrics (hydra_metrics.RunMetrics): gauge คิว / in-flight / enriching + เวลาของ probe / enrich
+    """
+    metrics = metrics if metrics is not None else RunMetrics()
+    if adapt is not None:
+        concurrency = adapt.hi
+    raise_nofile_limit(concurrency + (prescreen_concurrency if prescreen else 0))
+    it = iter(lines)
+
+    # enrichment runs as its own task: the lane goes back to probing while e.g. ip-api's bucket refills
+    enrich_slots = asyncio.Semaphore(concurrency * 2)
+    enriching = set()
+
+    async def enrich(p, probed):
+        t0 = metrics.enrich_begin()
+        try:
+            res = await enrich_proxy_async(p, probed, target_key, enrich_timeout, geo, limiter, matrix)
+        finally:
+            metrics.enrich_end(t0)
+            enrich_slots.release()
+        if on_result: on_result(*res)
+
+    async def timed_probe(p, traffic):
+        t0 = metrics.probe_begin()
+        try:
+            return await probe_proxy_async(p, target_key, custom_url, stopped, probe_timeout, limiter, min_ok, frugal,
+                                           traffic)
+        finally:
+            metrics.probe_end(t0)
+
+    async def probe(p, traffic):
+        if adapt is None:
+            return await timed_probe(p, traffic)
+        metrics.enqueue()  # waiting for the adaptive limit
+        try:
+            await adapt.acquire_async()
+        finally:
+            metrics.dequeue()
+        sampled = False
+        try:
+            probed, err = await timed_probe(p, traffic)
+            sampled = True
+            adapt.release(True, probed is None and error_class(err) in TIMEOUT_ERRORS,
+                          probed[1]["latency"] if probed is not None else None)
+            return probed, err
+        finally:
+            if not sampled: adapt.release()  # cancelled by STOP
+
+    async def check(p):
+        await _wait_paused(pause_event)
+        if stopped(): return
+        traffic = Traffic()
+        probed, err = await probe(p, traffic)
+        if probed is None:
+            if on_result: on_result(p, None, dead_data(err, traffic))
+            return
+        await enrich_slots.acquire()
+        t = asyncio.create_task(enrich(p, probed))
+        enriching.add(t); t.add_done_callback(enriching.discard)
+
+    async def direct():
+        async def lane():
+            for p in it:  # shared iterator: next() never awaits, so lanes never race on it
+                if stopped(): return
+                await check(p)
+        await asyncio.gather(*(lane() for _ in range(max(1, concurrency))))
+        while enriching:
+            await asyncio.gather(*enriching)
+
+    async def screened():
+        survivors = asyncio.Queue(maxsize=concurrency * 2)
+
+        async def put(p):
+            await survivors.put(p); metrics.enqueue()
+
+        async def screen():
+            try:
+                await _screen_into(it, put, target_key, custom_url, prescreen_concurrency, prescreen_timeout,
+                                   (lambda p, err: on_result and on_result(p, None, dead_data(err))), stopped,
+                                   pause_event)
+            finally:
+                for _ in range(max(1, concurrency)):
+                    await survivors.put(None)
+
+        async def lane():
+            while (p := await survivors.get()) is not None:
+                metrics.dequeue()
+                if not stopped():  # keep draining after STOP so screen() can always post its sentinels
+                    await check(p)
+
+        await asyncio.gather(screen(), *(lane() for _ in range(max(1, concurrency))))
+        while enriching:
+            await asyncio.gather(*enriching)
+
+    await _cancel_on_stop(screened() if prescreen else direct(), stopped, enriching)
+
+def run(lines, target_key, custom_url="", concurrency=1000, on_result=None, stopped=lambda: False, pause_event=None,
+        probe_timeout=PROBE_TIMEOUT, enrich_timeout=ENRICH_TIMEOUT,
+        prescreen=False, prescreen_concurrency=PRESCREEN_CONCURRENCY, prescreen_timeout=PRESCREEN_TIMEOUT, geo=None,
+        limiter=None, min_ok=PROBE_MIN_OK, matrix=(), adapt=None, frugal=False, metrics=None):
+    """จุดเรียกแบบ blocking (เรียกจาก worker thread ของ GUI ได้เลย)"""
+    asyncio.run(run_checks(lines, target_key, custom_url, concurrency, on_result, stopped, pause_event,
+                           probe_timeout, enrich_timeout, prescreen, prescreen_concurrency, prescreen_timeout, geo,
+                           limiter, min_ok, matrix, adapt, frugal, metrics))
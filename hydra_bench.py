@@ -0,0 +1,409 @@
+import argparse, asyncio, base64, json, math, multiprocessing, os, random, socket, sys, tempfile, threading, time
+from array import array
+from collections import namedtuple
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from hydra_judge import judge_body
+from hydra_metrics import median, percentile
+
+# --- Benchmark farm: local fake HTTP CONNECT / SOCKS4 / SOCKS5 proxies + a target that answers like every preset ---
+# python hydra_bench.py --sizes 1000,10000,100000 --engines thread,async -t GEO
+# proxies/sec, CPU, peak RSS and latency accuracy of the same pipeline HydraFinal.worker runs (Checker -> export + ResultStore)
+
+BENCH_SIZES = (1000, 10000, 100000)
+FARM_HOST = "127.0.0.1"
+CLIENT_IP = "203.0.113.7"  # the "real" address a transparent proxy leaks (TEST-NET-3)
+MAX_HEAD = 16 * 1024
+# proxy line scheme per farm protocol: remote DNS, the farm routes every host to its own target anyway
+SCHEMES = {"http": "http", "socks4": "socks4a", "socks5": "socks5h"}
+GEO_ROWS = (("Thailand", "TH", "Bangkok", "True Internet"), ("United States", "US", "Ashburn", "Amazon.com"),
+            ("Germany", "DE", "Frankfurt", "Hetzner Online"), ("Singapore", "SG", "Singapore", "DigitalOcean"),
+            ("Brazil", "BR", "Sao Paulo", "Telefonica Brasil"))
+CAPTCHA_PAGE = (b"<html><head><title>Robot Check</title></head><body>"
+                b"<p>Enter the characters you see below</p><form action=\"/errors/validateCaptcha\"></form></body></html>")
+
+Profile = namedtuple("Profile", "proto latency jitter dead blackhole transparent blocked")
+
+def farm_spec(seed=1, latency=0.08, spread=0.5, jitter=0.02, dead=0.3, blackhole=0.02, fail=0.02,
+              transparent=0.2, blocked=0.1, protocols=tuple(SCHEMES)):
+    """ค่าของ farm ทั้งชุด (dict ธรรมดา ส่งข้าม process ได้) - proxy ตัวที่ i คำนวณจาก seed + i เสมอ ไม่ต้องเก็บ"""
+    return {"seed": seed, "latency": latency, "spread": spread, "jitter": jitter, "dead": dead,
+            "blackhole": blackhole, "fail": fail, "transparent": transparent, "blocked": blocked,
+            "protocols": tuple(protocols)}
+
+def profile(spec, i):
+    """
+    proxy ตัวที่ i: latency (lognormal รอบ median ที่ตั้ง) + jitter ต่อ request
+    dead = port ที่ไม่มีใครฟัง (connection refused), blackhole = รับ connection แล้วเงียบไปเลย
+    """
+    rng = random.Random(spec["seed"] * 1_000_003 + i)
+    return Profile(proto=spec["protocols"][rng.randrange(len(spec["protocols"]))],
+                   latency=spec["latency"] * math.exp(rng.gauss(0.0, spec["spread"])),
+                   jitter=spec["jitter"],
+                   dead=rng.random() < spec["dead"],
+                   blackhole=rng.random() < spec["blackhole"],
+                   transparent=rng.random() < spec["transparent"],
+                   blocked=rng.random() < spec["blocked"])
+
+def exit_ip(i):
+    # 100.64.0.0/10 (shared address space): never a real exit, room for 4M proxies
+    return f"100.{64 + ((i >> 16) & 63)}.{(i >> 8) & 255}.{i & 255}"
+
+def proxy_line(spec, i, ports, closed_port):
+    """บรรทัด proxy ของตัวที่ i - ตัวตน (เลข i) อยู่ใน username, ตัวที่ dead ชี้ไป port ที่ปิดอยู่"""
+    prof = profile(spec, i)
+    port = closed_port if prof.dead else ports[i % len(ports)][prof.proto]
+    return f"{SCHEMES[prof.proto]}://b{i}:x@{FARM_HOST}:{port}"
+
+def proxy_index(line):
+    user = line.partition("://")[2].partition(":")[0]
+    return int(user[1:]) if user[:1] == "b" and user[1:].isdigit() else None
+
+def closed_port():
+    """port บน localhost ที่ไม่มีใครฟัง (ได้ connection refused แบบ proxy ที่ตายจริง)"""
+    with socket.socket() as s:
+        s.bind((FARM_HOST, 0))
+        return s.getsockname()[1]
+
+# ---------- farm (runs in its own process: its CPU / memory are not the checker's) ----------
+
+def _headers(head):
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            k, v = line.split(":", 1)
+            headers[k.strip()] = v.strip()
+    return lines[0], headers
+
+def target_response(path, headers, exit_addr, flags):
+    """คำตอบของ target ปลอมตาม path ของแต่ละ preset (204 / httpbin / ip-api / amazon robots / judge / อื่นๆ 200)"""
+    if "t" in flags:  # transparent proxy: the revealing headers reach the target
+        headers = dict(headers, **{"X-Forwarded-For": CLIENT_IP, "Via": "1.1 bench-farm"})
+    n = int.from_bytes(socket.inet_aton(exit_addr), "big")
+    country, code, city, isp = GEO_ROWS[n % len(GEO_ROWS)]
+    ctype, status = b"application/json", b"200 OK"
+    if path.startswith("/generate_204"):
+        return b"204 No Content", b"", b""
+    if path.startswith(("/get", "/headers")):
+        body = {"args": {}, "headers": headers, "origin": exit_addr, "url": path}
+    elif path.startswith("/json"):
+        body = {"status": "success", "country": country, "countryCode": code, "city": city, "isp": isp,
+                "query": exit_addr}
+    elif path.startswith("/robots.txt"):
+        return status, b"text/html" if "b" in flags else b"text/plain", \
+            CAPTCHA_PAGE if "b" in flags else b"User-agent: *\nDisallow: /gp/cart\n"
+    elif path.startswith("/judge"):
+        return status, ctype, judge_body(exit_addr, headers)
+    else:
+        return status, b"text/plain", b"ok\n"
+    return status, ctype, json.dumps(body, separators=(",", ":")).encode()
+
+async def _serve_target(reader, writer):
+    # first line comes from our own proxy: "BENCH <exit ip> <flags>"
+    try:
+        _, exit_addr, flags = (await reader.readuntil(b"\r\n")).decode().split()
+        while True:
+            line, headers = _headers(await reader.readuntil(b"\r\n\r\n"))
+            method, target, version = line.split()
+            sp = urlsplit(target)  # absolute-form from forward mode, origin-form through tunnels
+            status, ctype, body = target_response(sp.path or "/", headers, exit_addr, flags)
+            close = headers.get("Connection", "").lower() == "close" or version == "HTTP/1.0"
+            writer.write(b"HTTP/1.1 " + status + (b"\r\nContent-Type: " + ctype if ctype else b"")
+                         + b"\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n" % (len(body), b"close" if close else b"keep-alive")
+                         + (b"" if method == "HEAD" else body))
+            await writer.drain()
+            if close: return
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+class Farm:
+    """proxy ปลอม 3 แบบ + target บน event loop เดียว (หนึ่ง process) - เลือกพฤติกรรมจากเลข proxy ใน credentials"""
+    def __init__(self, spec):
+        self.spec = spec
+        self.fail = spec["fail"]
+        self.ports = {}
+        self._profiles = {}
+
+    def profile(self, i):
+        prof = self._profiles.get(i)
+        if prof is None:
+            prof = self._profiles[i] = profile(self.spec, i)
+        return prof
+
+    def delay(self, prof):
+        return max(0.0, prof.latency + random.uniform(-prof.jitter, prof.jitter))
+
+    async def _upstream(self, i, prof):
+        reader, writer = await asyncio.open_connection(FARM_HOST, self.ports["target"])
+        flags = ("t" if prof.transparent else "") + ("b" if prof.blocked else "") or "-"
+        writer.write(f"BENCH {exit_ip(i)} {flags}\r\n".encode())
+        return reader, writer
+
+    async def _pipe(self, reader, writer, prof=None):
+        # client -> target: every chunk (= one request) waits the proxy's latency and may be dropped
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data: break
+                if prof is not None:
+                    if random.random() < self.fail: break
+                    await asyncio.sleep(self.delay(prof))
+                writer.write(data); await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _relay(self, i, prof, reader, writer, reply, first=b""):
+        if prof.blackhole:  # accepted, authenticated ... and then nothing, until the client gives up
+            while await reader.read(65536): pass
+            writer.close(); return
+        await asyncio.sleep(self.delay(prof))  # the proxy dialling out
+        up_r, up_w = await self._upstream(i, prof)
+        if reply: writer.write(reply)
+        if first: up_w.write(first)
+        await asyncio.gather(self._pipe(reader, up_w, prof), self._pipe(up_r, writer))
+
+    async def _guard(self, coro, writer):
+        try:
+            await coro
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError, IndexError):
+            writer.close()
+
+    async def serve_http(self, reader, writer):
+        async def run():
+            head = await reader.readuntil(b"\r\n\r\n")
+            line, headers = _headers(head)
+            auth = headers.get("Proxy-Authorization", "").partition(" ")[2]
+            i = proxy_index("x://" + base64.b64decode(auth).decode())
+            if i is None:
+                writer.write(b"HTTP/1.1 407 Proxy Authentication Required\r\nContent-Length: 0\r\n\r\n"); writer.close(); return
+            if line.startswith("CONNECT "):
+                await self._relay(i, self.profile(i), reader, writer, b"HTTP/1.1 200 Connection established\r\n\r\n")
+            else:  # forward mode: the target takes the absolute-form request as it is
+                await self._relay(i, self.profile(i), reader, writer, b"", first=head)
+        await self._guard(run(), writer)
+
+    async def serve_socks5(self, reader, writer):
+        async def run():
+            _, n = await reader.readexactly(2)
+            if 2 not in await reader.readexactly(n):
+                writer.write(b"\x05\xff"); writer.close(); return
+            writer.write(b"\x05\x02")
+            await reader.readexactly(1)
+            user = (await reader.readexactly((await reader.readexactly(1))[0])).decode()
+            await reader.readexactly((await reader.readexactly(1))[0])
+            i = proxy_index("x://" + user + ":")
+            if i is None:
+                writer.write(b"\x01\x01"); writer.close(); return
+            prof = self.profile(i)
+            if prof.blackhole:
+                return await self._relay(i, prof, reader, writer, b"")
+            writer.write(b"\x01\x00")
+            _, _, _, atyp = await reader.readexactly(4)
+            await reader.readexactly({1: 4, 4: 16}.get(atyp) or (await reader.readexactly(1))[0])
+            await reader.readexactly(2)
+            await self._relay(i, prof, reader, writer, b"\x05\x00\x00\x01" + socket.inet_aton(FARM_HOST) + b"\x00\x00")
+        await self._guard(run(), writer)
+
+    async def serve_socks4(self, reader, writer):
+        async def run():
+            hdr = await reader.readexactly(8)
+            user = (await reader.readuntil(b"\x00"))[:-1].decode()
+            if hdr[4:7] == b"\x00\x00\x00" and hdr[7]:
+                await reader.readuntil(b"\x00")  # socks4a hostname
+            i = proxy_index("x://" + user + ":")
+            if i is None:
+                writer.write(b"\x00\x5b" + b"\x00" * 6); writer.close(); return
+            await self._relay(i, self.profile(i), reader, writer, b"\x00\x5a" + b"\x00" * 6)
+        await self._guard(run(), writer)
+
+    async def start(self):
+        for name, handler in (("target", _serve_target), ("http", self.serve_http),
+                              ("socks4", self.serve_socks4), ("socks5", self.serve_socks5)):
+            srv = await asyncio.start_server(handler, FARM_HOST, 0, limit=MAX_HEAD, backlog=4096)
+            self.ports[name] = srv.sockets[0].getsockname()[1]
+        return self.ports
+
+def _farm_main(spec, q):
+    from hydra_async import raise_nofile_limit
+    raise_nofile_limit(32768)
+    loop = asyncio.new_event_loop()
+    q.put(loop.run_until_complete(Farm(spec).start()))
+    loop.run_forever()
+
+def start_farm(spec, workers=1):
+    """เปิด farm workers process ละ event loop - return: (processes, [ports ของแต่ละ worker])"""
+    ctx = multiprocessing.get_context("spawn")
+    q = ctx.Queue()
+    procs = [ctx.Process(target=_farm_main, args=(spec, q), daemon=True) for _ in range(max(1, workers))]
+    for p in procs: p.start()
+    return procs, [q.get(timeout=30) for _ in procs]
+
+# ---------- one measured run (fresh process: peak RSS / CPU belong to this run only) ----------
+
+@contextmanager
+def plain_http_presets():
+    """https presets -> http ระหว่าง bench (farm ไม่มี cert, TLS จริงไม่ได้วัดในนี้) แล้วคืนค่าเดิม"""
+    import hydra_core
+    saved = {k: p["url"] for k, p in hydra_core.TARGET_PRESETS.items()}
+    for p in hydra_core.TARGET_PRESETS.values():
+        if p["url"].startswith("https://"): p["url"] = "http://" + p["url"][len("https://"):]
+    try:
+        yield
+    finally:
+        for k, url in saved.items(): hydra_core.TARGET_PRESETS[k]["url"] = url
+
+def _rusage():
+    try:
+        import resource
+    except ImportError:  # Windows: CPU only
+        return time.process_time(), None
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return ru.ru_utime + ru.ru_stime, ru.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+def _bench_child(conf, q):
+    from hydra_core import Checker
+    from hydra_export import ExportSink
+    from hydra_geo import GeoCache, GeoResolver
+    from hydra_history import History
+    from hydra_input import ProxySource
+    from hydra_store import ResultStore
+
+    n, tmp = conf["n"], conf["tmp"]
+    with plain_http_presets():
+        # same pieces HydraFinal.worker wires up: geo cache + history + export + ResultStore (files in a temp dir)
+        history = History(os.path.join(tmp, f"history-{conf['engine']}-{n}.db"))
+        checker = Checker(conf["target"], conf["url"], concurrency=conf["concurrency"], engine=conf["engine"],
+                          probe_timeout=conf["timeout"], enrich_timeout=conf["timeout"],
+                          geo=GeoResolver(GeoCache(os.path.join(tmp, f"geo-{conf['engine']}-{n}.json"))),
+                          history=history)
+        # the farm has no quota: per-minute caps would measure the cap, not the checker (in-flight caps stay)
+        checker.limits = {h: (None, inflight) for h, (_, inflight) in checker.limits.items()}
+        export = ExportSink(os.path.join(tmp, f"results-{conf['engine']}-{n}.ndjson"))
+        store, lock = ResultStore(), threading.Lock()
+        measured = array("d", [math.nan]) * n
+
+        def on_result(p, avg, proxy_data):
+            export.write(p, avg, proxy_data)
+            if avg is None: return
+            with lock: store.add(p, avg, proxy_data)
+            i = proxy_index(p)
+            if i is not None and i < n: measured[i] = avg
+
+        cpu0, rss0 = _rusage()
+        st = time.perf_counter()
+        checker.run(ProxySource(conf["path"]), on_result)
+        took = time.perf_counter() - st
+        cpu1, rss1 = _rusage()
+        export.close(); history.close()
+    q.put({"engine": conf["engine"], "n": n, "checked": checker.checked, "alive": checker.alive,
+           "seconds": took, "cpu": cpu1 - cpu0, "rss_base": rss0, "rss_peak": rss1,
+           "measured": measured.tobytes()})
+
+def run_one(conf):
+    ctx = multiprocessing.get_context("spawn")
+    q = ctx.Queue()
+    p = ctx.Process(target=_bench_child, args=(conf, q))
+    p.start()
+    res = q.get()  # before join: a big payload would block the child's exit
+    p.join()
+    return res
+
+def accuracy(spec, measured, target_key=""):
+    """
+    เทียบผลกับที่ farm ตั้งไว้: ตัวที่ควรรอด (ไม่ dead / blackhole / โดน captcha ถ้า target เป็น Amazon) หาเจอกี่ตัว, ตัวตายที่ถูกนับว่า alive
+    และ latency ที่วัดได้ (median) ต่างจาก latency ที่ตั้งเท่าไร (ms)
+    """
+    live = found = false_alive = 0
+    errs = []
+    for i, got in enumerate(measured):
+        prof = profile(spec, i)
+        ok = not (prof.dead or prof.blackhole or (prof.blocked and target_key == "Amazon (Target Test)"))
+        live += ok
+        if math.isnan(got): continue
+        if not ok:
+            false_alive += 1; continue
+        found += 1
+        errs.append((got - prof.latency) * 1000)
+    abs_errs = sorted(abs(e) for e in errs)
+    return {"live": live, "found": found, "false_alive": false_alive,
+            "err_bias_ms": median(errs), "err_mean_ms": sum(abs_errs) / len(abs_errs) if abs_errs else None,
+            "err_p95_ms": percentile(abs_errs, 0.95)}
+
+def _fmt(v, spec=".1f"):
+    return "-" if v is None else format(v, spec)
+
+def build_parser():
+    from hydra_cli import resolve_target
+    ap = argparse.ArgumentParser(prog="hydra_bench", description="HYDRA checker benchmark against a local fake proxy farm")
+    ap.add_argument("--sizes", default=",".join(map(str, BENCH_SIZES)), help="proxy counts, comma separated")
+    ap.add_argument("--engines", default="thread,async", help="engines to run, comma separated")
+    ap.add_argument("-t", "--target", type=resolve_target, default="Google (Standard)", help="target preset (GGL/HBN/GEO/AMZ/JDG/CUS)")
+    ap.add_argument("-u", "--url", default="", help="custom target URL (implies --target CUS)")
+    ap.add_argument("-c", "--concurrency", type=int, default=200, help="thread engine workers (default 200)")
+    ap.add_argument("--async-concurrency", type=int, default=1000, help="async engine in-flight checks (default 1000)")
+    ap.add_argument("--timeout", type=float, default=3.0, help="probe / enrich timeout seconds (bounds the black holes)")
+    ap.add_argument("--latency", type=float, default=80, help="median proxy latency ms")
+    ap.add_argument("--spread", type=float, default=0.5, help="lognormal sigma of latency across proxies")
+    ap.add_argument("--jitter", type=float, default=20, help="+/- ms per request")
+    ap.add_argument("--dead", type=float, default=0.3, help="fraction refusing connections")
+    ap.add_argument("--blackhole", type=float, default=0.02, help="fraction accepting and never answering")
+    ap.add_argument("--fail", type=float, default=0.02, help="per-request drop probability of live proxies")
+    ap.add_argument("--transparent", type=float, default=0.2, help="fraction leaking X-Forwarded-For / Via")
+    ap.add_argument("--blocked", type=float, default=0.1, help="fraction whose exit gets Amazon's captcha page")
+    ap.add_argument("--protocols", default="http,socks4,socks5", help="proxy types in the farm")
+    ap.add_argument("--farm-workers", type=int, default=max(1, min(4, (os.cpu_count() or 2) // 2)),
+                    help="farm processes (keep the farm from being the bottleneck)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", action="store_true", help="one JSON object per run on stdout instead of the table")
+    return ap
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    target = "Custom URL" if args.url else args.target
+    protocols = tuple(p.strip() for p in args.protocols.split(",") if p.strip())
+    if not protocols or any(p not in SCHEMES for p in protocols):
+        sys.exit(f"hydra_bench: --protocols takes {', '.join(SCHEMES)}")
+    spec = farm_spec(args.seed, args.latency / 1000, args.spread, args.jitter / 1000, args.dead, args.blackhole,
+                     args.fail, args.transparent, args.blocked, protocols)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+
+    procs, ports = start_farm(spec, args.farm_workers)
+    refused = closed_port()
+    print(f"farm: {len(procs)} worker(s), {', '.join(protocols)} | latency {args.latency:.0f}ms x e^N(0,{args.spread}) "
+          f"+/-{args.jitter:.0f}ms | dead {args.dead:.0%} blackhole {args.blackhole:.0%} fail {args.fail:.0%}/req | "
+          f"target {target}", file=sys.stderr)
+    if not args.json:
+        print(f"{'engine':<7} {'proxies':>8} {'sec':>8} {'px/s':>8} {'cpu s':>8} {'cpu%':>6} {'rss MB':>8} "
+              f"{'alive':>13} {'false':>6} {'err ms':>7} {'p95':>7} {'bias':>7}")
+    try:
+        with tempfile.TemporaryDirectory(prefix="hydra_bench_") as tmp:
+            for n in sizes:
+                path = os.path.join(tmp, f"proxies-{n}.txt")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.writelines(proxy_line(spec, i, ports, refused) + "\n" for i in range(n))
+                for engine in engines:
+                    res = run_one({"n": n, "path": path, "tmp": tmp, "engine": engine, "target": target, "url": args.url,
+                                   "concurrency": args.async_concurrency if engine == "async" else args.concurrency,
+                                   "timeout": args.timeout})
+                    measured = array("d"); measured.frombytes(res.pop("measured"))
+                    res.update(accuracy(spec, measured, target), rate=res["checked"] / res["seconds"] if res["seconds"] else 0.0)
+                    if args.json:
+                        print(json.dumps(res), flush=True); continue
+                    rss = res["rss_peak"] / 2**20 if res["rss_peak"] else None
+                    print(f"{engine:<7} {n:>8} {res['seconds']:>8.1f} {res['rate']:>8.1f} {res['cpu']:>8.1f} "
+                          f"{res['cpu'] / res['seconds'] if res['seconds'] else 0:>6.0%} {_fmt(rss):>8} "
+                          f"{res['found']:>6}/{res['live']:<6} {res['false_alive']:>6} {_fmt(res['err_mean_ms']):>7} "
+                          f"{_fmt(res['err_p95_ms']):>7} {_fmt(res['err_bias_ms'], '+.1f'):>7}", flush=True)
+    finally:
+        for p in procs: p.terminate()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
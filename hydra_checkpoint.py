@@ -0,0 +1,132 @@
+import json, os, threading, time
+
+from hydra_input import proxy_key, key_hash, HashSet64
+
+# --- Checkpoint / resume: low-water mark over the input + results so far (NDJSON), START picks up where it died ---
+
+CHECKPOINT_PATH = "hydra_checkpoint.json"
+CHECKPOINT_INTERVAL = 10.0  # seconds between checkpoints (results are fsync'd first, then the position)
+
+def input_fingerprint(path):
+    """ไฟล์ input เดียวกัน = path + ขนาด + mtime เท่าเดิม (แก้ไฟล์แล้ว resume ไม่ได้)"""
+    st = os.stat(path)
+    return {"input": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime_ns}
+
+class Checkpoint:
+    """
+    ตำแหน่งใน input + ผลที่ได้แล้วของ run ยาวๆ
+    low_water: บรรทัดลำดับ 0..low_water-1 (หลังตัดว่าง / ซ้ำ) เสร็จครบแล้ว - resume ข้ามไปได้เลยไม่ต้อง hash
+    ผลทุกตัวต่อท้ายใน <path>.ndjson (รวมตัวที่เสร็จก่อนถึง low_water ด้วย -> ตัวพวกนั้นก็ไม่ถูกเช็คซ้ำ)
+    บันทึกทุก interval วินาที และตอน STOP / error, run จบครบแล้วลบทิ้ง
+    """
+    def __init__(self, path=CHECKPOINT_PATH, input_path=None, target="", dedup=True, interval=CHECKPOINT_INTERVAL):
+        self.path = path
+        self.results_path = os.path.splitext(path)[0] + ".ndjson"
+        self.meta = dict(input_fingerprint(input_path) if input_path else {"input": None}, target=target, dedup=dedup)
+        self.interval = interval
+        self.low_water = 0
+        self.resumed = 0  # results replayed from the previous run
+        self._done_keys = None  # keys finished past the stored low-water mark (resume only)
+        self._done_above = set()  # finished indexes >= low_water (bounded by what is in flight)
+        self._pending = {}  # line -> [indexes] handed out and not finished yet
+        self._out = None
+        self._saved = time.monotonic()
+        self._lock = threading.Lock()
+
+    def stored(self):
+        """low_water ของ checkpoint เดิมที่ input + target ตรงกัน หรือ None"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if any(meta.get(k) != v for k, v in self.meta.items()) or not os.path.exists(self.results_path):
+            return None
+        return meta.get("low_water", 0)
+
+    def discard(self):
+        for path in (self.path, self.results_path):
+            try: os.remove(path)
+            except OSError: pass
+
+    def open(self, replay=None):
+        """
+        เริ่ม run: ถ้ามี checkpoint เดิม -> replay(p, avg, proxy_data) ผลเดิมทุกตัว แล้วเขียนต่อท้าย
+        ไม่มี (หรือไม่ตรง input / target) -> เริ่มใหม่
+        """
+        low = self.stored()
+        if low is None:
+            self.discard()
+            self._out = open(self.results_path, "w", encoding="utf-8")
+            self.save()
+            return
+        done, good = HashSet64(), 0
+        with open(self.results_path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # torn last line from a crash: cut it off below
+                try:
+                    r = json.loads(raw)
+                except ValueError:
+                    break
+                good += len(raw)
+                done.add(key_hash(proxy_key(r["proxy"]) or r["proxy"]))
+                self.resumed += 1
+                if replay: replay(r["proxy"], r["latency"], r["data"])
+        self._out = open(self.results_path, "a", encoding="utf-8")
+        self._out.truncate(good)
+        self.low_water, self._done_keys = low, done
+
+    def track(self, lines):
+        """ให้เลขลำดับทุกบรรทัด ข้ามตัวที่เสร็จใน run ก่อน แล้ว yield ตัวที่ต้องเช็ค"""
+        for i, p in enumerate(lines):
+            if i < self.low_water:
+                continue
+            with self._lock:
+                if self._done_keys is not None and key_hash(proxy_key(p) or p) in self._done_keys:
+                    self._finish(i); continue
+                self._pending.setdefault(p, []).append(i)
+            yield p
+
+    def _finish(self, i):
+        self._done_above.add(i)
+        while self.low_water in self._done_above:
+            self._done_above.discard(self.low_water); self.low_water += 1
+
+    def record(self, p, avg, proxy_data):
+        """ผลของบรรทัดที่ track() ส่งออกไป (ผลที่ replay มาไม่นับ) - บันทึก checkpoint ตามรอบ"""
+        with self._lock:
+            idx = self._pending.get(p)
+            if not idx or self._out is None:
+                return
+            i = idx.pop(0)
+            if not idx: del self._pending[p]
+            self._out.write(json.dumps({"proxy": p, "latency": avg, "data": proxy_data},
+                                       ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._finish(i)
+            due = time.monotonic() - self._saved >= self.interval
+        if due: self.save()
+
+    def save(self):
+        with self._lock:
+            if self._out is None: return
+            # results hit the disk before the position that claims them
+            self._out.flush(); os.fsync(self._out.fileno())
+            meta = dict(self.meta, low_water=self.low_water, ts=time.time())
+            self._saved = time.monotonic()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.path)
+
+    def close(self, complete=False):
+        """complete=True (เช็คครบทุกบรรทัด) -> ลบ checkpoint, ไม่งั้นบันทึกไว้ให้ resume"""
+        if self._out is None: return
+        if complete:
+            with self._lock:
+                self._out.close(); self._out = None
+            self.discard()
+            return
+        self.save()
+        with self._lock:
+            self._out.close(); self._out = None
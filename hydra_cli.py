@@ -0,0 +1,324 @@
+import argparse, json, os, secrets, sys, threading, time
+
+from hydra_core import (TARGET_PRESETS, TARGET_SHORT, ENGINES, PROBE_TIMEOUT, ENRICH_TIMEOUT, PRESCREEN_TIMEOUT,
+                        PRESCREEN_CONCURRENCY, PROBE_COUNT, PROBE_MIN_OK, JUDGE_KEY, Checker, result_badges, target_url,
+                        matrix_badges, matrix_name, parse_matrix)
+from hydra_input import ProxySource
+from hydra_geo import GEO_CACHE_PATH, GEO_DB_PATH, load_resolver
+from hydra_history import HISTORY_PATH, HISTORY_TTL, History
+from hydra_checkpoint import CHECKPOINT_PATH, Checkpoint
+from hydra_export import ExportSink, render_report
+from hydra_shard import SHARD_PORT, SHARD_TOKEN, exposed
+from hydra_pool import POOL_PORT, POOL_INTERVAL, POOL_INTERVAL_MAX, POOL_TOKEN, Pool, PoolDaemon, PoolServer, parse_listen
+from hydra_adapt import ADAPT_MAX
+from hydra_metrics import format_bytes
+from hydra_gateway import GATEWAY_PORT, GATEWAY_CAP, GATEWAY_AUTH, Gateway, format_stats
+from hydra_telemetry import METRICS_PORT, DUMP_PATH, DUMP_INTERVAL, METRICS_TOKEN, MetricsDump, MetricsServer
+from hydra_judge import unreachable
+
+# --- Headless entry point: same Checker / hot loop as the Tk app, results streamed to stdout ---
+# python hydra_cli.py proxies.txt -t GEO -c 200 --engine async --format json
+
+def resolve_target(name):
+    """รับได้ทั้งชื่อเต็มใน TARGET_PRESETS และตัวย่อ (GGL/HBN/GEO/AMZ/CUS)"""
+    for key, short in TARGET_SHORT.items():
+        if name.lower() in (key.lower(), short.lower()):
+            return key
+    raise argparse.ArgumentTypeError(f"unknown target {name!r} (choose from {', '.join(TARGET_SHORT.values())})")
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog="hydra_cli", description="HYDRA proxy checker (no GUI)")
+    ap.add_argument("input", nargs="?", default="-", help="proxy list file, '-' = stdin (default)")
+    ap.add_argument("-t", "--target", type=resolve_target, default="Google (Standard)",
+                    help="target preset: " + ", ".join(f"{v}={k}" for k, v in TARGET_SHORT.items()))
+    ap.add_argument("-u", "--url", default="", help="custom target URL (implies --target CUS)")
+    ap.add_argument("-m", "--matrix", default="", metavar="TARGETS",
+                    help="also probe alive proxies once against these, e.g. HBN,AMZ,https://example.com (dead ones are skipped)")
+    ap.add_argument("-c", "--concurrency", type=int, default=20, help="threads / in-flight checks (default 20)")
+    ap.add_argument("-e", "--engine", choices=ENGINES, default="thread")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="treat -c as the starting point and move it to the knee (AIMD on completions/s, timeouts, latency)")
+    ap.add_argument("--concurrency-max", type=int, default=None,
+                    help=f"--adaptive ceiling (default {ADAPT_MAX['thread']} thread / {ADAPT_MAX['async']} async)")
+    ap.add_argument("--timeout", type=float, default=PROBE_TIMEOUT, help="probe timeout seconds")
+    ap.add_argument("--enrich-timeout", type=float, default=ENRICH_TIMEOUT, help="anonymity/geo timeout seconds")
+    ap.add_argument("--min-ok", type=int, default=PROBE_MIN_OK,
+                    help=f"probes (of {PROBE_COUNT}) that must pass for ALIVE; the first always must (default {PROBE_MIN_OK})")
+    ap.add_argument("--rate", type=float, default=None, metavar="PER_MIN",
+                    help="requests/minute to the target host (default: the preset's, e.g. ip-api 45)")
+    ap.add_argument("--max-inflight", type=int, default=None, help="requests in flight to the target host at once")
+    ap.add_argument("--frugal", action="store_true",
+                    help="pay-per-GB proxies: HEAD / Range / capped bodies where the target allows, 2 redirects max")
+    ap.add_argument("--no-prescreen", action="store_true", help="skip the raw connect / SOCKS greeting pre-screen")
+    ap.add_argument("--prescreen-timeout", type=float, default=PRESCREEN_TIMEOUT, help="pre-screen connect timeout seconds")
+    ap.add_argument("--prescreen-concurrency", type=int, default=PRESCREEN_CONCURRENCY, help="pre-screen sockets at once")
+    ap.add_argument("-f", "--format", choices=("text", "json"), default="text", help="stdout format (json = NDJSON)")
+    ap.add_argument("--alive-only", action="store_true", help="don't print DEAD lines")
+    ap.add_argument("--no-dedup", action="store_true", help="check duplicate entries again")
+    ap.add_argument("--export", default="", metavar="FILE",
+                    help="append every result to FILE while running: .ndjson / .csv (+ .gz) / .parquet (needs pyarrow)")
+    ap.add_argument("--report", default="", metavar="FILE",
+                    help="write the fixed-width ALIVE report + GEO SUMMARY to FILE at the end (rendered from --export)")
+    ap.add_argument("--history", nargs="?", const=HISTORY_PATH, default=None, metavar="DB",
+                    help=f"record every result in a SQLite history (default file {HISTORY_PATH})")
+    ap.add_argument("--incremental", action="store_true",
+                    help="only re-check entries whose history is older than --ttl (dead ones back off); implies --history")
+    ap.add_argument("--ttl", type=float, default=HISTORY_TTL, help=f"history freshness in seconds (default {HISTORY_TTL})")
+    ap.add_argument("--checkpoint", nargs="?", const=CHECKPOINT_PATH, default=None, metavar="FILE",
+                    help=f"save position + results periodically and resume a matching unfinished run (default file {CHECKPOINT_PATH})")
+    ap.add_argument("--restart", action="store_true", help="ignore an existing checkpoint and start from line 1")
+    ap.add_argument("--shards", type=int, default=1,
+                    help="worker processes on this box, proxies split by hash of host:port (default 1 = in-process)")
+    ap.add_argument("--listen", default=None, metavar="ADDR",
+                    help=f"accept remote workers on ADDR (host:port or unix:/path, e.g. 0.0.0.0:{SHARD_PORT})")
+    ap.add_argument("--remote", type=int, default=0,
+                    help="remote workers to wait for (python hydra_shard.py worker --connect ADDR) before starting")
+    ap.add_argument("--shard-token", default=None,
+                    help="shared secret remote workers must present (default $HYDRA_SHARD_TOKEN, "
+                         "a random one is printed if --listen is reachable from other hosts)")
+    ap.add_argument("--daemon", default=None, metavar="ADDR",
+                    help=f"keep re-checking the list on a schedule and answer /best?n=&country=&anon= queries on ADDR "
+                         f"(host:port, e.g. 127.0.0.1:{POOL_PORT})")
+    ap.add_argument("--daemon-token", default=POOL_TOKEN,
+                    help="daemon: bearer token every query must present (default $HYDRA_POOL_TOKEN), "
+                         "required when ADDR is not loopback")
+    ap.add_argument("--interval", type=float, default=POOL_INTERVAL,
+                    help=f"daemon: re-check an alive proxy after this many seconds, doubling while it stays alive (default {POOL_INTERVAL})")
+    ap.add_argument("--interval-max", type=float, default=POOL_INTERVAL_MAX,
+                    help=f"daemon: longest wait between checks of a healthy proxy (default {POOL_INTERVAL_MAX})")
+    ap.add_argument("--gateway", default=None, metavar="ADDR",
+                    help=f"serve a rotating HTTP CONNECT + SOCKS5 proxy on ADDR (e.g. 127.0.0.1:{GATEWAY_PORT}) over the alive "
+                         "proxies as they are found; keeps running after the check until Ctrl+C")
+    ap.add_argument("--gateway-auth", default=GATEWAY_AUTH, metavar="USER:PASS",
+                    help="gateway: credential clients must present (default $HYDRA_GATEWAY_AUTH), "
+                         "required when ADDR is not loopback")
+    ap.add_argument("--gateway-cap", type=int, default=GATEWAY_CAP,
+                    help=f"gateway: connections at once through one upstream proxy (default {GATEWAY_CAP})")
+    ap.add_argument("--metrics", default=None, metavar="ADDR",
+                    help=f"serve live run metrics on ADDR: /metrics (Prometheus text) and /metrics.json "
+                         f"(e.g. 127.0.0.1:{METRICS_PORT})")
+    ap.add_argument("--metrics-token", default=METRICS_TOKEN,
+                    help="metrics: bearer token a scraper must present (default $HYDRA_METRICS_TOKEN), "
+                         "required when ADDR is not loopback")
+    ap.add_argument("--metrics-dump", nargs="?", const=DUMP_PATH, default=None, metavar="FILE",
+                    help=f"append a metrics snapshot to an NDJSON file every --metrics-every seconds (default file {DUMP_PATH})")
+    ap.add_argument("--metrics-every", type=float, default=DUMP_INTERVAL,
+                    help=f"seconds between --metrics-dump lines (default {DUMP_INTERVAL:g})")
+    ap.add_argument("--geo-cache", default=GEO_CACHE_PATH, help=f"exit-IP geo/anonymity cache file (default {GEO_CACHE_PATH})")
+    ap.add_argument("--no-geo-cache", action="store_true", help="don't read or write the exit-IP cache")
+    ap.add_argument("--geo-db", default=GEO_DB_PATH, help=f"offline GeoIP range CSV, used if it exists (default {GEO_DB_PATH})")
+    return ap
+
+def format_line(fmt, target_key, p, avg, proxy_data):
+    if fmt == "json":
+        if avg is None:
+            return json.dumps({"proxy": p, "alive": False, "error": (proxy_data or {}).get("error")}, ensure_ascii=False)
+        return json.dumps(dict(proxy_data, alive=True), ensure_ascii=False)
+    if avg is None:
+        return f"DEAD\t{p}\t{(proxy_data or {}).get('error', '')}"
+    tgt_badge, anon_status, country_display = result_badges(target_key, proxy_data)
+    p95 = proxy_data.get('latency_p95')
+    return (f"ALIVE\t{p}\t{avg:.3f}s\tp95={p95 if p95 is not None else avg:.3f}s\t"
+            f"ok={proxy_data.get('success_ratio', 1.0):.0%}\ths={proxy_data.get('handshake', 0):.3f}s\t"
+            f"{tgt_badge}\t{anon_status}\t{country_display}" + (f"\t{matrix_badges(proxy_data)}" if proxy_data.get("matrix") else ""))
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    target_key = "Custom URL" if args.url else args.target
+    if target_key == "Custom URL" and not args.url:
+        sys.exit("hydra_cli: --url is required for the Custom URL target")
+    if target_key not in TARGET_PRESETS:
+        sys.exit(f"hydra_cli: unknown target {target_key!r}")
+
+    try:
+        matrix = parse_matrix(args.matrix)
+    except ValueError as e:
+        sys.exit(f"hydra_cli: {e}")
+    if target_key == JUDGE_KEY and os.path.isfile(args.input):
+        # a judge on 127.0.0.1 never hears from proxies on other hosts: every one of them would come back DEAD
+        with open(args.input, encoding="utf-8", errors="replace") as f:
+            problem = unreachable(target_url(target_key), f)
+        if problem:
+            sys.exit(f"hydra_cli: {problem}")
+    if args.remote and not args.listen:
+        sys.exit("hydra_cli: --remote workers need an address to dial, add --listen HOST:PORT")
+    shard_token = SHARD_TOKEN if args.shard_token is None else args.shard_token
+    if args.listen and not shard_token and exposed(args.listen):
+        # an open port hands proxies to whoever dials in: make up a secret the workers have to present
+        shard_token = secrets.token_urlsafe(16)
+        print(f"shard token: {shard_token} (python hydra_shard.py worker --connect ADDR --token {shard_token})",
+              file=sys.stderr)
+    if args.daemon and (args.checkpoint or args.report or args.incremental or args.input == "-"):
+        sys.exit("hydra_cli: --daemon needs an input file and can't be combined with --checkpoint / --report / --incremental")
+    if args.report and not args.export:
+        sys.exit("hydra_cli: --report is rendered from the export file, add --export FILE")
+    try:
+        export = ExportSink(args.export) if args.export else None
+    except (ValueError, ImportError) as e:
+        sys.exit(f"hydra_cli: {e}")
+
+    checkpoint = None
+    if args.checkpoint:
+        if args.input == "-":
+            sys.exit("hydra_cli: --checkpoint needs an input file (stdin can't be resumed)")
+        checkpoint = Checkpoint(args.checkpoint, args.input,
+                                target=" ".join([target_url(target_key, args.url)] + [matrix_name(*m) for m in matrix]),
+                                dedup=not args.no_dedup)
+        low = checkpoint.stored()
+        if args.restart:
+            checkpoint.discard()
+        elif low is not None:
+            print(f"resuming from {args.checkpoint}: {low} lines done", file=sys.stderr)
+
+    history = None
+    if args.history or args.incremental:
+        history = History(args.history or HISTORY_PATH, ttl=args.ttl)
+    checker = Checker(target_key, args.url, concurrency=args.concurrency, engine=args.engine,
+                      probe_timeout=args.timeout, enrich_timeout=args.enrich_timeout,
+                      prescreen=not args.no_prescreen, prescreen_concurrency=args.prescreen_concurrency,
+                      prescreen_timeout=args.prescreen_timeout,
+                      geo=load_resolver(None if args.no_geo_cache else args.geo_cache, args.geo_db),
+                      rate_per_min=args.rate, max_inflight=args.max_inflight,
+                      history=history, incremental=args.incremental, min_ok=args.min_ok, checkpoint=checkpoint,
+                      shards=args.shards, listen=args.listen, remote=args.remote, shard_token=shard_token,
+                      matrix=matrix, adaptive=args.adaptive, concurrency_max=args.concurrency_max, frugal=args.frugal)
+    if args.adaptive:
+        checker.on_adapt = lambda old, new, reason: print(f"CONCURRENCY {old} -> {new}: {reason}", file=sys.stderr)
+    out_lock = threading.Lock()
+    gateway = None
+    if args.gateway:
+        try:
+            gateway = Gateway(*parse_listen(args.gateway, GATEWAY_PORT), cap=args.gateway_cap,
+                              auth=args.gateway_auth).start()
+        except (OSError, ValueError) as e:
+            sys.exit(f"hydra_cli: --gateway {args.gateway}: {e}")
+        print(f"gateway on {gateway.url} (HTTP CONNECT / SOCKS5), upstreams join as they are found alive", file=sys.stderr)
+    telemetry = start_telemetry(args, checker)
+
+    def on_result(p, avg, proxy_data):
+        if export is not None: export.write(p, avg, proxy_data)
+        if gateway is not None: gateway.update(p, avg, proxy_data)
+        if avg is None and args.alive_only:
+            return
+        line = format_line(args.format, target_key, p, avg, proxy_data)
+        with out_lock:
+            sys.stdout.write(line + "\n"); sys.stdout.flush()
+
+    src = ProxySource(sys.stdin if args.input == "-" else args.input, dedup=not args.no_dedup)
+    if args.daemon:
+        return run_daemon(args, checker, src, history, export, target_key, gateway, telemetry)
+    st = time.time()
+    # run off the main thread so Ctrl+C lands here and can stop the checker cleanly
+    t = threading.Thread(target=checker.run, args=(src, on_result), daemon=True)
+    t.start()
+    try:
+        wait(t, gateway)
+    except KeyboardInterrupt:
+        checker.stop(); t.join()
+    took = time.time() - st
+    print(f"DONE: {checker.checked} checked | ALIVE: {checker.alive} | DEAD: {checker.dead} | "
+          f"DUP: {src.duplicates} | REUSED: {history.fresh if history else 0} | "
+          f"RESUMED: {checkpoint.resumed if checkpoint else 0} | {took:.1f}s ({checker.checked / took if took else 0:.1f}/s) | "
+          f"rate-limit wait: {checker.limiter.waited if checker.limiter else 0:.1f}s"
+          + (f" | {checker.adapt.status()}" if checker.adapt is not None else ""), file=sys.stderr)
+    if len(checker.latency_hist):
+        lat = checker.latency_hist.summary()
+        print(f"LATENCY (alive): p50 {lat['p50']:.3f}s | p90 {lat['p90']:.3f}s | p99 {lat['p99']:.3f}s | "
+              f"min {lat['min']:.3f}s | max {lat['max']:.3f}s", file=sys.stderr)
+    if checker.traffic.requests:
+        tr = checker.traffic
+        print(f"TRAFFIC: {format_bytes(tr.total)} (sent {format_bytes(tr.bytes_sent)} / recv {format_bytes(tr.bytes_recv)}) | "
+              f"{tr.requests:,} requests, {format_bytes(tr.per_request())}/request", file=sys.stderr)
+    print_diagnostics(checker.metrics.snapshot())
+    for tel in telemetry: tel.stop()
+    if history is not None: history.close()
+    if gateway is not None:
+        print(f"check done, gateway keeps serving on {gateway.url} (Ctrl+C to quit)", file=sys.stderr)
+        try:
+            wait(None, gateway)
+        except KeyboardInterrupt:
+            pass
+        gateway.stop()
+    if export is not None:
+        export.close()
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                render_report(export.path, f, "STOPPED" if checker.stop_requested else "COMPLETED",
+                              target_key, args.url)
+    return 0 if checker.alive else 1
+
+def start_telemetry(args, checker):
+    """--metrics / --metrics-dump -> list ของ MetricsServer / MetricsDump ที่เปิดแล้ว (ปิดตอนจบ run)"""
+    telemetry = []
+    if args.metrics:
+        try:
+            srv = MetricsServer(checker, *parse_listen(args.metrics, METRICS_PORT), token=args.metrics_token).start()
+        except (OSError, ValueError) as e:
+            sys.exit(f"hydra_cli: --metrics {args.metrics}: {e}")
+        telemetry.append(srv)
+        print(f"metrics on {srv.url}/metrics (Prometheus) and {srv.url}/metrics.json", file=sys.stderr)
+    if args.metrics_dump:
+        try:
+            telemetry.append(MetricsDump(checker, args.metrics_dump, max(0.5, args.metrics_every)).start())
+        except OSError as e:
+            sys.exit(f"hydra_cli: --metrics-dump {args.metrics_dump}: {e}")
+    return telemetry
+
+def print_diagnostics(snap):
+    """ERRORS: dead แยกตามประเภท, PHASES: เวลากลาง / p99 ของแต่ละช่วง - ดูว่าเวลาหมดไปกับอะไร"""
+    if snap["errors"] or snap["internal_errors"]:
+        total = sum(snap["errors"].values()) or 1
+        print("ERRORS: " + " | ".join(f"{c} {n:,} ({n / total:.0%})" for c, n in snap["errors"].items())
+              + (f" | INTERNAL {snap['internal_errors']} (last: {snap['last_internal_error']})"
+                 if snap["internal_errors"] else ""), file=sys.stderr)
+    if snap["phases"]:
+        print("PHASES (p50 / p99): " + " | ".join(f"{ph} {s['p50']:.3f}s / {s['p99']:.3f}s"
+                                                  for ph, s in snap["phases"].items()), file=sys.stderr)
+
+def wait(t, gateway=None, every=10):
+    """รอ thread t จบ (None = รอจน Ctrl+C) - มี gateway ก็พิมพ์ RPS / bandwidth ที่วัดได้จริงทุก every วินาที"""
+    last = time.monotonic()
+    while t is None or t.is_alive():
+        if t is not None: t.join(0.5)
+        else: time.sleep(0.5)
+        if gateway is not None and time.monotonic() - last >= every:
+            last = time.monotonic()
+            print(format_stats(gateway.stats()), file=sys.stderr)
+
+def run_daemon(args, checker, src, history, export, target_key, gateway=None, telemetry=()):
+    """--daemon: pool ถาวร เช็คซ้ำตามคิว + HTTP query จนกด Ctrl+C"""
+    pool = Pool(interval=args.interval, interval_max=max(args.interval, args.interval_max))
+    pool.add(src)
+    if history is not None:
+        pool.restore(history, target_url(target_key, args.url))  # a restarted daemon picks up where it was
+        if gateway is not None:
+            gateway.load((r["proxy"], r["latency"], r) for r in pool.best(len(pool)))
+    def on_result(p, avg, proxy_data):
+        if export is not None: export.write(p, avg, proxy_data)
+        if gateway is not None: gateway.update(p, avg, proxy_data)
+    def on_round(n, alive, took):
+        st = pool.stats()
+        print(f"ROUND {pool.rounds}: {n} checked | ALIVE: {alive} | {took:.1f}s | {format_bytes(checker.traffic.total)} | "
+              f"pool {st['alive']}/{st['size']} alive | "
+              f"next due in {max(0.0, (st['next_due'] or time.time()) - time.time()):.0f}s", file=sys.stderr)
+    daemon = PoolDaemon(checker, pool, on_result=on_result, on_round=on_round)
+    try:
+        srv = PoolServer(pool, *parse_listen(args.daemon, POOL_PORT), daemon=daemon, token=args.daemon_token).start()
+    except (OSError, ValueError) as e:
+        sys.exit(f"hydra_cli: --daemon {args.daemon}: {e}")
+    print(f"pool of {len(pool)} proxies, queries on {srv.url}/best?n=10&country=TH&anon=anonymous", file=sys.stderr)
+    t = threading.Thread(target=daemon.run, daemon=True)
+    t.start()
+    try:
+        wait(t, gateway)
+    except KeyboardInterrupt:
+        daemon.stop(); t.join()
+    srv.stop()
+    for tel in telemetry: tel.stop()
+    if gateway is not None: gateway.stop()
+    if history is not None: history.close()
+    if export is not None: export.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
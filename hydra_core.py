@@ -0,0 +1,989 @@
+import requests, ipaddress, os, socket, time, threading, weakref, zlib
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+
+from hydra_limit import Cancelled, HostLimiter, hold
+from hydra_adapt import ADAPT_MAX, AdaptiveLimit
+from hydra_metrics import LatencyHistogram, RunMetrics, Traffic, latency_stats, median
+
+# --- Core Logic (no Tk here: shared by the GUI and every check engine) ---
+JUDGE_URL = os.environ.get("HYDRA_JUDGE_URL", "http://127.0.0.1:8899/judge")
+JUDGE_KEY = "Judge (Anonymity + Exit IP)"
+
+TARGET_PRESETS = {
+    "Google (Standard)": {
+        "url": "http://google.com/generate_204",
+        "purpose": "stability/latency",
+        "method": "GET",
+        "rate_per_min": None,   # per destination host, shared by every worker / lane
+        "max_inflight": 200,
+        "frugal": {"method": "HEAD"},  # frugal mode (request_plan): the status is all we look at
+    },
+    "HttpBin (Anonymity)": {
+        "url": "https://httpbin.org/get",
+        "purpose": "connectivity + anonymity check",
+        "method": "GET",
+        "rate_per_min": None,
+        "max_inflight": 50,     # free public service: falls over under a 200-thread burst
+        "frugal": {"cap": 2048},     # the /get echo is ~400 B (matrix mode parses it)
+    },
+    "IP-API (Geolocation)": {
+        "url": "http://ip-api.com/json/?fields=status,country,countryCode,city,isp,query",
+        "purpose": "connectivity + geo info",
+        "method": "GET",
+        "rate_per_min": 45,     # ip-api free tier; over it answers turn into "Unknown"
+        "max_inflight": 10,
+        "frugal": {"cap": 1024},
+    },
+    "Amazon (Target Test)": {
+        "url": "https://www.amazon.com/robots.txt",
+        "purpose": "anti-bot / blacklist smoke test",
+        "method": "GET",
+        "rate_per_min": 120,
+        "max_inflight": 20,
+        "frugal": {"cap": 5000, "range": True},  # classify_target reads the first 5000 chars only
+    },
+    "Judge (Anonymity + Exit IP)": {
+        # hydra_judge.py: started in-process when this points at localhost, or deployed by us elsewhere
+        "url": JUDGE_URL,
+        "purpose": "liveness + anonymity + exit IP (+geo) in one request",
+        "method": "GET",
+        "rate_per_min": None,   # our own server: no limit
+        "max_inflight": None,
+        "frugal": {"cap": 2048},
+    },
+    "Custom URL": {
+        "url": "",
+        "purpose": "custom",
+        "method": "GET",
+        "rate_per_min": None,   # override via Checker(rate_per_min=..., max_inflight=...) / CLI --rate / --max-inflight
+        "max_inflight": None,
+    },
+}
+
+TARGET_SHORT = {
+    "Google (Standard)": "GGL",
+    "HttpBin (Anonymity)": "HBN",
+    "IP-API (Geolocation)": "GEO",
+    "Amazon (Target Test)": "AMZ",
+    "Judge (Anonymity + Exit IP)": "JDG",
+    "Custom URL": "CUS",
+}
+
+# enrichment endpoints (kept in one place so every engine hits the same ones)
+# /get instead of /headers: same headers echo plus `origin`, so one request also yields the exit IP
+ANON_URL = "http://httpbin.org/get"
+GEO_URL = "http://ip-api.com/json/?fields=status,country,countryCode,city,isp,query"
+
+# headers that give the proxy away (parse_anonymous and the judge classify by the same list)
+REVEALING_HEADERS = ("X-Forwarded-For", "X-Real-Ip", "Via")
+
+PROBE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "*/*",
+}
+
+PROBE_TIMEOUT = 6
+ENRICH_TIMEOUT = 5
+PROBE_COUNT = 3
+PROBE_MIN_OK = 2              # alive if this many probes pass (the first one must: it proves the proxy works at all)
+PRESCREEN_TIMEOUT = 3         # raw connect / SOCKS greeting timeout of the pre-screen stage
+PRESCREEN_CONCURRENCY = 2000  # sockets the pre-screen keeps open at once
+MAX_REDIRECTS = 30            # requests default
+FRUGAL_BODY_CAP = 4096        # frugal mode: body bytes read per response unless the preset says otherwise
+FRUGAL_REDIRECTS = 2          # frugal mode: redirects followed per request
+BODY_CHUNK = 1024             # streamed body read size (the cap overshoots by at most this)
+
+def request_plan(target_key="", frugal=False, method="GET"):
+    """
+    วิธียิง URL หนึ่งครั้ง -> (method, headers เพิ่ม, cap ของ body เป็นไบต์ / None = ทั้งหมด, redirect สูงสุด)
+    frugal: HEAD / Range / ตัด body ตามที่ preset ของ target ยอม (enrichment = target_key ว่าง ใช้ FRUGAL_BODY_CAP)
+    """
+    if not frugal:
+        return method, {}, None, MAX_REDIRECTS
+    f = (TARGET_PRESETS.get(target_key) or {}).get("frugal") or {}
+    if f.get("method") == "HEAD":
+        return "HEAD", {}, 0, FRUGAL_REDIRECTS
+    cap = f.get("cap", FRUGAL_BODY_CAP)
+    return method, ({"Range": f"bytes=0-{cap - 1}"} if f.get("range") else {}), cap, FRUGAL_REDIRECTS
+
+def unknown_geo():
+    return {'country': 'Unknown', 'country_code': '', 'city': '', 'isp': ''}
+
+def parse_anonymous(resp):
+    """แปลผล httpbin /get (หรือ /headers) -> (is_anon, anon_type)"""
+    if resp.status_code == 200:
+        data = resp.json()
+        headers = data.get('headers', {})
+        # ตรวจสอบว่ามี X-Forwarded-For, X-Real-Ip, หรือ Via headers หรือไม่
+        # ถ้ามี headers เหล่านี้ แสดงว่า proxy ไม่ anonymous
+        if any(h in headers for h in REVEALING_HEADERS):
+            return False, "Transparent"
+        return True, "Anonymous"
+    return None, "Unknown"
+
+def parse_geo(resp):
+    """แปลผล ip-api -> geo dict (None ถ้าใช้ไม่ได้)"""
+    if resp.status_code == 200:
+        data = resp.json()
+        if data.get('status') == 'success':
+            return {
+                'country': data.get('country', 'Unknown'),
+                'country_code': data.get('countryCode', ''),
+                'city': data.get('city', ''),
+                'isp': data.get('isp', '')
+            }
+    return None
+
+def parse_exit_ip(resp):
+    """exit IP จาก httpbin /get (origin ตัวสุดท้าย) หรือ ip-api (query) - '' ถ้าไม่มี"""
+    try:
+        data = resp.json()
+        return (data.get('query') or data.get('origin') or '').split(',')[-1].strip()
+    except (ValueError, AttributeError):
+        return ''
+
+def host_limits(target_key, custom_url="", rate_per_min=None, max_inflight=None):
+    """
+    limits ต่อ host สำหรับ HostLimiter: ค่าเริ่มต้นของทุก preset (enrichment ใช้ host เดียวกับ HttpBin / IP-API)
+    rate_per_min / max_inflight (ถ้าให้มา) ทับค่าของ host ของ target ที่เลือก
+    return: {host: (rate_per_min, max_inflight)}
+    """
+    limits = {}
+    for preset in TARGET_PRESETS.values():
+        if preset.get("url"):
+            limits[HostLimiter.host(preset["url"])] = (preset.get("rate_per_min"), preset.get("max_inflight"))
+    url = target_url(target_key, custom_url)
+    if url and (rate_per_min is not None or max_inflight is not None):
+        r, n = limits.get(HostLimiter.host(url), (None, None))
+        limits[HostLimiter.host(url)] = (rate_per_min if rate_per_min is not None else r,
+                                         max_inflight if max_inflight is not None else n)
+    return limits
+
+def target_url(target_key, custom_url=""):
+    preset = TARGET_PRESETS.get(target_key) or TARGET_PRESETS["Google (Standard)"]
+    return (custom_url or "").strip() if target_key == "Custom URL" else preset.get("url", "")
+
+def classify_target(target_key, url, resp):
+    """
+    แปลผล response ของ target (ใช้ได้ทั้ง requests.Response และ response ของ async engine)
+    return: (ok: bool, status_code: int|None, extra: dict)
+    """
+    extra = {"target_url": url}
+
+    # Google: 204 is ideal, but <400 is fine
+    if target_key == "Google (Standard)":
+        extra["google_status"] = resp.status_code
+        return (resp.status_code < 400), resp.status_code, extra
+
+    # HttpBin: connectivity here; anonymity checked separately via /headers
+    if target_key == "HttpBin (Anonymity)":
+        extra["httpbin_status"] = resp.status_code
+        return (resp.status_code == 200), resp.status_code, extra
+
+    # IP-API: if success, we can extract geo directly from response
+    if target_key == "IP-API (Geolocation)":
+        extra["ipapi_status"] = resp.status_code
+        if resp.status_code == 200:
+            try:
+                data = resp.json()
+                if data.get("status") == "success":
+                    extra.update({
+                        "country": data.get("country", "Unknown"),
+                        "country_code": data.get("countryCode", ""),
+                        "city": data.get("city", ""),
+                        "isp": data.get("isp", ""),
+                        "exit_ip": data.get("query", ""),
+                    })
+                    return True, resp.status_code, extra
+            except (ValueError, AttributeError):
+                pass
+        return False, resp.status_code, extra
+
+    # Amazon: very rough anti-bot smoke test (robots.txt is lightweight)
+    if target_key == "Amazon (Target Test)":
+        extra["amazon_status"] = resp.status_code
+        body = (resp.text or "")[:5000].lower()
+        is_captcha = ("captcha" in body) or ("robot check" in body) or ("enter the characters you see" in body)
+        is_block = resp.status_code in (403, 429, 503) or is_captcha
+        extra["amazon_blocked"] = bool(is_block)
+        extra["amazon_signal"] = "captcha" if is_captcha else ("status_block" if resp.status_code in (403, 429, 503) else "ok")
+        return (not is_block and resp.status_code < 400), resp.status_code, extra
+
+    # Judge: exit IP + anonymity (+ geo if the judge has an offline DB) straight from the probe response
+    if target_key == JUDGE_KEY:
+        extra["judge_status"] = resp.status_code
+        if resp.status_code == 200:
+            try:
+                data = resp.json()
+                if data.get("ip"):
+                    anon = data.get("anon", "Unknown")
+                    extra.update({"exit_ip": data["ip"], "anon_type": anon,
+                                  "anonymous": {"Anonymous": True, "Transparent": False}.get(anon)})
+                    geo = data.get("geo") or {}
+                    if geo.get("country"):
+                        extra.update({k: geo.get(k, "") for k in ("country", "country_code", "city", "isp")})
+                    return True, resp.status_code, extra
+            except (ValueError, AttributeError):
+                pass
+        return False, resp.status_code, extra
+
+    # Custom URL: consider <400 ok
+    extra["custom_status"] = resp.status_code
+    return (resp.status_code < 400), resp.status_code, extra
+
+# signals a matrix cell keeps from the target's classify_target extra (beyond ok / status / latency)
+MATRIX_KEYS = ("amazon_blocked", "anonymous", "anon_type", "exit_ip", "country_code")
+
+def parse_matrix(items):
+    """
+    รายการ target ของ matrix mode: ชื่อเต็ม / ตัวย่อ (GGL,HBN,AMZ ...) หรือ URL (= Custom URL)
+    รับได้ทั้ง string คั่นด้วย , และ list - return: [(target_key, custom_url)]
+    """
+    if isinstance(items, str):
+        items = items.split(",")
+    out = []
+    for item in items:
+        item = item.strip()
+        if not item: continue
+        if "://" in item:
+            out.append(("Custom URL", item)); continue
+        key = next((k for k, short in TARGET_SHORT.items() if item.lower() in (k.lower(), short.lower())), None)
+        if key is None or key == "Custom URL":
+            raise ValueError(f"unknown matrix target {item!r} (use {', '.join(v for v in TARGET_SHORT.values() if v != 'CUS')} or a URL)")
+        out.append((key, ""))
+    return out
+
+def matrix_name(target_key, custom_url=""):
+    return (custom_url or "").strip() if target_key == "Custom URL" else TARGET_SHORT.get(target_key, target_key)
+
+def matrix_cell(target_key, ok, sc, extra, latency=None, resp=None):
+    """ช่องหนึ่งของ matrix: ok / status / latency (+ blocked / anonymity / exit IP ของ target นั้น) หรือประเภท error"""
+    extra = extra or {}
+    cell = {"ok": ok, "status": sc, "latency": latency}
+    if sc is None:
+        cell["error"] = error_class(probe_error(sc, extra))
+    cell.update((k, extra[k]) for k in MATRIX_KEYS if k in extra)
+    if ok and resp is not None and target_key == "HttpBin (Anonymity)":
+        try:
+            cell["anonymous"], cell["anon_type"] = parse_anonymous(resp)
+        except Exception:
+            pass
+    return cell
+
+def matrix_plan(target_key, custom_url, matrix):
+    """target ของ matrix ที่ยังต้อง probe (ตัดตัวที่ซ้ำกับ target หลักออก)"""
+    primary = matrix_name(target_key, custom_url)
+    return [(k, u) for k, u in matrix if matrix_name(k, u) != primary]
+
+def probe_matrix(sess, matrix, timeout=ENRICH_TIMEOUT, limiter=None):
+    """proxy ที่ผ่าน probe แล้ว: ยิง target อื่นๆ ใน matrix ครั้งละ 1 request บน session เดิม -> {ชื่อ: cell}"""
+    grid = {}
+    for key, url in matrix:
+        ok, sc, extra, resp = probe_target(sess, key, url, timeout, limiter)
+        grid[matrix_name(key, url)] = matrix_cell(key, ok, sc, extra, resp.took if resp is not None else None, resp)
+    return grid
+
+def probe_target(sess, target_key, custom_url="", timeout=PROBE_TIMEOUT, limiter=None):
+    """probe target 1 ครั้ง (response คืนมาด้วยให้ขั้น enrichment ใช้ต่อได้) - return: (ok, status_code, extra, resp)"""
+    url = target_url(target_key, custom_url)
+    if not url:
+        return False, None, {"error": "empty_target_url"}, None
+    try:
+        with hold(limiter, url):
+            resp = sess.fetch(url, timeout, PROBE_HEADERS, target_key)
+        return classify_target(target_key, url, resp) + (resp,)
+    except Exception as e:
+        return False, None, {"target_url": url, "error": error_text(e)}, None
+
+def parse_proxy(r):
+    r = r.strip()
+    if not r: return None
+    if r.count(':') >= 4 and "://" in r:
+        proto, rest = r.split("://", 1)
+        p = rest.split(':')
+        return f"{proto}://{p[2]}:{p[3]}@{p[0]}:{p[1]}"
+    if r.count(':') == 3 and "://" not in r and "@" not in r:
+        # host:port:user:pass without a scheme
+        p = r.split(':')
+        return f"http://{p[2]}:{p[3]}@{p[0]}:{p[1]}"
+    return r if "://" in r else f"http://{r}"
+
+def is_loopback(host):
+    """host อยู่บนเครื่องนี้เท่านั้น (127.0.0.0/8, ::1, localhost) - เครื่องอื่นเข้าไม่ถึง"""
+    host = (host or "").strip("[]").lower()
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def enrich_plan(target_key, extra):
+    """
+    เลือกว่าต้องเช็คอะไรเพิ่มหลัง probe ผ่าน
+    return: (need_anon, need_geo, geo_from_target)
+    """
+    if target_key == "HttpBin (Anonymity)":
+        return True, False, None
+    if target_key in ("IP-API (Geolocation)", JUDGE_KEY):
+        # prefer parsed data from the target call if present; fallback to old function
+        # (the judge already answered anonymity, so only geo can still be missing)
+        if extra and extra.get("country") and extra.get("country") != "Unknown":
+            return False, False, {
+                "country": extra.get("country", "Unknown"),
+                "country_code": extra.get("country_code", ""),
+                "city": extra.get("city", ""),
+                "isp": extra.get("isp", ""),
+            }
+        return False, True, None
+    if target_key == "Amazon (Target Test)":
+        # also keep basic geo for display
+        return False, True, None
+    # default: keep both checks like before (useful overall)
+    return True, True, None
+
+def enrich_steps(target_key, extra, resolver=None):
+    """
+    ขั้น enrichment แบบไม่ผูกกับ I/O (ใช้ร่วมกันทั้งสอง engine):
+    yield tuple ของ URL ที่ต้องดึง (ดึงพร้อมกันได้) แล้วรับ tuple ของ response กลับ (None = ล้มเหลว)
+    resolver (hydra_geo.GeoResolver): ถ้ารู้ exit IP แล้วเจอใน cache / offline DB ก็ไม่ต้องยิงผ่าน proxy
+    return: (is_anon, anon_type, geo_info, exit_ip)
+    """
+    need_anon, need_geo, geo_info = enrich_plan(target_key, extra)
+    extra = extra or {}
+    exit_ip = extra.get("exit_ip", "")
+    is_anon, anon_type = extra.get("anonymous"), extra.get("anon_type", "Unknown")  # judge answers it up front
+    if resolver is None:
+        urls = (ANON_URL,) * need_anon + (GEO_URL,) * need_geo
+        if urls:
+            resps = yield urls
+            if need_anon and resps[0] is not None:
+                try: is_anon, anon_type = parse_anonymous(resps[0])
+                except (ValueError, AttributeError): pass
+                exit_ip = exit_ip or parse_exit_ip(resps[0])
+            if need_geo and resps[-1] is not None:
+                try: geo_info = parse_geo(resps[-1])
+                except (ValueError, AttributeError): pass
+                exit_ip = exit_ip or parse_exit_ip(resps[-1])
+        return is_anon, anon_type, geo_info or unknown_geo(), exit_ip
+
+    resolver.remember(exit_ip, geo=geo_info, anon=(is_anon, anon_type))
+    want_anon = need_anon
+    if need_anon and (cached := resolver.anon(exit_ip)):
+        (is_anon, anon_type), need_anon = cached, False
+    if need_geo and (cached := resolver.geo(exit_ip)):
+        geo_info, need_geo = cached, False
+    if need_anon or (need_geo and not exit_ip and resolver.db is not None):
+        # one httpbin /get = headers (anonymity) + origin (exit IP); the IP then resolves geo without ip-api
+        (resp,) = yield (ANON_URL,)
+        if resp is not None:
+            try: anon = parse_anonymous(resp)
+            except (ValueError, AttributeError): anon = (None, "Unknown")
+            exit_ip = exit_ip or parse_exit_ip(resp)
+            resolver.remember(exit_ip, anon=anon)
+            if want_anon: is_anon, anon_type = anon
+            if need_geo and (cached := resolver.geo(exit_ip)):
+                geo_info, need_geo = cached, False
+    if need_geo:
+        (resp,) = yield (GEO_URL,)
+        if resp is not None:
+            try: geo_info = parse_geo(resp)
+            except (ValueError, AttributeError): pass
+            exit_ip = exit_ip or parse_exit_ip(resp)
+            resolver.remember(exit_ip, geo=geo_info)
+    return is_anon, anon_type, geo_info or unknown_geo(), exit_ip
+
+def drive_enrich(steps, fetch):
+    """ขับ enrich_steps แบบ blocking: fetch(url) ทีละ URL"""
+    try:
+        urls = next(steps)
+        while True:
+            resps = []
+            for url in urls:
+                try: resps.append(fetch(url))
+                except Exception: resps.append(None)
+            urls = steps.send(tuple(resps))
+    except StopIteration as e:
+        return e.value
+
+def split_handshake(s):
+    """
+    แยกเวลา handshake (TCP + proxy + TLS) ออกจาก latency ของ request
+    probe แรกจ่าย handshake, probe ถัดไปวิ่งบน keep-alive connection เดิม
+    return: (handshake, avg latency ต่อ request)
+    """
+    steady = sum(s[1:]) / (len(s) - 1) if len(s) > 1 else s[0]
+    handshake = max(0.0, s[0] - steady)
+    return handshake, (sum(s) - handshake) / len(s)
+
+def timing_data(samples, attempts, handshake, phases):
+    """
+    สถิติเวลาของ probe ที่ผ่าน -> latency (median) / latency_min / latency_p95 / success_ratio / handshake / timings
+    samples ไม่รวม handshake, phases = dict เวลาแต่ละช่วงต่อ probe
+    timings: connect / proxy / tls จาก probe ที่เปิด connection, ttfb / body = median ทุก probe
+    """
+    stats = latency_stats(samples, attempts)
+    stats["handshake"] = handshake
+    opened = max(phases, key=lambda ph: ph.get("connect") or 0.0) if phases else {}
+    stats["timings"] = {
+        "connect": opened.get("connect"), "proxy": opened.get("proxy"), "tls": opened.get("tls"),
+        "ttfb": median([ph["ttfb"] for ph in phases if ph.get("ttfb") is not None]),
+        "body": median([ph["body"] for ph in phases if ph.get("body") is not None]),
+    }
+    return stats
+
+def build_proxy_data(p, avg, is_anon, anon_type, geo_info, target_info, handshake=0.0, stats=None):
+    """รวมผลของ proxy ที่ผ่าน เป็น dict เดียว (รูปแบบเดียวกับที่เก็บใน alive_list)"""
+    proxy_data = {
+        'proxy': p,
+        'latency': avg,
+        'handshake': handshake,
+    }
+    for k in ('latency_min', 'latency_p95', 'success_ratio', 'timings'):
+        if stats and k in stats:
+            proxy_data[k] = stats[k]
+    proxy_data.update({
+        'anonymous': is_anon,
+        'anon_type': anon_type,
+        'country': geo_info.get('country', 'Unknown'),
+        'country_code': geo_info.get('country_code', ''),
+        'city': geo_info.get('city', ''),
+        'isp': geo_info.get('isp', '')
+    })
+    proxy_data.update(target_info)
+    return proxy_data
+
+# coarse error classes, first match wins (kept in history / summaries instead of raw exception text)
+# matched against "ExceptionType: message" (error_text), so the type name counts too
+ERROR_CLASSES = (
+    ("stopped", ("stopped",)),
+    ("captcha", ("captcha",)),
+    # 407 is the proxy asking for credentials, not the target's 4xx (bare "407" would also hit port numbers)
+    ("proxy_auth", ("auth failed", "authentication", "auth method", "status 407", ": 407")),
+    ("http_5xx", ("status 5",)),
+    ("http_4xx", ("status 4",)),
+    ("dns", ("getaddrinfo", "name or service", "nodename", "name resolution", "failed to resolve", "gaierror")),
+    ("read_timeout", ("read timed out", "read timeout", "readtimeout")),
+    ("connect_timeout", ("timed out", "timeout")),  # TCP / proxy handshake / TLS handshake
+    ("tls", ("ssl", "certificate", "tls")),
+    ("refused", ("refused", "connect call failed")),
+    ("reset", ("reset", "closed", "aborted", "broken pipe", "eof")),
+    ("proxy", ("socks", "proxy", "connect")),
+    ("status", ("status ",)),
+)
+TIMEOUT_ERRORS = ("connect_timeout", "read_timeout")  # what the adaptive limit counts as congestion
+
+def error_text(e):
+    """exception -> "ชื่อ type: ข้อความ" (ชื่อ type บอกประเภทได้ตอนข้อความว่าง เช่น asyncio TimeoutError)"""
+    return f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+
+def error_class(err):
+    """ข้อความ error -> ประเภทสั้นๆ"""
+    e = (err or "").lower()
+    for cls, words in ERROR_CLASSES:
+        if any(w in e for w in words):
+            return cls
+    return "other"
+
+def dead_data(err, traffic=None):
+    """proxy_data ของตัวที่ dead: ประเภท error (+ ไบต์ที่เสียไปกับมัน)"""
+    return dict({"error": error_class(err)}, **(traffic.data() if traffic is not None and traffic.requests else {}))
+
+def probe_error(sc, extra):
+    """เหตุผลที่ probe ไม่ผ่าน (ข้อความ error หรือ status ที่ target ตอบ)"""
+    extra = extra or {}
+    if extra.get("error"):
+        return extra["error"]
+    if extra.get("amazon_signal") == "captcha":
+        return f"captcha (status {sc})"
+    return f"status {sc}" if sc is not None else "failed"
+
+class Aborter:
+    """
+    connection ที่ thread engine ใช้อยู่ (session จาก new_session) - abort() ตอน STOP:
+    shutdown socket ที่ค้างรอ response ทันที (ไม่ต้องรอ timeout) และไม่ให้หยิบ connection ใหม่อีก
+    """
+    def __init__(self):
+        self.aborted = False
+        self._conns = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def track(self, conn):
+        if self.aborted:
+            raise Cancelled("stopped")
+        with self._lock:
+            self._conns.add(conn)
+
+    def abort(self):
+        self.aborted = True
+        with self._lock:
+            conns = list(self._conns)
+        for conn in conns:
+            sock = getattr(conn, "sock", None)
+            if sock is not None:
+                try: sock.shutdown(socket.SHUT_RDWR)  # wakes the worker blocked in recv()
+                except OSError: pass
+
+class _AbortableAdapter(HTTPAdapter):
+    # urllib3 only tracks idle connections, so every one a pool hands out is registered with the aborter
+    def __init__(self, aborter):
+        self.aborter = aborter
+        super().__init__()
+
+    def get_connection_with_tls_context(self, *args, **kwargs):
+        pool = super().get_connection_with_tls_context(*args, **kwargs)
+        if "_get_conn" not in vars(pool):
+            get_conn, track = pool._get_conn, self.aborter.track
+            def _get_conn(timeout=None):
+                conn = get_conn(timeout)
+                track(conn)
+                return conn
+            pool._get_conn = _get_conn
+        return pool
+
+def _request_size(req, proxy_url):
+    # request line + Host + headers as http.client writes them, + body
+    sp = urlsplit(req.url)
+    forward = sp.scheme == "http" and urlsplit(proxy_url or "").scheme in ("http", "https")
+    head = f"{req.method} {req.url if forward else req.path_url} HTTP/1.1\r\nHost: {sp.netloc}\r\n"
+    head += "".join(f"{k}: {v}\r\n" for k, v in req.headers.items()) + "\r\n"
+    user, pwd = requests.utils.get_auth_from_url(proxy_url or "")
+    if forward and user:
+        head += f"Proxy-Authorization: {requests.auth._basic_auth_str(user, pwd)}\r\n"
+    body = req.body or b""
+    return len(head.encode("latin-1", "replace")) + len(body.encode() if isinstance(body, str) else body)
+
+def _response_size(resp, wire=None):
+    # status line + header lines as received, + body bytes pulled off the wire (still compressed)
+    r = getattr(resp.raw, "_original_response", None)
+    head = len(f"HTTP/1.1 {r.status} {r.reason}\r\n") + sum(len(k) + len(v) + 4 for k, v in r.msg.items()) + 2 if r else 0
+    return head + (wire if wire is not None else resp.raw.tell())
+
+def inflate(body, enc):
+    """แตก gzip / deflate (ใช้ decompressobj: body ที่ถูกตัดตาม cap ก็แตกได้เท่าที่มี)"""
+    if enc == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(body)
+    if enc == "deflate":
+        try:
+            return zlib.decompressobj().decompress(body)
+        except zlib.error:
+            return zlib.decompressobj(-zlib.MAX_WBITS).decompress(body)
+    return body
+
+class ProbeSession(requests.Session):
+    """
+    requests.Session ของการเช็ค proxy 1 ตัว: fetch() อ่าน body แบบ stream ไม่เกิน cap, redirect จำกัด, นับไบต์ลง traffic
+    frugal=True ใช้ HEAD / Range / cap ตาม preset ของ target (request_plan)
+    """
+    def __init__(self, frugal=False, traffic=None):
+        super().__init__()
+        self.headers["Accept-Encoding"] = "gzip, deflate"  # what fetch() inflates itself (same as the async engine)
+        self.frugal = frugal
+        self.traffic = traffic if traffic is not None else Traffic()
+
+    def fetch(self, url, timeout, headers=None, target_key=""):
+        method, extra, cap, self.max_redirects = request_plan(target_key, self.frugal)
+        if extra:
+            headers = dict(headers or {}, **extra)
+        proxy_url = self.proxies.get(urlsplit(url).scheme)
+        st = time.perf_counter()  # after any limiter wait: only the request itself is timed
+        try:
+            resp = self.request(method, url, timeout=timeout, headers=headers, stream=True, allow_redirects=True)
+        except requests.TooManyRedirects as e:
+            self._count(e.response.history + [e.response], proxy_url)  # the hops were downloaded all the same
+            raise
+        body, wire, done = [], 0, True
+        try:
+            # raw (still compressed) chunks: the cap and the count are in bytes on the wire
+            for chunk in resp.raw.stream(BODY_CHUNK, decode_content=False):
+                body.append(chunk); wire += len(chunk)
+                if cap is not None and wire >= cap:
+                    done = resp.raw.length_remaining == 0
+                    break
+            resp._content = inflate(b"".join(body), resp.headers.get("content-encoding", "").lower())
+            resp._content_consumed = done
+            resp.took = time.perf_counter() - st  # request -> body read (handshake included, as one number)
+        finally:
+            self._count(resp.history, proxy_url)
+            self.traffic.add(_request_size(resp.request, proxy_url), _response_size(resp, wire))
+            resp.close()  # the rest of a capped body is never read: that connection is dropped, not pooled
+        return resp
+
+    def _count(self, resps, proxy_url):
+        for r in resps:
+            self.traffic.add(_request_size(r.request, proxy_url), _response_size(r))
+
+def new_session(aborter=None, frugal=False, traffic=None):
+    """ProbeSession สำหรับเช็ค proxy 1 ตัว (aborter: STOP ตัด connection ได้ทันที, traffic: Traffic ที่นับไบต์ลงไป)"""
+    sess = ProbeSession(frugal, traffic)
+    if aborter is not None:
+        adapter = _AbortableAdapter(aborter)
+        sess.mount("http://", adapter); sess.mount("https://", adapter)
+    return sess
+
+def probe_proxy(p, target_key, custom_url="", stopped=lambda: False, probe_timeout=PROBE_TIMEOUT, limiter=None,
+                min_ok=PROBE_MIN_OK, aborter=None, frugal=False, traffic=None):
+    """
+    ขั้นที่ 1 ของ check_proxy: probe target PROBE_COUNT ครั้งบน Session เดียว (ผ่าน >= min_ok ครั้ง = alive)
+    traffic (hydra_metrics.Traffic): ไบต์ของทุก request ของ proxy ตัวนี้ถูกนับลงไป (ตัวที่ dead ก็ด้วย)
+    return: ((sess, stats, last_probe), None) ถ้าผ่าน (sess ยังเปิดไว้ให้ enrich_proxy ใช้ต่อ, stats จาก timing_data)
+            (None, error) ถ้า dead
+    """
+    u = parse_proxy(p); s = []; phases = []; attempts = fails = 0; last = None; err = "stopped"
+    sess = new_session(aborter, frugal, traffic)
+    try:
+        sess.proxies = {"http": u, "https": u}
+        for _ in range(PROBE_COUNT):
+            if stopped(): break
+            attempts += 1
+            try:
+                ok, sc, extra, resp = probe_target(sess, target_key, custom_url=custom_url, timeout=probe_timeout,
+                                                   limiter=limiter)
+                if ok:
+                    s.append(resp.took); last = (ok, sc, extra)  # took starts once the limiter let the request go
+                    # requests' elapsed = send -> headers parsed (per hop); the rest of took is the body
+                    ttfb = sum(r.elapsed.total_seconds() for r in resp.history + [resp])
+                    phases.append({"ttfb": ttfb, "body": max(0.0, resp.took - ttfb)})
+                    continue
+                err = probe_error(sc, extra)
+            except Exception as e:
+                err = error_text(e)
+            fails += 1
+            # the first probe gates liveness; after that a flaky probe is tolerated while min_ok is still reachable
+            if not s or fails > PROBE_COUNT - min_ok: break
+        if len(s) >= min_ok and not stopped():
+            # requests doesn't expose TCP / proxy / TLS separately: "connect" is the whole setup the first probe paid
+            handshake, _ = split_handshake(s)
+            s[0] -= handshake
+            phases[0]["ttfb"] = max(0.0, phases[0]["ttfb"] - handshake)
+            phases[0].update(connect=handshake, proxy=None, tls=None)
+            keep, sess = sess, None  # handed over to enrich_proxy, which closes it
+            return (keep, timing_data(s, attempts, handshake, phases), last), None
+    except Exception as e:
+        err = error_text(e)
+    finally:
+        if sess is not None: sess.close()
+    return None, err
+
+def enrich_proxy(p, probed, target_key, enrich_timeout=ENRICH_TIMEOUT, geo=None, limiter=None, matrix=()):
+    """ขั้นที่ 2: anonymity / geo ของ proxy ที่ probe ผ่านแล้ว (ปิด session ให้) - return: (p, avg, proxy_data)"""
+    sess, stats, last = probed
+    avg = stats["latency"]
+    try:
+        with sess:
+            # target-specific enrichment: reuse the last timing probe instead of probing again
+            ok2, sc2, extra2 = last
+            target_info = {"target": target_key, "target_ok": ok2, "target_status": sc2}
+            target_info.update(extra2 if isinstance(extra2, dict) else {})
+
+            def fetch(url):
+                with hold(limiter, url):
+                    return sess.fetch(url, enrich_timeout)
+            # ตรวจสอบ anonymous / geo ตาม target ที่เลือก (exit IP ที่เคยเจอแล้วตอบจาก cache / offline DB)
+            is_anon, anon_type, geo_info, exit_ip = drive_enrich(enrich_steps(target_key, extra2, geo), fetch)
+            if exit_ip: target_info["exit_ip"] = exit_ip
+            if matrix:
+                # the proxy is known alive: every other target costs one request on the same session
+                target_info["matrix"] = dict({matrix_name(target_key, (extra2 or {}).get("target_url", "")):
+                                              matrix_cell(target_key, ok2, sc2, extra2, avg)},
+                                             **probe_matrix(sess, matrix, enrich_timeout, limiter))
+            proxy_data = build_proxy_data(p, avg, is_anon, anon_type, geo_info, target_info, stats["handshake"], stats)
+            proxy_data.update(sess.traffic.data())
+            return p, avg, proxy_data
+    except Exception as e:
+        return p, None, dead_data(error_text(e), sess.traffic)
+
+def check_proxy(p, target_key, custom_url="", stopped=lambda: False,
+                probe_timeout=PROBE_TIMEOUT, enrich_timeout=ENRICH_TIMEOUT, geo=None, limiter=None,
+                min_ok=PROBE_MIN_OK, aborter=None, matrix=(), frugal=False):
+    """
+    เช็ค proxy 1 ตัวแบบ blocking (ใช้ใน ThreadPoolExecutor)
+    ทุก request ใช้ Session เดียว -> 1 keep-alive connection ต่อ target host ตลอดการเช็ค
+    return: (p, avg, proxy_data) ถ้า alive, (p, None, {"error": ประเภท error}) ถ้า dead
+    """
+    traffic = Traffic()
+    probed, err = probe_proxy(p, target_key, custom_url, stopped, probe_timeout, limiter, min_ok, aborter, frugal, traffic)
+    if probed is None:
+        return p, None, dead_data(err, traffic)
+    return enrich_proxy(p, probed, target_key, enrich_timeout, geo, limiter, matrix_plan(target_key, custom_url, matrix))
+
+def matrix_badges(proxy_data):
+    """ป้ายของ matrix เช่น 'GGL:OK HBN:ANON AMZ:BLK' ('' ถ้าไม่ได้ใช้ matrix mode)"""
+    out = []
+    for name, cell in ((proxy_data or {}).get("matrix") or {}).items():
+        if cell.get("amazon_blocked"): state = "BLK"
+        elif not cell.get("ok"): state = "NO" if cell.get("status") is not None else cell.get("error", "ERR").upper()
+        elif cell.get("anon_type") in ("Anonymous", "Transparent"): state = "ANON" if cell["anon_type"] == "Anonymous" else "TRANS"
+        else: state = "OK"
+        out.append(f"{urlsplit(name).hostname or name if '://' in name else name}:{state}")
+    return " ".join(out)
+
+def result_badges(target_key, proxy_data):
+    """ป้ายสำหรับแสดงผล -> (tgt_badge, anon_status, country_display)"""
+    target_short = TARGET_SHORT.get(target_key, "TGT")
+    is_anon, anon_type = proxy_data.get('anonymous'), proxy_data.get('anon_type')
+    country = proxy_data.get('country', 'Unknown')
+    country_code = proxy_data.get('country_code', '')
+    city = proxy_data.get('city', '')
+
+    anon_status = "ANON" if is_anon else ("TRANS" if anon_type == "Transparent" else "UNK")
+    country_display = f"{country} ({country_code})" if country_code else country
+    if city:
+        country_display += f" - {city}"
+
+    tgt_badge = target_short
+    if target_key == "Amazon (Target Test)":
+        if proxy_data.get("amazon_blocked") is True:
+            tgt_badge = f"{target_short}:BLK"
+        elif proxy_data.get("target_ok") is True:
+            tgt_badge = f"{target_short}:OK"
+    elif proxy_data.get("target_ok") is True:
+        tgt_badge = f"{target_short}:OK"
+    elif proxy_data.get("target_ok") is False:
+        tgt_badge = f"{target_short}:NO"
+    return tgt_badge, anon_status, country_display
+
+ENGINES = ("thread", "async")
+
+class Checker:
+    """
+    ตัวเช็ค proxy แบบไม่มี GUI (ใช้ร่วมกันทั้ง Tk, CLI และโปรแกรมอื่น)
+    run(lines, on_result) เรียก on_result(p, avg, proxy_data) ทุกตัวที่เช็คเสร็จ - avg=None คือ dead (proxy_data = {"error": ...})
+    """
+    def __init__(self, target_key="Google (Standard)", custom_url="", concurrency=20, engine="thread",
+                 probe_timeout=PROBE_TIMEOUT, enrich_timeout=ENRICH_TIMEOUT,
+                 prescreen=True, prescreen_concurrency=PRESCREEN_CONCURRENCY, prescreen_timeout=PRESCREEN_TIMEOUT,
+                 geo=None, rate_per_min=None, max_inflight=None, history=None, incremental=False,
+                 min_ok=PROBE_MIN_OK, checkpoint=None, shards=1, listen=None, remote=0, shard_token=None, matrix=(),
+                 adaptive=False, concurrency_max=None, frugal=False):
+        if engine not in ENGINES:
+            raise ValueError(f"unknown engine: {engine!r} (use one of {', '.join(ENGINES)})")
+        self.target_key = target_key
+        self.custom_url = (custom_url or "").strip()
+        self.concurrency = max(1, int(concurrency))
+        self.engine = engine
+        self.probe_timeout = probe_timeout
+        self.enrich_timeout = enrich_timeout
+        self.prescreen = prescreen
+        self.prescreen_concurrency = max(1, int(prescreen_concurrency))
+        self.prescreen_timeout = prescreen_timeout
+        self.geo = geo  # hydra_geo.GeoResolver (exit-IP cache + offline DB) or None
+        # per-host limits: preset defaults, rate_per_min / max_inflight override the target's host
+        self.limits = host_limits(self.target_key, self.custom_url, rate_per_min, max_inflight)
+        self.limiter = None
+        self.history = history          # hydra_history.History: every result is recorded
+        self.incremental = incremental  # ... and results still fresh there are reused instead of re-checked
+        self.min_ok = max(1, min(PROBE_COUNT, int(min_ok)))
+        self.latency_hist = LatencyHistogram()  # run-wide latency of alive proxies (p50 / p99 without the samples)
+        self.checkpoint = checkpoint    # hydra_checkpoint.Checkpoint: position + results saved, START resumes
+        self.aborter = None
+        self._pools = []  # thread engine executors: STOP drops their queued work
+        self.shards = max(0, int(shards))  # local worker processes: > 1 (or remote workers) = sharded run (hydra_shard)
+        self.listen = listen               # address remote workers dial: hydra_shard.py worker --connect ADDR
+        self.remote = max(0, int(remote))  # remote workers to wait for before starting
+        self.shard_token = shard_token
+        # matrix mode: alive proxies are also probed once against each of these (dead ones never are)
+        self.matrix = matrix_plan(self.target_key, self.custom_url, parse_matrix(matrix) if isinstance(matrix, str) else
+                                  [tuple(m) for m in matrix])
+        # adaptive: concurrency is only the starting point, hydra_adapt moves it between 1 and concurrency_max
+        self.adaptive = adaptive
+        self.concurrency_max = max(self.concurrency, int(concurrency_max or ADAPT_MAX[engine]))
+        self.adapt = None      # AdaptiveLimit of the current run
+        self.on_adapt = None   # on_adapt(old, new, reason) whenever the limit moves
+        self.frugal = frugal   # HEAD / Range / capped bodies / few redirects (request_plan) - pay-per-GB proxies
+        self.traffic = Traffic()  # bytes this run pushed through the proxies (history reuse not counted)
+        self.metrics = RunMetrics()  # live gauges / error classes / per-phase histograms (hydra_telemetry serves them)
+
+        self.stop_requested = False
+        self.pause_event = threading.Event()
+        self.pause_event.set()
+        self.checked = self.alive = self.dead = 0
+        self._lock = threading.Lock()
+
+    def stop(self):
+        self.stop_requested = True; self.pause_event.set()
+        if self.limiter is not None: self.limiter.cancel()
+        # queued checks are dropped and in-flight sockets cut, instead of each running out its timeout
+        for exe in list(self._pools):
+            exe.shutdown(wait=False, cancel_futures=True)
+        if self.aborter is not None: self.aborter.abort()
+
+    def pause(self):
+        self.pause_event.clear()
+        if self.adapt is not None: self.adapt.hold()
+
+    def shard_config(self):
+        """kwargs ของ Checker ฝั่ง shard worker (ส่งเป็น JSON) - history / checkpoint / geo cache อยู่ฝั่ง coordinator"""
+        return {"target_key": self.target_key, "custom_url": self.custom_url, "concurrency": self.concurrency,
+                "engine": self.engine, "probe_timeout": self.probe_timeout, "enrich_timeout": self.enrich_timeout,
+                "prescreen": self.prescreen, "prescreen_concurrency": self.prescreen_concurrency,
+                "prescreen_timeout": self.prescreen_timeout, "min_ok": self.min_ok, "matrix": self.matrix,
+                "adaptive": self.adaptive, "concurrency_max": self.concurrency_max, "frugal": self.frugal}
+
+    def resume(self):
+        if self.adapt is not None: self.adapt.hold()
+        self.pause_event.set()
+
+    def stopped(self):
+        return self.stop_requested
+
+    def run(self, lines, on_result=None):
+        """เช็คทุกบรรทัด (blocking) แล้วคืนจำนวนที่เช็คไปแล้ว"""
+        complete = False
+        try:
+            n = self._run(lines, on_result)
+            complete = not self.stop_requested
+            return n
+        finally:
+            if self.geo is not None: self.geo.save()  # persist the exit-IP cache for the next run
+            if self.history is not None: self.history.flush()
+            if self.checkpoint is not None: self.checkpoint.close(complete)
+
+    def _run(self, lines, on_result):
+        self.checked = self.alive = self.dead = 0
+        self.latency_hist = LatencyHistogram()
+        self.traffic = Traffic()
+        metrics = self.metrics = RunMetrics()
+        self.limiter = HostLimiter(self.limits)
+        self.aborter = Aborter()
+        self._pools = []
+        # sharded runs adapt inside each worker (shard_config carries the flag), not here
+        adapt = self.adapt = AdaptiveLimit(self.concurrency, hi=self.concurrency_max, on_change=self.on_adapt) \
+            if self.adaptive and not (self.shards > 1 or self.remote) else None
+        workers = self.concurrency_max if adapt is not None else self.concurrency  # ceiling; adapt gates below it
+        lines = (r.strip() for r in lines if r.strip())
+
+        history_target = target_url(self.target_key, self.custom_url)
+
+        def emit(p, avg, proxy_data, cached=False):
+            with self._lock:
+                self.checked += 1
+                if self.stop_requested: return
+                metrics.completed(avg, proxy_data, cached)
+                if self.checkpoint is not None: self.checkpoint.record(p, avg, proxy_data)
+                if avg is None: self.dead += 1
+                else: self.alive += 1; self.latency_hist.add(avg)
+                if not cached: self.traffic.merge(proxy_data)
+                if self.history is not None and not cached:
+                    self.history.record(history_target, p, avg, proxy_data)
+                if on_result: on_result(p, avg, proxy_data)
+
+        if self.checkpoint is not None:
+            # the previous run's results come back first, then only the lines it never finished are checked
+            self.checkpoint.open(replay=lambda p, avg, proxy_data: emit(p, avg, proxy_data, cached=True))
+            lines = self.checkpoint.track(lines)
+
+        if self.history is not None:
+            self.history.start()
+            if self.incremental:
+                def reuse(lines):
+                    # fresh results (and dead ones still in backoff) come straight from history
+                    for p, stored in self.history.split(lines, history_target):
+                        if stored is None: yield p
+                        else: emit(p, *stored, cached=True)
+                lines = reuse(lines)
+
+        import hydra_async  # imported here: hydra_async itself builds on this module
+        if self.target_key == JUDGE_KEY:
+            import hydra_judge
+            hydra_judge.ensure_local_judge(target_url(self.target_key), self.geo and self.geo.db)
+        if self.shards > 1 or self.remote:
+            # worker processes / boxes run the engine; results come back through emit like any other run
+            import hydra_shard
+            hydra_shard.run(lines, self.shard_config(), self.limits, on_result=emit, stopped=self.stopped,
+                            pause_event=self.pause_event, local=self.shards, listen_addr=self.listen,
+                            remote=self.remote, token=self.shard_token,
+                            geo_db=self.geo.db.path if self.geo is not None and self.geo.db is not None else None)
+        elif self.engine == "async":
+            hydra_async.run(lines, self.target_key, self.custom_url, concurrency=self.concurrency, on_result=emit,
+                            stopped=self.stopped, pause_event=self.pause_event,
+                            probe_timeout=self.probe_timeout, enrich_timeout=self.enrich_timeout,
+                            prescreen=self.prescreen, prescreen_concurrency=self.prescreen_concurrency,
+                            prescreen_timeout=self.prescreen_timeout, geo=self.geo, limiter=self.limiter,
+                            min_ok=self.min_ok, matrix=self.matrix, adapt=adapt, frugal=self.frugal, metrics=metrics)
+        else:
+            if self.prescreen:
+                # raw-socket pre-screen on its own event loop; only survivors reach the thread pool
+                lines = hydra_async.prescreen_stream(lines, self.target_key, self.custom_url,
+                                                     self.prescreen_concurrency, self.prescreen_timeout,
+                                                     on_dead=lambda p, err: emit(p, None, dead_data(err)),
+                                                     stopped=self.stopped,
+                                                     pause_event=self.pause_event, maxsize=workers * 2)
+            # bounded submit: at most 2x concurrency lines wait in the executor queue,
+            # so memory stays flat no matter how long the input stream is
+            slots = threading.BoundedSemaphore(workers * 2)
+            # enrichment has its own pool: while e.g. ip-api's bucket is empty, its waits park there
+            # and the probe workers keep checking (other hosts / dead proxies keep flowing)
+            enrich_slots = threading.BoundedSemaphore(workers * 2)
+            def release():
+                slots.release()
+                if adapt is not None: adapt.release()  # no sample: the line never got probed
+            def never_ran():
+                metrics.dequeue(); release()
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrich") as enrich_exe:
+                def enrich(p, probed):
+                    t0 = metrics.enrich_begin()
+                    try:
+                        res = enrich_proxy(p, probed, self.target_key, self.enrich_timeout, self.geo, self.limiter,
+                                           self.matrix)
+                    finally:
+                        metrics.enrich_end(t0)
+                        enrich_slots.release()
+                    emit(*res)
+                def dropped(fut, release, sess=None):
+                    # a task STOP cancelled before it ran still owes its slot (and its open session)
+                    if fut.cancelled():
+                        if sess is not None: sess.close()
+                        release()
+                    elif fut.exception() is not None:
+                        metrics.failed(fut.exception())  # a bug, not a dead proxy: counted apart, not swallowed
+                def check(p):
+                    sampled = False
+                    metrics.dequeue()
+                    try:
+                        if self.stop_requested: return
+                        self.pause_event.wait()
+                        if self.stop_requested: return
+                        traffic = Traffic()
+                        t0 = metrics.probe_begin()
+                        try:
+                            probed, err = probe_proxy(p, self.target_key, self.custom_url, stopped=self.stopped,
+                                                      probe_timeout=self.probe_timeout, limiter=self.limiter,
+                                                      min_ok=self.min_ok, aborter=self.aborter, frugal=self.frugal,
+                                                      traffic=traffic)
+                        finally:
+                            metrics.probe_end(t0)
+                        if adapt is not None:
+                            # the limit gates the probe only: its slot frees before enrichment
+                            sampled = True
+                            adapt.release(True, probed is None and error_class(err) in TIMEOUT_ERRORS,
+                                          probed[1]["latency"] if probed is not None else None)
+                        if probed is None:
+                            emit(p, None, dead_data(err, traffic)); return
+                        enrich_slots.acquire()
+                        try:
+                            fut = enrich_exe.submit(enrich, p, probed)
+                        except RuntimeError:  # pool already shut down by STOP
+                            probed[0].close(); enrich_slots.release(); return
+                        fut.add_done_callback(lambda f: dropped(f, enrich_slots.release, probed[0]))
+                    finally:
+                        slots.release() if sampled else release()
+                # inner pool shuts down first, so every enrich task is submitted before enrich_exe drains
+                with ThreadPoolExecutor(max_workers=workers) as exe:
+                    self._pools = [exe, enrich_exe]
+                    for p in lines:
+                        slots.acquire()
+                        if adapt is not None and not adapt.acquire(self.stopped):
+                            slots.release(); break
+                        if self.stop_requested:
+                            release(); break
+                        try:
+                            metrics.enqueue()
+                            exe.submit(check, p).add_done_callback(lambda f: dropped(f, never_ran))
+                        except RuntimeError:  # shut down by STOP
+                            metrics.dequeue(); break
+                    if self.stop_requested: self.stop()  # STOP may have landed before the pools were registered
+            self._pools = []
+        return self.checked
@@ -0,0 +1,204 @@
+import csv, gzip, io, json, os, threading, time
+from collections import Counter
+from datetime import datetime
+
+from hydra_core import matrix_badges
+
+# --- Streaming export: every result appended as it completes (NDJSON / CSV [.gz] / Parquet), report rendered from the file ---
+
+EXPORT_PATH = "hydra_results.ndjson"
+EXPORT_BATCH = 1000     # rows per write
+EXPORT_INTERVAL = 1.0   # ... or flush at least this often (seconds) while results keep coming
+
+# flat columns shared by every format (per-phase timings and raw target fields are not exported)
+EXPORT_FIELDS = ("ts", "proxy", "alive", "latency", "latency_p95", "success_ratio", "handshake", "anonymous", "anon_type",
+                 "country", "country_code", "city", "isp", "exit_ip", "target", "target_ok", "target_status",
+                 "amazon_blocked", "matrix", "error", "bytes_sent", "bytes_recv", "requests")
+FLOAT_FIELDS = ("ts", "latency", "latency_p95", "success_ratio", "handshake")
+BOOL_FIELDS = ("alive", "anonymous", "target_ok", "amazon_blocked")
+INT_FIELDS = ("target_status", "bytes_sent", "bytes_recv", "requests")
+JSON_FIELDS = ("matrix",)  # nested per-target grid: as is in NDJSON, a JSON string in CSV / Parquet
+
+def export_format(path):
+    """นามสกุลไฟล์ -> (format, gzip): .ndjson / .jsonl / .csv (+ .gz) / .parquet"""
+    base, ext = os.path.splitext(path.lower())
+    gz = ext == ".gz"
+    if gz:
+        ext = os.path.splitext(base)[1]
+    fmt = {".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson", ".csv": "csv", ".parquet": "parquet"}.get(ext)
+    if fmt is None or (gz and fmt == "parquet"):
+        raise ValueError(f"unknown export format: {path!r} (use .ndjson / .csv [.gz] / .parquet)")
+    return fmt, gz
+
+def export_row(p, avg, proxy_data, ts=None):
+    d = proxy_data or {}
+    row = {k: d.get(k) for k in EXPORT_FIELDS}
+    row.update(ts=ts if ts is not None else time.time(), proxy=p, alive=avg is not None, latency=avg)
+    return row
+
+def _parquet():
+    try:
+        import pyarrow as pa, pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("parquet export needs pyarrow (pip install pyarrow)") from e
+    return pa, pq
+
+def _parquet_schema(pa):
+    types = {k: pa.float64() for k in FLOAT_FIELDS}
+    types.update({k: pa.bool_() for k in BOOL_FIELDS})
+    types.update({k: pa.int64() for k in INT_FIELDS})
+    return pa.schema([(k, types.get(k, pa.string())) for k in EXPORT_FIELDS])
+
+class ExportSink:
+    """
+    เขียนผลต่อท้ายไฟล์ทีละตัวระหว่าง run (buffer เป็น batch, flush ตามจำนวน / เวลา)
+    ndjson / csv (ต่อท้าย .gz ได้) หรือ parquet (row group ต่อ batch, ต้องมี pyarrow) - โหลดเข้าเครื่องมือวิเคราะห์ได้เร็ว
+    """
+    def __init__(self, path=EXPORT_PATH, alive_only=False, batch=EXPORT_BATCH, interval=EXPORT_INTERVAL):
+        self.path = path
+        self.fmt, self.gz = export_format(path)
+        self.alive_only = alive_only
+        self.batch = batch
+        self.interval = interval
+        self.rows = 0
+        self._buf = []
+        self._lock = threading.Lock()
+        self._flushed = time.monotonic()
+        self._writer = None
+        if self.fmt == "parquet":
+            pa, pq = _parquet()
+            self._pa, self._schema = pa, _parquet_schema(pa)
+            self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+            self._f = None
+        else:
+            self._f = gzip.open(path, "wt", encoding="utf-8", newline="") if self.gz \
+                else open(path, "w", encoding="utf-8", newline="")
+            if self.fmt == "csv":
+                csv.writer(self._f).writerow(EXPORT_FIELDS)
+
+    def write(self, p, avg, proxy_data):
+        if avg is None and self.alive_only: return
+        row = export_row(p, avg, proxy_data)
+        with self._lock:
+            if self._buf is None: return  # closed
+            self._buf.append(row); self.rows += 1
+            if len(self._buf) >= self.batch or time.monotonic() - self._flushed >= self.interval:
+                self._flush()
+
+    def _flush(self):
+        rows, self._buf = self._buf, []
+        self._flushed = time.monotonic()
+        if not rows: return
+        if self.fmt != "ndjson":
+            for r in rows:
+                for k in JSON_FIELDS:
+                    if r[k] is not None: r[k] = json.dumps(r[k], ensure_ascii=False, separators=(",", ":"))
+        if self.fmt == "parquet":
+            cols = {k: [r[k] for r in rows] for k in EXPORT_FIELDS}
+            self._writer.write_table(self._pa.Table.from_pydict(cols, schema=self._schema))
+            return
+        if self.fmt == "csv":
+            out = io.StringIO()
+            csv.writer(out).writerows([r[k] for k in EXPORT_FIELDS] for r in rows)
+            self._f.write(out.getvalue())
+        else:
+            self._f.write("".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in rows))
+        self._f.flush()
+
+    def flush(self):
+        with self._lock:
+            if self._buf is not None: self._flush()
+
+    def close(self):
+        with self._lock:
+            if self._buf is None: return
+            self._flush(); self._buf = None
+            if self._writer is not None: self._writer.close()
+            if self._f is not None: self._f.close()
+
+def _csv_value(k, v):
+    if v == "":
+        return None
+    if k in BOOL_FIELDS:
+        return v == "True"
+    if k in FLOAT_FIELDS:
+        return float(v)
+    if k in INT_FIELDS:
+        return int(v)
+    if k in JSON_FIELDS:
+        return json.loads(v)
+    return v
+
+def read_export(path):
+    """อ่านไฟล์ export กลับทีละแถว (dict) แบบ stream - ไม่โหลดทั้งไฟล์"""
+    fmt, gz = export_format(path)
+    if fmt == "parquet":
+        _, pq = _parquet()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=EXPORT_BATCH * 10):
+            for row in batch.to_pylist():
+                row.update((k, json.loads(row[k])) for k in JSON_FIELDS if row.get(k))
+                yield row
+        return
+    with (gzip.open(path, "rt", encoding="utf-8", newline="") if gz
+          else open(path, encoding="utf-8", newline="")) as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                yield {k: _csv_value(k, v) for k, v in row.items()}
+            return
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue  # torn last line while the run is still writing
+
+def render_report(path, out, status="COMPLETED", target="", custom_url=""):
+    """
+    รายงานแบบความกว้างคงที่ (ALIVE list + SESSION LOG SUMMARY + GEO SUMMARY) จากไฟล์ export ในรอบเดียว
+    แถวเรียงตามลำดับที่เช็คเสร็จ - หน่วยความจำใช้แค่ตัวนับ country
+    """
+    alive = dead = anon = 0
+    countries = Counter()
+    grid_ok, grid_all = Counter(), Counter()  # matrix mode: per-target ok / probed over the alive proxies
+    out.write("--- ALIVE PROXIES LIST ---\n")
+    out.write(f"{'Proxy':<50} {'Latency':<10} {'Target':<18} {'T-OK':<5} {'T-Status':<8} {'Anonymous':<12} {'Country':<20} {'City':<20} {'ISP':<30} {'ExitIP':<16} {'AMZ':<8} Matrix\n")
+    out.write("-" * 150 + "\n")
+    for r in read_export(path):
+        if not r.get("alive"):
+            dead += 1; continue
+        alive += 1
+        country = r.get("country") or "Unknown"
+        countries[country] += 1
+        if r.get("anonymous"): anon += 1
+        anon_str = "Yes" if r.get("anonymous") else ("No" if r.get("anonymous") is False else "Unknown")
+        tok = "Y" if r.get("target_ok") is True else ("N" if r.get("target_ok") is False else "")
+        amz = ""
+        if r.get("target") == "Amazon (Target Test)" and r.get("amazon_blocked") is not None:
+            amz = "BLOCKED" if r["amazon_blocked"] else "OK"
+        for name, cell in (r.get("matrix") or {}).items():
+            grid_all[name] += 1
+            if cell.get("ok"): grid_ok[name] += 1
+        out.write(f"{r['proxy']:<50} {r['latency']:.3f}s{'':<5} {r.get('target') or '':<18} {tok:<5} "
+                  f"{str(r.get('target_status') or ''):<8} {anon_str:<12} {country:<20} {r.get('city') or '':<20} "
+                  f"{r.get('isp') or '':<30} {r.get('exit_ip') or '':<16} {amz:<8} {matrix_badges(r)}\n")
+    out.write("\n" + "=" * 40 + "\n")
+    out.write("HYDRA  - SESSION LOG SUMMARY\n")
+    out.write(f"DATE: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    out.write(f"STATUS: {status}\n")
+    out.write(f"TOTAL CHECKED: {alive + dead}\n")
+    out.write(f"ALIVE: {alive}\n")
+    out.write(f"DEAD: {dead}\n")
+    out.write(f"TARGET: {target}\n")
+    if custom_url:
+        out.write(f"CUSTOM URL: {custom_url}\n")
+    if alive:
+        out.write("\n" + "=" * 40 + "\n")
+        out.write("GEO SUMMARY:\n")
+        for country, count in countries.most_common():
+            out.write(f"  {country}: {count} proxies\n")
+        out.write(f"\nAnonymous Proxies: {anon}/{alive}\n")
+        if grid_all:
+            out.write("\nMATRIX (ok / probed):\n")
+            for name, n in grid_all.items():
+                out.write(f"  {name}: {grid_ok[name]}/{n}\n")
+    out.write("=" * 40 + "\n")
+    return alive, dead
@@ -0,0 +1,534 @@
+import argparse, asyncio, base64, heapq, hmac, json, os, random, socket, struct, sys, threading, time
+from collections import deque
+from urllib.parse import urlsplit
+
+from hydra_core import is_loopback, parse_proxy
+from hydra_input import proxy_key
+from hydra_pool import parse_listen
+from hydra_async import ProxyError, split_proxy, raise_nofile_limit, proxy_greeting, proxy_handshake
+
+# --- Rotating gateway: one local HTTP CONNECT + SOCKS5 port, every connection routed over a proxy of the alive pool ---
+# python hydra_cli.py proxies.txt -t GGL --gateway 127.0.0.1:8888    (pool filled while the check runs)
+# python hydra_gateway.py hydra_results.ndjson --listen 127.0.0.1:8888  (alive rows of an export)
+# python hydra_gateway.py hydra_results.ndjson --listen 0.0.0.0:8888 --auth user:pass  (other hosts: credential required)
+# curl -x http://127.0.0.1:8888 https://example.com  /  curl --socks5-hostname 127.0.0.1:8888 ...
+
+GATEWAY_PORT = 8888
+GATEWAY_AUTH = os.environ.get("HYDRA_GATEWAY_AUTH", "")  # user:pass clients must present
+GATEWAY_CAP = 32                # tunnels open at once through one upstream proxy
+GATEWAY_RETRIES = 2             # other upstreams tried when one fails before the client got an answer
+GATEWAY_CONNECT_TIMEOUT = 10    # upstream TCP + proxy handshake
+GATEWAY_IDLE = 300              # a tunnel with no bytes either way for this long is closed
+GATEWAY_MAX_CLIENTS = 10000     # sizes ulimit -n (each client = 2 sockets)
+GATEWAY_BUF = 64 * 1024
+GATEWAY_RATE_WINDOW = 10        # seconds the reported RPS / bandwidth average over
+CLIENT_HEAD_TIMEOUT = 30
+EWMA = 0.2                      # weight of the newest sample in an upstream's latency / success
+EJECT_ERRORS = 3                # consecutive failures -> upstream ejected ...
+EJECT_TIME = 30                 # ... for this long, doubling per repeated ejection
+EJECT_MAX = 600
+WARM_PER_UPSTREAM = 2           # idle connections kept open (SOCKS5: greeting + auth done) per upstream ...
+WARM_TOP = 50                   # ... for this many best-scored upstreams
+WARM_IDLE_MAX = 15              # proxies drop idle connections: older warm ones are closed, not used
+WARM_ACTIVE = 30                # warm only while the gateway routed something within this many seconds
+
+class Upstream:
+    """proxy ใน pool ของ gateway: latency / success วัดต่อเนื่องจากการใช้งานจริง (EWMA) + สถานะ ejection + warm connections"""
+    __slots__ = ("proxy", "scheme", "host", "port", "user", "pwd", "latency", "success", "inflight", "fails",
+                 "ejections", "ejected_until", "removed", "warm", "warming", "routed", "errors", "bytes")
+
+    def __init__(self, proxy, latency, success):
+        self.proxy = proxy
+        self.scheme, self.host, self.port, self.user, self.pwd = split_proxy(parse_proxy(proxy))
+        self.latency, self.success = latency, success
+        self.inflight = self.fails = self.ejections = self.warming = self.routed = self.errors = self.bytes = 0
+        self.ejected_until = 0.0
+        self.removed = False
+        self.warm = deque()  # (reader, writer, greeted, opened_at)
+
+    def score(self):
+        """ยิ่งน้อยยิ่งดี: latency คูณจำนวน tunnel ที่เปิดอยู่ หารด้วย success^2"""
+        return self.latency * (1 + self.inflight) / max(0.05, self.success) ** 2
+
+    def auth_header(self):
+        if self.user is None: return ""
+        return "Proxy-Authorization: Basic " + base64.b64encode(f"{self.user}:{self.pwd or ''}".encode()).decode() + "\r\n"
+
+def _drop(conn):
+    conn[1].transport.abort()
+
+class Gateway:
+    """
+    local forward proxy: HTTP (CONNECT + absolute-URI) และ SOCKS5 บน port เดียว (ดู byte แรก)
+    เลือก upstream แบบ power-of-two-choices ตาม score (latency / success ที่วัดได้ + tunnel ที่เปิดอยู่), cap ต่อ upstream,
+    พังติดกัน EJECT_ERRORS ครั้ง = พักชั่วคราว, upstream ที่ดีที่สุดมี connection เปิดรอไว้ (warm)
+    update(p, avg, proxy_data) จาก on_result ของ Checker: alive = เข้า / อัปเดต pool, dead = ออก
+    auth="user:pass": client ต้องส่ง SOCKS5 user/pass หรือ Proxy-Authorization - ฟังบน host ที่ไม่ใช่ loopback ต้องมี
+    """
+    def __init__(self, host="127.0.0.1", port=GATEWAY_PORT, cap=GATEWAY_CAP, retries=GATEWAY_RETRIES,
+                 connect_timeout=GATEWAY_CONNECT_TIMEOUT, warm=WARM_PER_UPSTREAM, auth=GATEWAY_AUTH):
+        if not auth and not is_loopback(host):
+            # an open relay over our pool for anyone who finds the port
+            raise ValueError(f"{host} is reachable from other hosts: set a client credential (user:pass)")
+        self.host, self.port = host, port
+        user, _, pwd = (auth or "").partition(":")
+        self._auth = (user.encode(), pwd.encode()) if auth else None
+        self._basic = base64.b64encode(auth.encode()) if auth else None
+        self.cap, self.retries, self.connect_timeout, self.warm_per = cap, retries, connect_timeout, warm
+        self.upstreams = {}  # proxy_key -> Upstream (touched on the gateway's loop only)
+        self._live = []      # sampling list, rebuilt when the set changes
+        self._dirty = False
+        self.clients = self.routed = self.failed = self.retried = 0
+        self.bytes_up = self.bytes_down = 0
+        self._samples = deque(maxlen=GATEWAY_RATE_WINDOW + 1)  # (t, routed, bytes_up, bytes_down) once a second
+        self._last_routed = 0.0
+        self._loop = self._server = self._thread = None
+        self._conns = set()
+        self._tasks = []
+        self._waiters = deque()  # futures of connections waiting for an upstream below its cap
+
+    @property
+    def url(self):
+        return f"[{self.host}]:{self.port}" if ":" in self.host else f"{self.host}:{self.port}"
+
+    # --- pool ---
+
+    def update(self, p, avg, proxy_data=None):
+        """ผลเช็คของ proxy 1 ตัว (เรียกจาก thread ไหนก็ได้)"""
+        loop = self._loop
+        if loop is not None and loop.is_running() and threading.current_thread() is not self._thread:
+            loop.call_soon_threadsafe(self._apply, p, avg, proxy_data)
+        else:
+            self._apply(p, avg, proxy_data)
+
+    def load(self, rows):
+        """เติม pool จาก (p, avg, proxy_data) หลายตัว เช่น ResultStore / read_export"""
+        for p, avg, proxy_data in rows:
+            self.update(p, avg, proxy_data)
+
+    def _apply(self, p, avg, proxy_data):
+        key = proxy_key(p) or p
+        u = self.upstreams.get(key)
+        if avg is None:
+            if u is not None:
+                u.removed = True  # open tunnels finish on it, no new ones
+                self._close_warm(u)
+                del self.upstreams[key]; self._dirty = True
+            return
+        success = (proxy_data or {}).get("success_ratio")
+        success = 1.0 if success is None else success
+        if u is None:
+            try:
+                self.upstreams[key] = Upstream(p, avg, success)
+            except (ValueError, TypeError):
+                return  # unparseable line
+            self._dirty = True
+        else:
+            # a fresh alive check: take its numbers and forgive earlier ejections
+            u.latency, u.success, u.fails, u.ejections, u.ejected_until = avg, success, 0, 0, 0.0
+
+    def _pick(self, exclude):
+        if self._dirty:
+            self._live = list(self.upstreams.values()); self._dirty = False
+        live, now = self._live, time.monotonic()
+        def ok(u):
+            return u not in exclude and not u.removed and u.inflight < self.cap and u.ejected_until <= now
+        best = None
+        for _ in range(8 if live else 0):  # two random candidates, the better score wins (spreads load, favours fast)
+            a, b = random.choice(live), random.choice(live)
+            cands = [u for u in (a, b) if ok(u)]
+            if cands:
+                best = min(cands, key=Upstream.score)
+                break
+        if best is None:
+            cands = [u for u in live if ok(u)]
+            best = min(cands, key=Upstream.score) if cands else None
+        return best
+
+    def _busy(self, exclude):
+        """มี upstream ที่ใช้ได้แต่เต็ม cap อยู่ไหม (รอ slot ว่างดีกว่าตอบ 502)"""
+        now = time.monotonic()
+        return any(u.inflight >= self.cap and u not in exclude and u.ejected_until <= now for u in self._live)
+
+    async def _acquire(self, exclude):
+        u = self._pick(exclude)
+        deadline = time.monotonic() + self.connect_timeout
+        while u is None and self._busy(exclude) and (left := deadline - time.monotonic()) > 0:
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            try:
+                await asyncio.wait_for(fut, left)
+            except asyncio.TimeoutError:
+                break
+            u = self._pick(exclude)
+        if u is not None: u.inflight += 1
+        return u
+
+    def _release(self, u):
+        u.inflight -= 1
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None); break
+
+    def _failed(self, u):
+        u.success *= 1 - EWMA
+        u.fails += 1; u.errors += 1
+        if u.fails >= EJECT_ERRORS:
+            u.ejected_until = time.monotonic() + min(EJECT_MAX, EJECT_TIME * 2 ** u.ejections)
+            u.ejections += 1; u.fails = 0
+            self._close_warm(u)
+
+    def _succeeded(self, u, setup):
+        u.success = u.success * (1 - EWMA) + EWMA
+        u.latency = u.latency * (1 - EWMA) + setup * EWMA
+        u.fails = 0; u.ejections = 0
+        u.routed += 1; self.routed += 1
+        self._last_routed = time.monotonic()
+
+    # --- upstream connections ---
+
+    def _close_warm(self, u):
+        while u.warm:
+            _drop(u.warm.popleft())
+
+    def _take_warm(self, u):
+        now = time.monotonic()
+        while u.warm:
+            conn = u.warm.popleft()
+            if now - conn[3] < WARM_IDLE_MAX and not conn[0].at_eof():
+                return conn
+            _drop(conn)
+        return None
+
+    async def _open(self, u):
+        reader, writer = await asyncio.open_connection(u.host, u.port)
+        sock = writer.get_extra_info("socket")
+        if sock is not None: sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return reader, writer
+
+    async def _dial(self, u, host, port, forward):
+        """connection ผ่าน u ไปถึง host:port - return: (reader, writer, forward) forward=True คือ http proxy รับ absolute-URI เอง"""
+        conn = self._take_warm(u)
+        for attempt in (0, 1):
+            if conn is None:
+                reader, writer = await self._open(u)
+                greeted = False
+            else:
+                reader, writer, greeted, _ = conn
+            try:
+                if forward and not u.scheme.startswith("socks"):
+                    return reader, writer, True
+                await proxy_handshake(reader, writer, u.scheme, host, port, u.user, u.pwd, greeted)
+                return reader, writer, False
+            except (OSError, ProxyError, asyncio.IncompleteReadError):
+                writer.transport.abort()
+                if conn is None or attempt: raise
+                conn = None  # a warm connection the proxy had already dropped: once more on a fresh one
+            except BaseException:
+                writer.transport.abort()
+                raise
+
+    async def _tunnel(self, host, port, forward=False):
+        """เลือก upstream แล้วต่อไป host:port (ลองตัวอื่นถ้าพังก่อน client ได้คำตอบ) - return: (u, reader, writer, forward)"""
+        tried, err = set(), "no alive upstream"
+        for attempt in range(self.retries + 1):
+            u = await self._acquire(tried)
+            if u is None: break
+            tried.add(u)
+            if attempt: self.retried += 1
+            st = time.perf_counter()
+            try:
+                reader, writer, fwd = await asyncio.wait_for(self._dial(u, host, port, forward), self.connect_timeout)
+            except (OSError, ProxyError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                self._release(u)
+                self._failed(u)
+                err = f"{u.proxy}: {e or type(e).__name__}"
+                continue
+            self._succeeded(u, time.perf_counter() - st)
+            return u, reader, writer, fwd
+        self.failed += 1
+        raise ProxyError(err)
+
+    async def _warm_one(self, u):
+        u.warming += 1
+        try:
+            reader, writer = await asyncio.wait_for(self._open(u), self.connect_timeout)
+            try:
+                greeted = await asyncio.wait_for(proxy_greeting(reader, writer, u.scheme, u.user, u.pwd), self.connect_timeout)
+            except BaseException:
+                writer.transport.abort(); raise
+            if u.removed or u.ejected_until > time.monotonic():
+                writer.transport.abort()
+            else:
+                u.warm.append((reader, writer, greeted, time.monotonic()))
+        except (OSError, ProxyError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            self._failed(u)
+        finally:
+            u.warming -= 1
+
+    async def _maintain(self):
+        """ทุกวินาที: เก็บตัวอย่าง RPS / bandwidth และเติม warm connection ให้ upstream ที่ดีที่สุด"""
+        while True:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            self._samples.append((now, self.routed, self.bytes_up, self.bytes_down))
+            if not self.warm_per or now - self._last_routed > WARM_ACTIVE:
+                continue
+            live = [u for u in self.upstreams.values() if u.ejected_until <= now]
+            for u in heapq.nsmallest(WARM_TOP, live, key=Upstream.score):
+                while u.warm and now - u.warm[0][3] >= WARM_IDLE_MAX:
+                    _drop(u.warm.popleft())
+                for _ in range(self.warm_per - len(u.warm) - u.warming):
+                    asyncio.ensure_future(self._warm_one(u))
+
+    # --- clients ---
+
+    async def _pump(self, src, dst, u, up):
+        try:
+            while True:
+                data = await asyncio.wait_for(src.read(GATEWAY_BUF), GATEWAY_IDLE)
+                if not data: break
+                dst.write(data)
+                if up: self.bytes_up += len(data)
+                else: self.bytes_down += len(data)
+                u.bytes += len(data)
+                await dst.drain()
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                if dst.can_write_eof(): dst.write_eof()
+                else: dst.close()
+            except (OSError, RuntimeError):
+                pass
+
+    async def _splice(self, u, creader, cwriter, ureader, uwriter, first=b""):
+        try:
+            if first:
+                uwriter.write(first); self.bytes_up += len(first); u.bytes += len(first)
+            await asyncio.gather(self._pump(creader, uwriter, u, True), self._pump(ureader, cwriter, u, False))
+        finally:
+            self._release(u)
+            uwriter.transport.abort()
+
+    def _allowed(self, user, pwd):
+        u, p = self._auth
+        return hmac.compare_digest(user, u) & hmac.compare_digest(pwd, p)
+
+    async def _socks5_client(self, reader, writer):
+        methods = await reader.readexactly((await reader.readexactly(1))[0])
+        method = 0 if self._auth is None else 2  # no auth on loopback, user/pass (RFC 1929) when configured
+        if method not in methods:
+            writer.write(b"\x05\xff"); return
+        writer.write(bytes((5, method)))
+        if method == 2:
+            await reader.readexactly(1)
+            user = await reader.readexactly((await reader.readexactly(1))[0])
+            pwd = await reader.readexactly((await reader.readexactly(1))[0])
+            if not self._allowed(user, pwd):
+                writer.write(b"\x01\x01"); return
+            writer.write(b"\x01\x00")
+        _, cmd, _, atyp = await reader.readexactly(4)
+        if atyp == 1:
+            host = socket.inet_ntoa(await reader.readexactly(4))
+        elif atyp == 3:
+            host = (await reader.readexactly((await reader.readexactly(1))[0])).decode("idna")
+        elif atyp == 4:
+            host = socket.inet_ntop(socket.AF_INET6, await reader.readexactly(16))
+        else:
+            writer.write(b"\x05\x08\x00\x01" + bytes(6)); return
+        port = struct.unpack(">H", await reader.readexactly(2))[0]
+        if cmd != 1:
+            writer.write(b"\x05\x07\x00\x01" + bytes(6)); return  # CONNECT only
+        try:
+            u, ureader, uwriter, _ = await self._tunnel(host, port)
+        except ProxyError:
+            writer.write(b"\x05\x01\x00\x01" + bytes(6)); return
+        writer.write(b"\x05\x00\x00\x01" + bytes(6))
+        await self._splice(u, reader, writer, ureader, uwriter)
+
+    async def _http_client(self, first, reader, writer):
+        head = first + await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), CLIENT_HEAD_TIMEOUT)
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ")
+        if len(parts) != 3:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"); return
+        method, target, version = parts
+        if self._basic is not None and not self._http_allowed(lines[1:]):
+            writer.write(b"HTTP/1.1 407 Proxy Authentication Required\r\nProxy-Authenticate: Basic realm=\"hydra\"\r\n"
+                         b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+            return
+        if method == "CONNECT":
+            host, _, port = target.rpartition(":")
+            try:
+                u, ureader, uwriter, _ = await self._tunnel(host.strip("[]"), int(port or 443))
+            except (ProxyError, ValueError) as e:
+                return self._http_error(writer, 502, str(e))
+            writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            return await self._splice(u, reader, writer, ureader, uwriter)
+        if "://" not in target:
+            # origin-form = asked the gateway itself: live stats
+            body = json.dumps(self.stats(), separators=(",", ":")).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nCache-Control: no-store\r\n"
+                         b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body)
+            return
+        sp = urlsplit(target)
+        if sp.scheme != "http" or not sp.hostname:
+            return self._http_error(writer, 400, "absolute http:// URI or CONNECT expected")
+        # one request per client connection: the next one may be for another host (the upstream stays warm instead)
+        headers = [h for h in lines[1:] if h and h.split(":", 1)[0].strip().lower()
+                   not in ("proxy-authorization", "proxy-connection", "connection", "keep-alive")]
+        try:
+            u, ureader, uwriter, fwd = await self._tunnel(sp.hostname, sp.port or 80, forward=True)
+        except ProxyError as e:
+            return self._http_error(writer, 502, str(e))
+        path = target if fwd else (sp.path or "/") + (f"?{sp.query}" if sp.query else "")
+        out = f"{method} {path} {version}\r\n" + "".join(h + "\r\n" for h in headers) + "Connection: close\r\n"
+        if fwd: out += u.auth_header()
+        await self._splice(u, reader, writer, ureader, uwriter, (out + "\r\n").encode("latin-1"))
+
+    def _http_allowed(self, headers):
+        for h in headers:
+            name, _, value = h.partition(":")
+            if name.strip().lower() == "proxy-authorization":
+                kind, _, cred = value.strip().partition(" ")
+                return kind.lower() == "basic" and hmac.compare_digest(cred.strip().encode("latin-1"), self._basic)
+        return False
+
+    def _http_error(self, writer, status, msg):
+        body = msg.encode("utf-8", "replace")
+        writer.write(b"HTTP/1.1 %d Gateway Error\r\nContent-Type: text/plain\r\nContent-Length: %d\r\n"
+                     b"Connection: close\r\n\r\n" % (status, len(body)) + body)
+
+    async def _client(self, reader, writer):
+        self.clients += 1
+        self._conns.add(writer)
+        try:
+            first = await asyncio.wait_for(reader.readexactly(1), CLIENT_HEAD_TIMEOUT)
+            if first == b"\x05":
+                await self._socks5_client(reader, writer)
+            else:
+                await self._http_client(first, reader, writer)
+            await writer.drain()
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, UnicodeError):
+            pass
+        finally:
+            self.clients -= 1
+            self._conns.discard(writer)
+            writer.close()
+
+    # --- numbers ---
+
+    def rates(self):
+        """(connections/s, bytes/s ขึ้น, bytes/s ลง) เฉลี่ยช่วง GATEWAY_RATE_WINDOW วินาทีล่าสุด"""
+        s = list(self._samples)
+        if len(s) < 2:
+            return 0.0, 0.0, 0.0
+        (t0, r0, u0, d0), (t1, r1, u1, d1) = s[0], s[-1]
+        dt = (t1 - t0) or 1.0
+        return (r1 - r0) / dt, (u1 - u0) / dt, (d1 - d0) / dt
+
+    def stats(self):
+        rps, up, down = self.rates()
+        ups = list(self.upstreams.values())
+        now = time.monotonic()
+        return {
+            "listen": self.url, "clients": self.clients, "routed": self.routed, "failed": self.failed,
+            "retried": self.retried, "rps": rps, "mbps_up": up * 8 / 1e6, "mbps_down": down * 8 / 1e6,
+            "bytes_up": self.bytes_up, "bytes_down": self.bytes_down, "upstreams": len(ups),
+            "ejected": sum(1 for u in ups if u.ejected_until > now), "in_flight": sum(u.inflight for u in ups),
+            "warm": sum(len(u.warm) for u in ups),
+            "top": [{"proxy": u.proxy, "latency": u.latency, "success": u.success, "in_flight": u.inflight,
+                     "routed": u.routed, "errors": u.errors, "bytes": u.bytes}
+                    for u in heapq.nlargest(10, ups, key=lambda u: u.routed) if u.routed],
+        }
+
+    # --- lifecycle ---
+
+    async def serve(self):
+        raise_nofile_limit(GATEWAY_MAX_CLIENTS)
+        self._server = await asyncio.start_server(self._client, self.host, self.port, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._tasks.append(asyncio.ensure_future(self._maintain()))
+        return self._server
+
+    def start(self):
+        """event loop ของตัวเองใน thread แยก (แบบเดียวกับ JudgeServer)"""
+        ready, err = threading.Event(), []
+        def main():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.serve())
+            except OSError as e:
+                err.append(e); ready.set(); return
+            ready.set()
+            self._loop.run_forever()
+            self._server.close()
+            for w in list(self._conns):
+                w.transport.abort()
+            for u in self.upstreams.values():
+                self._close_warm(u)
+            for t in asyncio.all_tasks(self._loop):
+                t.cancel()
+            self._loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(self._loop), return_exceptions=True))
+            self._loop.close()
+        self._thread = threading.Thread(target=main, daemon=True)
+        self._thread.start()
+        ready.wait()
+        if err:
+            raise err[0]
+        return self
+
+    def stop(self):
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+
+def format_stats(st):
+    """บรรทัดสรุปของ gateway (CLI / GUI)"""
+    return (f"GATEWAY {st['listen']}: {st['rps']:,.1f} conn/s | BW {st['mbps_down']:.2f} Mbps down / {st['mbps_up']:.2f} up | "
+            f"{st['clients']} clients | {st['routed']} routed, {st['failed']} failed | "
+            f"upstreams {st['upstreams']} ({st['ejected']} ejected, {st['in_flight']} busy)")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="hydra_gateway", description="HYDRA rotating gateway over an alive pool")
+    ap.add_argument("input", help="export file (.ndjson / .csv / .parquet, alive rows used) or a plain proxy list")
+    ap.add_argument("--listen", default=f"127.0.0.1:{GATEWAY_PORT}", help=f"host:port (default 127.0.0.1:{GATEWAY_PORT})")
+    ap.add_argument("--auth", default=GATEWAY_AUTH, metavar="USER:PASS",
+                    help="credential clients must present (SOCKS5 user/pass, HTTP Proxy-Authorization; "
+                         "default $HYDRA_GATEWAY_AUTH) - required when --listen is not loopback")
+    ap.add_argument("--cap", type=int, default=GATEWAY_CAP, help=f"tunnels at once per upstream (default {GATEWAY_CAP})")
+    ap.add_argument("--retries", type=int, default=GATEWAY_RETRIES, help="other upstreams tried per connection")
+    ap.add_argument("--warm", type=int, default=WARM_PER_UPSTREAM, help="idle connections kept per top upstream (0 = off)")
+    ap.add_argument("--every", type=float, default=10, help="print stats every N seconds")
+    args = ap.parse_args(argv)
+    try:
+        gw = Gateway(*parse_listen(args.listen, GATEWAY_PORT), cap=args.cap, retries=args.retries, warm=args.warm,
+                     auth=args.auth)
+    except ValueError as e:
+        sys.exit(f"hydra_gateway: --listen {args.listen}: {e}")
+    try:
+        from hydra_export import export_format, read_export
+        export_format(args.input)
+        gw.load((r["proxy"], r["latency"], r) for r in read_export(args.input) if r.get("alive"))
+    except ValueError:
+        with open(args.input, encoding="utf-8", errors="replace") as f:
+            gw.load((line.strip(), 1.0, None) for line in f if line.strip())  # unmeasured: equal weights to start
+    if not gw.upstreams:
+        sys.exit(f"hydra_gateway: no alive proxies in {args.input}")
+    try:
+        gw.start()
+    except OSError as e:
+        sys.exit(f"hydra_gateway: {args.listen}: {e}")
+    print(f"gateway on {gw.url} over {len(gw.upstreams)} proxies (HTTP CONNECT / SOCKS5)", flush=True)
+    try:
+        while True:
+            time.sleep(args.every)
+            print(format_stats(gw.stats()), flush=True)
+    except KeyboardInterrupt:
+        pass
+    gw.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import csv, json, os, socket, struct, threading, time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+# --- Exit-IP keyed geo / anonymity cache + offline GeoIP ranges (no proxied round trip on a hit) ---
+
+GEO_CACHE_PATH = "geo_cache.json"
+GEO_DB_PATH = "geoip.csv"
+GEO_CACHE_TTL = 7 * 24 * 3600
+GEO_CACHE_MAX = 200_000
+
+def ip_to_int(ip):
+    return struct.unpack("!I", socket.inet_aton(ip))[0]
+
+class GeoCache:
+    """
+    cache ผล geo / anonymity ตาม exit IP (TTL + LRU) เก็บลงไฟล์ json ใช้ข้าม run ได้
+    entry: {"ts": เวลาที่ได้ผล, "geo": {...}, "anon": [is_anon, anon_type]}
+    """
+    def __init__(self, path=GEO_CACHE_PATH, ttl=GEO_CACHE_TTL, maxsize=GEO_CACHE_MAX):
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    now = time.time()
+                    for ip, entry in json.load(f).items():
+                        if now - entry.get("ts", 0) < ttl:
+                            self._data[ip] = entry
+            except (OSError, ValueError):
+                pass  # broken cache file: start empty
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, ip, field):
+        """field = 'geo' | 'anon' -> ค่าที่ cache ไว้ หรือ None"""
+        if not ip: return None
+        with self._lock:
+            entry = self._data.get(ip)
+            if entry is None or field not in entry or time.time() - entry["ts"] >= self.ttl:
+                self.misses += 1
+                return None
+            self._data.move_to_end(ip)
+            self.hits += 1
+            return entry[field]
+
+    def put(self, ip, field, value):
+        if not ip: return
+        with self._lock:
+            entry = self._data.pop(ip, None) or {}
+            entry[field] = value; entry["ts"] = time.time()
+            self._data[ip] = entry
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._dirty = True
+
+    def save(self):
+        if not self.path or not self._dirty: return
+        with self._lock:
+            snapshot = dict(self._data); self._dirty = False
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+class OfflineGeoDB:
+    """
+    ฐานข้อมูล IPv4 range แบบ offline: starts/ends เรียงใน array('I') ค้นด้วย bisect (~ไมโครวินาที)
+    CSV: start,end,country_code,country[,city[,isp]] (start/end เป็น dotted หรือ int ก็ได้ เช่น IP2Location / DB-IP lite)
+    แปลงครั้งแรกแล้วเก็บ index ไว้ที่ <csv>.idx ครั้งต่อไปโหลดด้วย array.fromfile
+    """
+    def __init__(self, path=GEO_DB_PATH):
+        self.path = path
+        self.starts, self.ends, self.rec = array("I"), array("I"), array("I")
+        self.records = []
+        idx = path + ".idx"
+        if os.path.exists(idx) and os.path.getmtime(idx) >= os.path.getmtime(path):
+            self._load_index(idx)
+        else:
+            self._load_csv(path)
+            try:
+                self._save_index(idx)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(self.starts)
+
+    @staticmethod
+    def _ip(v):
+        v = v.strip()
+        return int(v) if v.isdigit() else ip_to_int(v)
+
+    def _load_csv(self, path):
+        rows, interned = [], {}
+        with open(path, encoding="utf-8", errors="replace", newline="") as f:
+            for row in csv.reader(f):
+                if len(row) < 4 or ":" in row[0]:
+                    continue  # short row / IPv6
+                try:
+                    start, end = self._ip(row[0]), self._ip(row[1])
+                except (OSError, ValueError):
+                    continue  # header line
+                geo = (row[2].strip(), row[3].strip(), row[4].strip() if len(row) > 4 else "",
+                       row[5].strip() if len(row) > 5 else "")
+                rows.append((start, end, interned.setdefault(geo, len(interned))))
+        rows.sort()
+        self.starts = array("I", (r[0] for r in rows))
+        self.ends = array("I", (r[1] for r in rows))
+        self.rec = array("I", (r[2] for r in rows))
+        self.records = list(interned)
+
+    def _save_index(self, idx):
+        tmp = idx + ".tmp"
+        with open(tmp, "wb") as f:
+            meta = json.dumps(self.records, ensure_ascii=False).encode("utf-8")
+            f.write(struct.pack("<II", len(self.starts), len(meta))); f.write(meta)
+            for a in (self.starts, self.ends, self.rec):
+                a.tofile(f)
+        os.replace(tmp, idx)
+
+    def _load_index(self, idx):
+        with open(idx, "rb") as f:
+            n, mlen = struct.unpack("<II", f.read(8))
+            self.records = [tuple(r) for r in json.loads(f.read(mlen))]
+            for a in (self.starts, self.ends, self.rec):
+                a.fromfile(f, n)
+
+    def lookup(self, ip):
+        """exit IP -> geo dict หรือ None"""
+        try:
+            n = ip_to_int(ip)
+        except (OSError, TypeError):
+            return None
+        i = bisect_right(self.starts, n) - 1
+        if i < 0 or n > self.ends[i]:
+            return None
+        cc, country, city, isp = self.records[self.rec[i]]
+        return {'country': country or 'Unknown', 'country_code': cc, 'city': city, 'isp': isp}
+
+class GeoResolver:
+    """รวม cache + offline DB ไว้ที่เดียว ให้ทั้งสอง engine ใช้ร่วมกัน"""
+    def __init__(self, cache=None, db=None):
+        self.cache = cache
+        self.db = db
+
+    def geo(self, exit_ip):
+        """geo จาก cache / offline DB (ไม่มี network) หรือ None"""
+        if not exit_ip: return None
+        geo = self.cache.get(exit_ip, "geo") if self.cache is not None else None
+        if geo is None and self.db is not None:
+            geo = self.db.lookup(exit_ip)
+        return geo
+
+    def anon(self, exit_ip):
+        v = self.cache.get(exit_ip, "anon") if self.cache is not None and exit_ip else None
+        return tuple(v) if v else None
+
+    def remember(self, exit_ip, geo=None, anon=None):
+        # never cache "Unknown": that is usually ip-api's rate limit, not a real answer
+        if self.cache is None or not exit_ip: return
+        if geo and geo.get("country", "Unknown") != "Unknown":
+            self.cache.put(exit_ip, "geo", geo)
+        if anon and anon[0] is not None:
+            self.cache.put(exit_ip, "anon", list(anon))
+
+    def save(self):
+        if self.cache is not None: self.cache.save()
+
+def load_resolver(cache_path=GEO_CACHE_PATH, db_path=GEO_DB_PATH):
+    """สร้าง GeoResolver จาก path (None = ไม่ใช้), DB โหลดเฉพาะถ้ามีไฟล์"""
+    cache = GeoCache(cache_path) if cache_path else None
+    db = OfflineGeoDB(db_path) if db_path and os.path.exists(db_path) else None
+    return GeoResolver(cache, db)
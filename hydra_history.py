@@ -0,0 +1,151 @@
+import json, queue, sqlite3, threading, time
+
+from hydra_input import proxy_key, key_hash, HashSet64
+
+# --- Persistent check history (SQLite, WAL): incremental re-check + exponential backoff for dead entries ---
+
+HISTORY_PATH = "hydra_history.db"
+HISTORY_TTL = 3600               # a result younger than this is reused instead of re-checked
+HISTORY_BACKOFF_MAX = 7 * 86400  # dead entries wait TTL, 2xTTL, 4xTTL ... up to this
+WRITE_BATCH = 2000               # rows per transaction
+WRITE_INTERVAL = 0.5             # ... or flush at least this often (seconds)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT NOT NULL, target TEXT NOT NULL, proxy TEXT NOT NULL,
+    checked_at REAL NOT NULL, alive INTEGER NOT NULL, latency REAL, handshake REAL,
+    anon_type TEXT, country TEXT, country_code TEXT, city TEXT, isp TEXT, exit_ip TEXT, error TEXT,
+    fails INTEGER NOT NULL DEFAULT 0, checks INTEGER NOT NULL DEFAULT 1, next_check REAL NOT NULL, data TEXT,
+    PRIMARY KEY (key, target)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_due ON results (target, next_check);
+CREATE TABLE IF NOT EXISTS checks (
+    key TEXT NOT NULL, target TEXT NOT NULL, checked_at REAL NOT NULL, alive INTEGER NOT NULL,
+    latency REAL, handshake REAL, exit_ip TEXT, error TEXT
+);
+CREATE INDEX IF NOT EXISTS checks_key ON checks (key, target);
+"""
+
+# first sighting: next_check = now + TTL either way; afterwards dead rows double their wait per consecutive fail
+UPSERT = """
+INSERT INTO results (key, target, proxy, checked_at, alive, latency, handshake, anon_type, country, country_code,
+                     city, isp, exit_ip, error, fails, checks, next_check, data)
+VALUES (:key, :target, :proxy, :checked_at, :alive, :latency, :handshake, :anon_type, :country, :country_code,
+        :city, :isp, :exit_ip, :error, 1 - :alive, 1, :checked_at + :ttl, :data)
+ON CONFLICT (key, target) DO UPDATE SET
+    proxy = excluded.proxy, checked_at = excluded.checked_at, alive = excluded.alive,
+    latency = excluded.latency, handshake = excluded.handshake, anon_type = excluded.anon_type,
+    country = excluded.country, country_code = excluded.country_code, city = excluded.city, isp = excluded.isp,
+    exit_ip = excluded.exit_ip, error = excluded.error, data = excluded.data, checks = results.checks + 1,
+    fails = CASE WHEN excluded.alive THEN 0 ELSE results.fails + 1 END,
+    next_check = excluded.checked_at + CASE WHEN excluded.alive THEN :ttl
+                 ELSE min(:backoff_max, :ttl * (1 << min(results.fails, 30))) END
+"""
+LOG = """
+INSERT INTO checks (key, target, checked_at, alive, latency, handshake, exit_ip, error)
+VALUES (:key, :target, :checked_at, :alive, :latency, :handshake, :exit_ip, :error)
+"""
+
+def connect(path):
+    db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL: durable across app crashes, one fsync per checkpoint
+    db.executescript(SCHEMA)
+    return db
+
+class History:
+    """
+    ประวัติการเช็คต่อ proxy + target ใน SQLite (WAL)
+    record() แค่เข้าคิว - thread writer เขียนเป็น batch ทีละ transaction (ไม่ block ตัวเช็ค)
+    split() ใช้ตอน incremental: ตัวที่ผลยังไม่หมดอายุ (หรือยังติด backoff) ได้ผลเดิมจาก DB ไม่ต้องเช็คใหม่
+    """
+    def __init__(self, path=HISTORY_PATH, ttl=HISTORY_TTL, backoff_max=HISTORY_BACKOFF_MAX):
+        self.path = path
+        self.ttl = ttl
+        self.backoff_max = backoff_max
+        self.db = connect(path)
+        self.fresh = 0  # lines answered from history by split()
+        self._q = queue.SimpleQueue()
+        self._writer = None
+
+    def start(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+        return self
+
+    def flush(self):
+        """รอ writer เขียนที่ค้างให้หมด (start() ใหม่ได้)"""
+        if self._writer is not None:
+            self._q.put(None); self._writer.join(); self._writer = None
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def record(self, target, p, avg, proxy_data):
+        # called from the result stream (under the checker's lock): just enqueue, the writer builds the row
+        self._q.put((target, p, avg, proxy_data, time.time()))
+
+    def _row(self, target, p, avg, proxy_data, checked_at):
+        d = proxy_data or {}
+        return {
+            "key": proxy_key(p) or p, "target": target, "proxy": p, "checked_at": checked_at,
+            "alive": int(avg is not None), "latency": avg, "handshake": d.get("handshake"),
+            "anon_type": d.get("anon_type"), "country": d.get("country"), "country_code": d.get("country_code"),
+            "city": d.get("city"), "isp": d.get("isp"), "exit_ip": d.get("exit_ip"), "error": d.get("error"),
+            "data": json.dumps(d, ensure_ascii=False, separators=(",", ":")) if avg is not None else None,
+            "ttl": self.ttl, "backoff_max": self.backoff_max,
+        }
+
+    def _write_loop(self):
+        db = connect(self.path)  # the writer's own connection: split() keeps reading on self.db
+        done = False
+        while not done:
+            rows = []
+            deadline = time.monotonic() + WRITE_INTERVAL
+            while len(rows) < WRITE_BATCH:
+                try:
+                    row = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if row is None:
+                    done = True; break
+                rows.append(self._row(*row))
+            if rows:
+                with db:  # one transaction per batch
+                    db.execute("BEGIN")
+                    db.executemany(UPSERT, rows)
+                    db.executemany(LOG, rows)
+        db.close()
+
+    def split(self, lines, target, now=None):
+        """
+        แยกบรรทัดที่ต้องเช็คจริงออกจากตัวที่ยังสด
+        yield: (line, None) = ต้องเช็ค, (line, (avg, proxy_data)) = ผลเดิมจาก DB
+        """
+        now = time.time() if now is None else now
+        fresh = HashSet64()
+        # one scan up front (64-bit key hashes only); rows are fetched per line just for the fresh ones
+        for (key,) in self.db.execute("SELECT key FROM results WHERE target = ? AND next_check > ?", (target, now)):
+            fresh.add(key_hash(key))
+        if not len(fresh):
+            for line in lines:
+                yield line, None
+            return
+        get = "SELECT alive, latency, data, error, checked_at FROM results WHERE key = ? AND target = ?"
+        for line in lines:
+            key = proxy_key(line) or line
+            if key_hash(key) not in fresh:
+                yield line, None
+                continue
+            row = self.db.execute(get, (key, target)).fetchone()
+            if row is None:
+                yield line, None
+                continue
+            alive, latency, data, error, checked_at = row
+            self.fresh += 1
+            if alive:
+                yield line, (latency, dict(json.loads(data or "{}"), cached_at=checked_at))
+            else:
+                yield line, (None, {"error": error, "cached_at": checked_at})
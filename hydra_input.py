@@ -0,0 +1,121 @@
+import hashlib, os
+from array import array
+from urllib.parse import unquote
+
+from hydra_core import parse_proxy
+
+# --- Streaming proxy input: never materialise the list, drop duplicates before any network work ---
+
+DEFAULT_PORTS = {"http": 80, "https": 443, "socks4": 1080, "socks4a": 1080, "socks5": 1080, "socks5h": 1080}
+
+def count_lines(path, bufsize=1 << 20):
+    """นับบรรทัดแบบอ่านเป็น block (ใช้เป็น total ของ progress) - ไม่ decode ไม่ split"""
+    n = 0; last = b"\n"
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(bufsize), b""):
+            n += chunk.count(b"\n"); last = chunk[-1:]
+    return n + (last != b"\n")
+
+def proxy_key(line):
+    """
+    key มาตรฐานของ proxy (scheme/host/port/credentials) สำหรับตัดตัวซ้ำ
+    เช่น 'http://1.1.1.1:80', '1.1.1.1:80' และ 'HTTP://1.1.1.1' ได้ key เดียวกัน
+    """
+    u = parse_proxy(line)
+    if not u: return None
+    # str.partition instead of urlsplit: this runs once per input line (millions)
+    scheme, _, rest = u.partition("://")
+    scheme = scheme.lower()
+    cred, _, hostport = rest.split("/", 1)[0].rpartition("@")
+    host, colon, port = hostport.rpartition(":")
+    if not colon or not port.isdigit() or (host.startswith("[") and not host.endswith("]")):
+        host, port = hostport, DEFAULT_PORTS.get(scheme, 0)
+    if "%" in cred:
+        cred = unquote(cred)
+    if cred and ":" not in cred:
+        cred += ":"
+    return f"{scheme}://{cred}@{host.lower()}:{int(port)}"
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8", "surrogateescape"), digest_size=8).digest(), "little")
+
+class HashSet64:
+    """set ของ hash 64-bit แบบ open addressing บน array('Q') (~16-32 byte/entry แทน ~100 byte ของ set[str])"""
+    __slots__ = ("_slots", "_mask", "_n")
+
+    def __init__(self, capacity=1 << 16):
+        self._slots = array("Q", bytes(8 * capacity))
+        self._mask = capacity - 1
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, h):
+        h = h or 1
+        slots, mask = self._slots, self._mask
+        i = h & mask
+        while (v := slots[i]) != 0:
+            if v == h:
+                return True
+            i = (i + 1) & mask
+        return False
+
+    def add(self, h):
+        """เพิ่ม hash - return True ถ้าเป็นตัวใหม่"""
+        h = h or 1  # 0 marks an empty slot
+        slots, mask = self._slots, self._mask
+        i = h & mask
+        while True:
+            v = slots[i]
+            if v == 0:
+                slots[i] = h; self._n += 1
+                if self._n * 2 > mask:
+                    self._grow()
+                return True
+            if v == h:
+                return False
+            i = (i + 1) & mask
+
+    def _grow(self):
+        old = self._slots
+        self._slots = array("Q", bytes(16 * len(old)))
+        self._mask = len(self._slots) - 1
+        slots, mask = self._slots, self._mask
+        for h in old:
+            if h:
+                i = h & mask
+                while slots[i]:
+                    i = (i + 1) & mask
+                slots[i] = h
+
+class ProxySource:
+    """
+    อ่าน proxy ทีละบรรทัดจากไฟล์ (หรือ iterable ใดๆ) ตัดบรรทัดว่าง + ตัวซ้ำทิ้งก่อนถึง checker
+    total = จำนวนบรรทัดจากการนับเร็ว (ไฟล์เท่านั้น), skipped = ว่าง + ซ้ำ
+    """
+    def __init__(self, src, dedup=True):
+        self.path = src if isinstance(src, (str, os.PathLike)) else None
+        self.src = src
+        self.dedup = dedup
+        self.total = count_lines(self.path) if self.path else None
+        self.read = self.blank = self.duplicates = 0
+        self.seen = HashSet64() if dedup else None
+
+    @property
+    def skipped(self):
+        return self.blank + self.duplicates
+
+    def __iter__(self):
+        f = open(self.path, encoding="utf-8", errors="replace") if self.path else self.src
+        try:
+            for line in f:
+                self.read += 1
+                line = line.strip()
+                if not line:
+                    self.blank += 1; continue
+                if self.seen is not None and not self.seen.add(key_hash(proxy_key(line))):
+                    self.duplicates += 1; continue
+                yield line
+        finally:
+            if self.path: f.close()
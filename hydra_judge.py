@@ -0,0 +1,182 @@
+import argparse, asyncio, json, os, ssl, threading
+from itertools import islice
+from urllib.parse import urlsplit
+
+from hydra_core import JUDGE_URL, REVEALING_HEADERS, is_loopback, parse_proxy
+
+# --- Proxy judge: one response = exit IP + proxy-revealing headers + anonymity class (+ offline geo) ---
+# รันในโปรแกรมเดียวกับ checker (proxy ในเครื่อง / ทดสอบ) หรือ deploy บน host ของเราเอง แล้วชี้ HYDRA_JUDGE_URL มาที่นั่น
+# python hydra_judge.py --port 8899 --public 203.0.113.7 --geo-db geoip.csv [--cert cert.pem --key key.pem]
+
+MAX_HEAD = 16 * 1024
+JUDGE_SAMPLE = 1000  # input lines looked at before checking against a judge on loopback
+# everything a proxy may add that says "a proxy was here" (only these are echoed back, keeps the body tiny)
+ECHO_HEADERS = REVEALING_HEADERS + ("Forwarded", "X-Forwarded-Host", "X-Forwarded-Proto", "X-Forwarded-Port",
+                                    "Client-Ip", "X-Client-Ip", "X-Proxy-Id", "Proxy-Connection", "Cf-Connecting-Ip")
+
+def anon_class(headers):
+    """จัดกลุ่ม anonymity แบบเดียวกับ parse_anonymous: มี XFF / X-Real-Ip / Via = Transparent"""
+    return "Transparent" if any(h in headers for h in REVEALING_HEADERS) else "Anonymous"
+
+def judge_body(client_ip, headers, db=None):
+    """body ของ judge: {"ip", "anon", "headers"[, "geo"]} - headers เฉพาะตัวที่บอกว่าผ่าน proxy"""
+    canon = {k.title(): v for k, v in headers.items()}
+    body = {"ip": client_ip, "anon": anon_class(canon),
+            "headers": {k: canon[k] for k in ECHO_HEADERS if k in canon}}
+    geo = db.lookup(client_ip) if db is not None else None
+    if geo:
+        body["geo"] = geo
+    return json.dumps(body, separators=(",", ":")).encode()
+
+async def _serve_conn(reader, writer, db, conns):
+    client_ip = (writer.get_extra_info("peername") or ("",))[0]
+    conns.add(writer)
+    try:
+        while True:  # keep-alive: the checker sends all its probes over one connection
+            try:
+                raw = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                return
+            lines = raw.decode("latin-1").split("\r\n")
+            method, _, rest = lines[0].partition(" ")
+            version = rest.rpartition(" ")[2]
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    k, v = line.split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+            if headers.get("content-length", "0").isdigit() and int(headers.get("content-length", "0")):
+                await reader.readexactly(int(headers["content-length"]))
+            body = judge_body(client_ip, headers, db)
+            close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nCache-Control: no-store\r\n"
+                         b"Content-Length: %d\r\nConnection: %s\r\n\r\n" % (len(body), b"close" if close else b"keep-alive")
+                         + (b"" if method == "HEAD" else body))
+            await writer.drain()
+            if close:
+                return
+    except ConnectionError:
+        pass
+    finally:
+        conns.discard(writer)
+        writer.close()
+
+class JudgeServer:
+    """judge แบบฝังในโปรแกรม: start() เปิด event loop ของตัวเองใน thread แยก, stop() ปิด"""
+    def __init__(self, host="127.0.0.1", port=8899, db=None, certfile=None, keyfile=None, public=None):
+        self.host, self.port, self.db = host, port, db
+        self.public = public  # address the proxies reach us at (bound to 0.0.0.0 / behind NAT)
+        self.ssl = None
+        if certfile:
+            self.ssl = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            self.ssl.load_cert_chain(certfile, keyfile)
+        self._loop = self._server = self._thread = None
+        self._conns = set()
+
+    @property
+    def url(self):
+        host = self.public or self.host
+        host = f"[{host}]" if ":" in host else host
+        return f"{'https' if self.ssl else 'http'}://{host}:{self.port}/judge"
+
+    async def serve(self):
+        self._server = await asyncio.start_server(lambda r, w: _serve_conn(r, w, self.db, self._conns),
+                                                  self.host, self.port, ssl=self.ssl, limit=MAX_HEAD, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]  # port=0 -> whatever the OS picked
+        return self._server
+
+    def start(self):
+        ready, err = threading.Event(), []
+        def main():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.serve())
+            except OSError as e:
+                err.append(e); ready.set(); return
+            ready.set()
+            self._loop.run_forever()
+            self._server.close()
+            for w in list(self._conns):  # keep-alive connections parked in readuntil see EOF and return
+                w.close()
+            tasks = asyncio.all_tasks(self._loop)
+            if tasks:  # gather() with nothing to wait for has no loop to bind to
+                self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+        self._thread = threading.Thread(target=main, daemon=True)
+        self._thread.start()
+        ready.wait()
+        if err:
+            raise err[0]
+        return self
+
+    def stop(self):
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+
+_local = {}
+
+def ensure_local_judge(url=JUDGE_URL, db=None):
+    """
+    ถ้า url ชี้มาที่เครื่องนี้ (127.0.0.1 / localhost) และยังไม่มีใครฟังอยู่ -> เปิด judge ในโปรแกรมให้เลย
+    return: JudgeServer ที่เปิดใหม่ หรือ None (ใช้ของที่มีอยู่ / judge อยู่ host อื่น)
+    """
+    sp = urlsplit(url)
+    if sp.hostname not in ("127.0.0.1", "localhost") or sp.scheme != "http":
+        return None
+    port = sp.port or 80
+    if port in _local:
+        return None
+    try:
+        srv = JudgeServer(sp.hostname, port, db).start()
+    except OSError:
+        return None  # already listening (ours from another run, or a judge started by hand)
+    _local[port] = srv
+    return srv
+
+def unreachable(url, lines, sample=JUDGE_SAMPLE):
+    """
+    judge บน loopback ใช้ได้กับ proxy ในเครื่องเท่านั้น - proxy เครื่องอื่นส่ง request มาไม่ถึง (ทุกตัวจะกลายเป็น DEAD)
+    return: ข้อความบอกวิธีแก้ ถ้าใน sample บรรทัดแรกมี proxy ที่อยู่ host อื่น, ไม่งั้น None
+    """
+    if not is_loopback(urlsplit(url).hostname):
+        return None
+    for line in islice((r for r in lines if r.strip()), sample):
+        try:
+            host = urlsplit(parse_proxy(line)).hostname
+        except ValueError:
+            continue  # unparsable line: the checker reports it dead on its own
+        if host and not is_loopback(host):
+            return (f"judge {url} is on loopback and proxy host {host} can't reach it: run hydra_judge.py on a host "
+                    f"the proxies can reach (--public ADDR) and set HYDRA_JUDGE_URL to the URL it prints")
+    return None
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="hydra_judge", description="HYDRA proxy judge (exit IP + anonymity in one response)")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8899)
+    ap.add_argument("--public", default="", help="address the proxies reach this judge at (goes into the printed URL)")
+    ap.add_argument("--geo-db", default="", help="offline GeoIP range CSV: adds geo of the exit IP to every answer")
+    ap.add_argument("--cert", default="", help="TLS certificate (serve https)")
+    ap.add_argument("--key", default="", help="TLS private key")
+    args = ap.parse_args(argv)
+    db = None
+    if args.geo_db and os.path.exists(args.geo_db):
+        from hydra_geo import OfflineGeoDB
+        db = OfflineGeoDB(args.geo_db)
+    srv = JudgeServer(args.host, args.port, db, args.cert or None, args.key or None, args.public or None)
+
+    async def forever():
+        server = await srv.serve()
+        print(f"judge listening on {args.host}:{srv.port}, checkers use HYDRA_JUDGE_URL={srv.url}", flush=True)
+        if not args.public and args.host in ("0.0.0.0", "::"):
+            print("(--public ADDR puts the address the proxies see into that URL)", flush=True)
+        async with server:
+            await server.serve_forever()
+    try:
+        asyncio.run(forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import asyncio, contextlib, threading, time
+from urllib.parse import urlsplit
+
+# --- Per-destination-host token bucket + max in-flight: our own burst must not get good proxies marked DEAD ---
+
+class Cancelled(Exception):
+    """STOP ระหว่างรอ token / slot - request นั้นไม่ถูกส่ง"""
+
+class TokenBucket:
+    """token bucket แบบจองล่วงหน้า: reserve() คืนเวลาที่ต้องรอ (token ติดลบได้ = คิวที่จองไว้แล้ว)"""
+    def __init__(self, per_min, burst=None):
+        self.rate = per_min / 60.0
+        self.burst = burst if burst is not None else max(1.0, per_min / 60.0)
+        self.tokens = self.burst
+        self.t = time.monotonic()
+        self.waited = 0.0  # total seconds handed out as waits
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.t) * self.rate); self.t = now
+            self.tokens -= 1
+            delay = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            self.waited += delay
+            return delay
+
+class HostLimiter:
+    """
+    จำกัด request ต่อ host ปลายทาง: limits = {host: (rate_per_min | None, max_inflight | None)}
+    hold(url) สำหรับ thread engine (block), hold_async(url) สำหรับ async engine (await)
+    host ที่ไม่มีใน limits ไม่ถูกจำกัด
+    """
+    def __init__(self, limits):
+        self.limits = {h: v for h, v in limits.items() if v[0] or v[1]}
+        self._buckets = {h: TokenBucket(r) for h, (r, _) in self.limits.items() if r}
+        self._sems = {h: threading.BoundedSemaphore(n) for h, (_, n) in self.limits.items() if n}
+        self._asems = {}
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """ปลุกทุกตัวที่รอ token / slot อยู่ (STOP) ให้ยกเลิก request ของตัวเอง"""
+        self._cancel.set()
+
+    @property
+    def waited(self):
+        """วินาทีรวมที่ต้องรอ token (ทุก host)"""
+        return sum(b.waited for b in self._buckets.values())
+
+    @staticmethod
+    def host(url):
+        return (urlsplit(url).hostname or "").lower()
+
+    @contextlib.contextmanager
+    def hold(self, url):
+        h = self.host(url)
+        sem = self._sems.get(h)
+        if sem is not None:
+            while not sem.acquire(timeout=0.25):
+                if self._cancel.is_set():
+                    raise Cancelled(h)
+        try:
+            bucket = self._buckets.get(h)
+            if bucket is not None and self._cancel.wait(bucket.reserve()):
+                raise Cancelled(h)
+            yield
+        finally:
+            if sem is not None: sem.release()
+
+    @contextlib.asynccontextmanager
+    async def hold_async(self, url):
+        h = self.host(url)
+        sem = None
+        if h in self._sems:
+            sem = self._asems.get(h) or self._asems.setdefault(h, asyncio.Semaphore(self.limits[h][1]))
+            await sem.acquire()
+        try:
+            bucket = self._buckets.get(h)
+            if bucket is not None:
+                end = time.monotonic() + bucket.reserve()
+                while (left := end - time.monotonic()) > 0:
+                    if self._cancel.is_set():
+                        raise Cancelled(h)
+                    await asyncio.sleep(min(left, 0.25))
+            yield
+        finally:
+            if sem is not None: sem.release()
+
+def hold(limiter, url):
+    """limiter.hold(url) หรือ no-op ถ้าไม่ได้จำกัด"""
+    return limiter.hold(url) if limiter is not None else contextlib.nullcontext()
+
+def hold_async(limiter, url):
+    return limiter.hold_async(url) if limiter is not None else contextlib.nullcontext()
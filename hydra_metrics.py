@@ -0,0 +1,217 @@
+import math, threading, time
+from array import array
+from collections import Counter
+
+# --- Latency statistics: per-proxy min/median/p95 + run-wide fixed-bucket histogram (no per-sample storage) ---
+
+def percentile(sorted_vals, q):
+    """nearest-rank percentile ของ list ที่เรียงแล้ว (q = 0..1)"""
+    if not sorted_vals:
+        return None
+    return sorted_vals[min(len(sorted_vals) - 1, max(0, math.ceil(q * len(sorted_vals)) - 1))]
+
+def median(vals):
+    v = sorted(vals)
+    if not v:
+        return None
+    mid = len(v) // 2
+    return v[mid] if len(v) % 2 else (v[mid - 1] + v[mid]) / 2
+
+def latency_stats(samples, attempts):
+    """สรุปเวลาของ probe ที่ผ่าน -> {latency (median), latency_min, latency_p95, success_ratio}"""
+    v = sorted(samples)
+    return {
+        "latency": median(v),
+        "latency_min": v[0] if v else None,
+        "latency_p95": percentile(v, 0.95),
+        "success_ratio": len(v) / attempts if attempts else 0.0,
+    }
+
+class LatencyHistogram:
+    """
+    histogram แบบ bucket คงที่ (log scale, กว้างทีละ 5% -> quantile คลาดไม่เกิน ~2.5%)
+    ตั้งแต่ 0.1ms ถึง 120s ใช้ ~290 ช่อง (array('Q')) ไม่ว่าจะใส่กี่ล้านค่า
+    """
+    LO = 1e-4
+    HI = 120.0
+    GROWTH = 1.05
+
+    def __init__(self):
+        self._log_g = math.log(self.GROWTH)
+        self.nbuckets = math.ceil(math.log(self.HI / self.LO) / self._log_g)
+        self.counts = array("Q", bytes(8 * (self.nbuckets + 2)))  # [0] underflow, [-1] overflow
+        self.count = 0
+        self.total = 0.0
+        self.min = self.max = None
+
+    def __len__(self):
+        return self.count
+
+    def _index(self, v):
+        if v < self.LO:
+            return 0
+        return min(self.nbuckets + 1, int(math.log(v / self.LO) / self._log_g) + 1)
+
+    def add(self, v):
+        if v is None:
+            return
+        self.counts[self._index(v)] += 1
+        self.count += 1; self.total += v
+        self.min = v if self.min is None or v < self.min else self.min
+        self.max = v if self.max is None or v > self.max else self.max
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count; self.total += other.total
+        for v in (other.min, other.max):
+            if v is not None:
+                self.min = v if self.min is None or v < self.min else self.min
+                self.max = v if self.max is None or v > self.max else self.max
+
+    def quantile(self, q):
+        """ค่าประมาณของ quantile q (กึ่งกลางเชิง geometric ของ bucket นั้น)"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                if i == 0:
+                    return self.min
+                if i == self.nbuckets + 1:
+                    return self.max
+                v = self.LO * self.GROWTH ** (i - 0.5)
+                return min(max(v, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "min": self.min, "mean": self.total / self.count if self.count else None,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99), "max": self.max}
+
+# --- Traffic: HTTP bytes through a proxy, per check and per run (what a per-GB plan bills for) ---
+
+TRAFFIC_FIELDS = ("bytes_sent", "bytes_recv", "requests")
+
+class Traffic:
+    """
+    ไบต์ที่ส่ง / รับผ่าน proxy: request line + headers + body ขาออก, status line + headers + body ตามที่มาบนสาย (ก่อนแตก gzip)
+    ไม่รวม TLS record / handshake ของ tunnel (CONNECT / SOCKS) - นับเฉพาะ HTTP ที่เรายิงเอง
+    """
+    __slots__ = TRAFFIC_FIELDS
+
+    def __init__(self):
+        self.bytes_sent = self.bytes_recv = self.requests = 0
+
+    def add(self, sent, recv):
+        self.bytes_sent += sent; self.bytes_recv += recv; self.requests += 1
+
+    def merge(self, data):
+        """บวกผลของอีกตัว (Traffic หรือ proxy_data ที่มี bytes_sent / bytes_recv / requests)"""
+        get = data.get if isinstance(data, dict) else lambda k, d=0: getattr(data, k, d)
+        for k in TRAFFIC_FIELDS:
+            setattr(self, k, getattr(self, k) + (get(k, 0) or 0))
+
+    @property
+    def total(self):
+        return self.bytes_sent + self.bytes_recv
+
+    def per_request(self):
+        return self.total / self.requests if self.requests else None
+
+    def data(self):
+        return {k: getattr(self, k) for k in TRAFFIC_FIELDS}
+
+def format_bytes(n):
+    """1536 -> '1.5 KB' (ฐาน 1024 เหมือนช่อง PAYLOAD KB / DATA GB)"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+# --- Run metrics: gauges / counters / per-phase histograms of the check pipeline, cheap enough for every proxy ---
+
+PHASES = ("probe", "enrich", "connect", "proxy", "tls", "ttfb", "body")  # probe / enrich = wall time of the stage
+RATE_WINDOW = 10  # seconds behind completions/s
+
+class RunMetrics:
+    """
+    ตัวนับของ run เดียว: กำลัง probe / enrich อยู่กี่ตัว, รอคิวกี่ตัว, เสร็จกี่ตัวต่อวินาที, error แยกประเภท, เวลาแต่ละช่วง
+    ทุก method เป็น O(1) (histogram bucket คงที่) - เรียกจาก worker ทุกตัวได้
+    """
+    def __init__(self):
+        self.started_at = time.time()
+        self.queued = self.in_flight = self.enriching = 0
+        self.alive = self.dead = self.reused = 0
+        self.errors = Counter()
+        self.internal = 0  # exceptions that escaped a check (bugs, not proxy failures)
+        self.last_internal = ""
+        self.phases = {ph: LatencyHistogram() for ph in PHASES}
+        self._ring = [0] * RATE_WINDOW
+        self._ring_at = [0] * RATE_WINDOW
+        self._lock = threading.Lock()
+
+    def enqueue(self):
+        with self._lock: self.queued += 1
+
+    def dequeue(self):
+        with self._lock: self.queued -= 1
+
+    def probe_begin(self):
+        with self._lock: self.in_flight += 1
+        return time.perf_counter()
+
+    def probe_end(self, t0):
+        took = time.perf_counter() - t0
+        with self._lock:
+            self.in_flight -= 1; self.phases["probe"].add(took)
+
+    def enrich_begin(self):
+        with self._lock: self.enriching += 1
+        return time.perf_counter()
+
+    def enrich_end(self, t0):
+        took = time.perf_counter() - t0
+        with self._lock:
+            self.enriching -= 1; self.phases["enrich"].add(took)
+
+    def completed(self, avg, proxy_data, cached=False):
+        d = proxy_data or {}
+        with self._lock:
+            if cached:
+                self.reused += 1; return
+            sec = int(time.monotonic())
+            i = sec % RATE_WINDOW
+            if self._ring_at[i] != sec:
+                self._ring_at[i], self._ring[i] = sec, 0
+            self._ring[i] += 1
+            if avg is None:
+                self.dead += 1; self.errors[d.get("error") or "other"] += 1; return
+            self.alive += 1
+            for ph, v in (d.get("timings") or {}).items():
+                if v is not None and ph in self.phases: self.phases[ph].add(v)
+
+    def failed(self, exc):
+        with self._lock:
+            self.internal += 1; self.last_internal = f"{type(exc).__name__}: {exc}"
+
+    def rate(self):
+        """completions/s เฉลี่ย RATE_WINDOW วินาทีที่ผ่านมา (ไม่รวมวินาทีปัจจุบันที่ยังไม่ครบ)"""
+        now = int(time.monotonic())
+        span = min(RATE_WINDOW, max(1, int(time.time() - self.started_at)))
+        with self._lock:
+            n = sum(c for c, at in zip(self._ring, self._ring_at) if now - span <= at < now)
+        return n / span
+
+    def snapshot(self):
+        per_second = self.rate()
+        with self._lock:
+            return {
+                "uptime": time.time() - self.started_at, "per_second": per_second,
+                "queued": self.queued, "in_flight": self.in_flight, "enriching": self.enriching,
+                "alive": self.alive, "dead": self.dead, "reused": self.reused,
+                "errors": dict(self.errors.most_common()), "internal_errors": self.internal,
+                "last_internal_error": self.last_internal,
+                "phases": {ph: h.summary() for ph, h in self.phases.items() if len(h)},
+            }
@@ -0,0 +1,125 @@
+import math, threading, time
+
+import requests
+
+# --- Capacity planner: RPS / bandwidth / duration / cost from the whole alive pool (latency + success + tail) ---
+
+FX_URL = "https://open.er-api.com/v6/latest/USD"
+FX_FALLBACK = 36.50
+FX_TTL = 3600
+FX_RETRY = 60              # after a failed fetch, try again this much later (not a full TTL)
+PROXY_SAFE_RPS = 2.0       # requests/sec one proxy takes before its IP gets "hot"
+FAIL_COST = 10.0           # seconds a failed request holds its thread (≈ the probe timeout)
+Z95 = 1.6449               # standard normal 95th percentile (lognormal tail fit from median + p95)
+
+def attempt_time(latency, p95=None, success=1.0, fail_cost=FAIL_COST):
+    """
+    เวลาเฉลี่ยต่อ request ของ proxy 1 ตัว รวม tail: median + p95 -> lognormal -> mean = median * exp(sigma^2 / 2)
+    request ที่ fail ถือว่ากิน thread ไป fail_cost วินาที
+    """
+    mean = latency
+    if p95 and p95 > latency > 0:
+        sigma = math.log(p95 / latency) / Z95
+        mean = latency * math.exp(sigma * sigma / 2)
+    return success * mean + (1.0 - success) * fail_cost
+
+class PoolModel:
+    """
+    การกระจายของ alive pool (เรียงจากเร็วไปช้า) + prefix sum
+    -> ค่าเฉลี่ยของ pool ขนาด k ตัวที่เร็วที่สุด ได้ใน O(1) ทุก k (sweep ทั้งตารางไม่ต้องวนทั้ง pool ซ้ำ)
+    """
+    def __init__(self, proxies, fail_cost=FAIL_COST):
+        """proxies: iterable ของ (latency, success_ratio, latency_p95) - None = ไม่รู้ (ใช้ 1.0 / latency)"""
+        rows = sorted((lat, 1.0 if ok is None else ok, p95) for lat, ok, p95 in proxies if lat)
+        self.size = len(rows)
+        self.latencies = [r[0] for r in rows]
+        self._t = [0.0]; self._ok = [0.0]  # prefix sums of attempt time / success
+        for lat, ok, p95 in rows:
+            self._t.append(self._t[-1] + attempt_time(lat, p95, ok, fail_cost))
+            self._ok.append(self._ok[-1] + ok)
+
+    def __len__(self):
+        return self.size
+
+    def mean_time(self, k):
+        k = min(k, self.size)
+        return self._t[k] / k if k else 0.0
+
+    def success(self, k):
+        k = min(k, self.size)
+        return self._ok[k] / k if k else 0.0
+
+    def median(self):
+        n = self.size
+        if not n: return None
+        return self.latencies[n // 2] if n % 2 else (self.latencies[n // 2 - 1] + self.latencies[n // 2]) / 2
+
+def plan(pool, threads, rpc, payload_kb, data_gb, price_usd, fx, pool_size=None, safe_rps=PROXY_SAFE_RPS):
+    """
+    ค่าคาดการณ์ 1 จุด: threads ยิงวนผ่าน pool_size ตัวที่เร็วที่สุด
+    RPS ถูกจำกัดด้วยทั้งเวลาต่อ request (รวม tail / fail) และ safe_rps ต่อ proxy
+    """
+    k = min(pool_size or len(pool), len(pool))
+    t = pool.mean_time(k)
+    attempts = min(threads * rpc / t, k * safe_rps) if t > 0 else 0.0
+    rps = attempts * pool.success(k)
+    mb_s = rps * payload_kb / 1024
+    return {
+        "threads": threads, "pool": k, "payload_kb": payload_kb,
+        "rps": rps, "mb_s": mb_s, "seconds": data_gb * 1024 / mb_s if mb_s > 0 else 0.0,
+        "cost": data_gb * price_usd * fx,
+        # proxies needed so the per-proxy cap doesn't bind at this thread count
+        "suggest": max(1, math.ceil(threads * rpc / t / safe_rps)) if t > 0 else 1,
+        "bound": "pool" if t > 0 and k * safe_rps < threads * rpc / t else "threads",
+    }
+
+def sweep(pool, threads=(), pool_sizes=(), payloads_kb=(), rpc=1, data_gb=1.0, price_usd=0.0, fx=FX_FALLBACK,
+          safe_rps=PROXY_SAFE_RPS):
+    """ตาราง plan() ทุกคู่ threads x pool_sizes x payloads_kb (pool_sizes ว่าง = ทั้ง pool)"""
+    return [plan(pool, t, rpc, kb, data_gb, price_usd, fx, k, safe_rps)
+            for t in threads for k in (pool_sizes or (len(pool),)) for kb in payloads_kb]
+
+def format_duration(seconds):
+    if seconds > 3600: return f"{seconds / 3600:.2f} Hours"
+    if seconds > 60: return f"{seconds / 60:.2f} Mins"
+    return f"{seconds:.2f} Secs"
+
+class FxRate:
+    """
+    อัตรา USD -> THB แบบ cache (TTL): get() คืนค่าทันทีไม่รอ network
+    ถ้าหมดอายุจะดึงใหม่ใน thread แยก (fetching = True ระหว่างนั้น) ดึงไม่ได้ใช้ค่าเดิม / FX_FALLBACK
+    """
+    def __init__(self, url=FX_URL, ttl=FX_TTL, fallback=FX_FALLBACK, currency="THB"):
+        self.url, self.ttl, self.currency = url, ttl, currency
+        self.rate = fallback
+        self.live = False  # True once a fetch succeeded
+        self.fetched_at = None
+        self.fetching = False
+        self._lock = threading.Lock()
+
+    def stale(self):
+        return self.fetched_at is None or time.monotonic() - self.fetched_at >= self.ttl
+
+    def refresh(self, timeout=2):
+        """เริ่มดึงใหม่ใน background ถ้าหมดอายุ (ไม่ block)"""
+        with self._lock:
+            if self.fetching or not self.stale(): return False
+            self.fetching = True
+        threading.Thread(target=self._fetch, args=(timeout,), daemon=True).start()
+        return True
+
+    def _fetch(self, timeout):
+        ok = False
+        try:
+            self.rate = float(requests.get(self.url, timeout=timeout).json()["rates"][self.currency])
+            self.live = ok = True
+        except Exception:
+            pass  # keep the last good value (or the fallback)
+        finally:
+            # a failure backs off FX_RETRY instead of retrying on every click
+            self.fetched_at = time.monotonic() - (0 if ok else max(0, self.ttl - FX_RETRY))
+            self.fetching = False
+
+    def get(self):
+        self.refresh()
+        return self.rate
@@ -0,0 +1,383 @@
+import asyncio, heapq, hmac, json, os, threading, time
+from bisect import bisect_left, bisect_right, insort
+from urllib.parse import parse_qs, urlsplit
+
+from hydra_core import is_loopback
+from hydra_input import proxy_key
+
+# --- Pool-health daemon: the list is re-checked forever on a priority schedule, indexed answers on a local port ---
+# python hydra_cli.py proxies.txt -t JDG --daemon 127.0.0.1:8877
+# curl 'http://127.0.0.1:8877/best?n=10&country=TH&anon=anonymous'
+
+POOL_PORT = 8877
+POOL_INTERVAL = 300             # re-check an alive proxy after this (seconds) ...
+POOL_INTERVAL_MAX = 3600        # ... doubling per consecutive alive check up to this
+POOL_INTERVAL_MIN = 30          # flaky proxies come back at most this often
+POOL_DEAD_MAX = 6 * 3600        # dead ones back off interval, 2x, 4x ... up to this
+POOL_FLAP_DECAY = 0.5           # flap score: x decay per check, +1 when alive/dead flips
+POOL_FLAP_WEIGHT = 4            # interval / (1 + weight * flaps)
+POOL_BATCH = 5000               # due proxies handed to one Checker.run round
+POOL_SLACK = 1.0                # ... plus the ones due within this (seconds), so rounds don't shrink to 1 proxy
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0)  # upper bounds (s) reported by /stats
+ANON_CLASSES = ("anonymous", "transparent", "unknown")
+ANY = "*"
+MAX_HEAD = 16 * 1024
+MAX_BODY = 1024 * 1024          # POST /add: ~30k proxy lines per request, bigger lists go in batches
+POOL_TOKEN = os.environ.get("HYDRA_POOL_TOKEN", "")  # Authorization: Bearer <token> clients must present
+
+# fields an entry keeps from proxy_data (what /best answers with)
+POOL_FIELDS = ("latency", "latency_p95", "success_ratio", "anon_type", "country", "country_code", "city", "isp", "exit_ip")
+
+def anon_class(anon_type):
+    a = (anon_type or "").lower()
+    return a if a in ANON_CLASSES else "unknown"
+
+class Entry:
+    __slots__ = ("proxy", "alive", "info", "checked_at", "checks", "fails", "streak", "flaps", "next_due", "index_keys")
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.alive = None      # None = never checked
+        self.info = None       # POOL_FIELDS of the last alive check
+        self.checked_at = 0.0
+        self.checks = self.fails = self.streak = 0
+        self.flaps = 0.0
+        self.next_due = 0.0
+        self.index_keys = ()   # (latency, slots) it is filed under in Pool.index
+
+class Pool:
+    """
+    สถานะล่าสุดของทุก proxy ใน pool + ตารางเวลาเช็คซ้ำ + index สำหรับ query
+    ตาราง: heap ตาม next_due (ยังไม่เคยเช็ค = 0 มาก่อน) - ตัวที่ alive ติดกันเว้นนานขึ้นเท่าตัว, ตัวที่สลับ alive/dead (flaky) เร็วขึ้น,
+    ตัว dead ถอยแบบ backoff
+    index: (country_code, anon class) รวม '*' = list ที่เรียงตาม latency อยู่แล้ว -> N ตัวที่เร็วที่สุด = slice, max_latency = bisect
+    """
+    def __init__(self, interval=POOL_INTERVAL, interval_max=POOL_INTERVAL_MAX, interval_min=POOL_INTERVAL_MIN,
+                 dead_max=POOL_DEAD_MAX):
+        self.interval, self.interval_max, self.interval_min, self.dead_max = interval, interval_max, interval_min, dead_max
+        self.entries = {}       # proxy_key -> Entry
+        self.index = {}         # (country_code, anon) -> [(latency, proxy_key)] sorted
+        self._due = []          # heap of (next_due, checked_at, proxy_key); in-flight entries are not in it
+        self._lock = threading.Lock()
+        self.checks = self.rounds = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, lines):
+        """เพิ่ม proxy ใหม่ (ตัวที่มีอยู่แล้วข้าม) - ถึงคิวทันที, return จำนวนที่เพิ่ม"""
+        n = 0
+        with self._lock:
+            for line in lines:
+                line = line.strip()
+                key = proxy_key(line) if line else None
+                if key is None or key in self.entries: continue
+                self.entries[key] = Entry(line)
+                heapq.heappush(self._due, (0.0, 0.0, key))
+                n += 1
+        return n
+
+    def restore(self, history, target):
+        """สถานะเริ่มต้นจาก hydra_history (เฉพาะ proxy ที่อยู่ใน pool) - daemon ที่ restart ไม่ต้องเช็คทั้ง pool ใหม่"""
+        rows = history.db.execute("SELECT key, checked_at, alive, fails, checks, data FROM results WHERE target = ?",
+                                  (target,))
+        with self._lock:
+            for key, checked_at, alive, fails, checks, data in rows:
+                e = self.entries.get(key)
+                if e is None or e.checks: continue
+                e.checked_at, e.checks, e.fails = checked_at, checks, fails
+                e.alive = bool(alive)
+                e.streak = 0 if fails else 1
+                if alive:
+                    d = json.loads(data or "{}")
+                    e.info = {k: d.get(k) for k in POOL_FIELDS}
+                    if e.info["latency"] is None: e.alive, e.info = False, None
+                self._reindex(key, e)
+                e.next_due = checked_at + self._interval(e)
+            self._due = [(e.next_due, e.checked_at, k) for k, e in self.entries.items()]
+            heapq.heapify(self._due)
+
+    def _interval(self, e):
+        if e.alive:
+            iv = min(self.interval_max, self.interval * 2 ** min(max(0, e.streak - 1), 16))
+        else:
+            iv = min(self.dead_max, self.interval * 2 ** min(max(0, e.fails - 1), 16))
+        return max(self.interval_min, iv / (1 + POOL_FLAP_WEIGHT * e.flaps))
+
+    def take(self, now=None, limit=POOL_BATCH):
+        """proxy ที่ถึงคิวแล้ว (เรียงตามลำดับความสำคัญ) ไม่เกิน limit ตัว - ออกจาก heap จนกว่าจะ update / requeue"""
+        now = time.time() if now is None else now
+        out = []
+        with self._lock:
+            while self._due and self._due[0][0] <= now and len(out) < limit:
+                out.append(self.entries[heapq.heappop(self._due)[2]].proxy)
+        return out
+
+    def next_due(self):
+        with self._lock:
+            return self._due[0][0] if self._due else None
+
+    def requeue(self, proxies, delay=0.0):
+        """ตัวที่ส่งไปเช็คแต่ไม่ได้ผลกลับมา (STOP ระหว่างรอบ) กลับเข้าคิว"""
+        now = time.time()
+        with self._lock:
+            for p in proxies:
+                key = proxy_key(p) or p
+                e = self.entries.get(key)
+                if e is None: continue
+                e.next_due = now + delay
+                heapq.heappush(self._due, (e.next_due, e.checked_at, key))
+
+    def update(self, p, avg, proxy_data, now=None):
+        """ผลเช็ค 1 ตัว -> สถานะ / index / คิวรอบถัดไป"""
+        now = time.time() if now is None else now
+        key = proxy_key(p) or p
+        with self._lock:
+            e = self.entries.get(key)
+            if e is None: return
+            alive = avg is not None
+            e.flaps *= POOL_FLAP_DECAY
+            if e.alive is not None and e.alive != alive:
+                e.flaps += 1
+            e.alive = alive
+            e.checked_at = now; e.checks += 1; self.checks += 1
+            if alive:
+                e.streak += 1; e.fails = 0
+                d = proxy_data or {}
+                e.info = {k: d.get(k) for k in POOL_FIELDS}
+                e.info["latency"] = avg
+            else:
+                e.streak = 0; e.fails += 1; e.info = None
+            self._reindex(key, e)
+            e.next_due = now + self._interval(e)
+            heapq.heappush(self._due, (e.next_due, e.checked_at, key))
+
+    def _reindex(self, key, e):
+        if e.index_keys:
+            lat, slots = e.index_keys
+            for slot in slots:
+                lst = self.index[slot]
+                i = bisect_left(lst, (lat, key))
+                if i < len(lst) and lst[i] == (lat, key): del lst[i]
+            e.index_keys = ()
+        if not e.alive: return
+        lat, cc, anon = e.info["latency"], (e.info.get("country_code") or "").upper(), anon_class(e.info.get("anon_type"))
+        slots = ((cc, anon), (cc, ANY), (ANY, anon), (ANY, ANY))
+        for slot in slots:
+            insort(self.index.setdefault(slot, []), (lat, key))
+        e.index_keys = (lat, slots)
+
+    def best(self, n=10, country=None, anon=None, max_latency=None):
+        """N ตัวที่ alive และเร็วที่สุดตามเงื่อนไข (ไม่ต้องไล่ทั้ง pool)"""
+        slot = ((country or ANY).upper(), anon_class(anon) if anon and anon != ANY else ANY)
+        with self._lock:
+            lst = self.index.get(slot, ())
+            end = len(lst) if max_latency is None else bisect_right(lst, (max_latency, "\U0010ffff"))
+            out = []
+            for lat, key in lst[:min(end, max(0, n))]:
+                e = self.entries[key]
+                out.append(dict(e.info, proxy=e.proxy, checked_at=e.checked_at, checks=e.checks))
+        return out
+
+    def stats(self):
+        """จำนวนต่อ country / anon / latency bucket (นับด้วย bisect จาก index)"""
+        with self._lock:
+            everything = self.index.get((ANY, ANY), [])
+            buckets, lo = {}, 0
+            for hi in LATENCY_BUCKETS:
+                i = bisect_right(everything, (hi, "\U0010ffff"))
+                buckets[f"<{hi:g}s"] = i - lo; lo = i
+            buckets[f">={LATENCY_BUCKETS[-1]:g}s"] = len(everything) - lo
+            due_now = sum(1 for t, _, _ in self._due if t <= time.time()) if len(self._due) < 100_000 else None
+            return {
+                "size": len(self.entries), "alive": len(everything),
+                "checked": sum(1 for e in self.entries.values() if e.checks), "checks": self.checks, "rounds": self.rounds,
+                "queued": len(self._due), "in_flight": len(self.entries) - len(self._due), "due_now": due_now,
+                "next_due": self._due[0][0] if self._due else None,
+                "country": {cc or "??": len(lst) for (cc, a), lst in self.index.items() if a == ANY and cc != ANY and lst},
+                "anon": {a: len(lst) for (cc, a), lst in self.index.items() if cc == ANY and a != ANY and lst},
+                "latency": buckets,
+            }
+
+class PoolDaemon:
+    """
+    วนเช็ค pool ไม่รู้จบด้วย Checker ตัวเดียว: ทุกรอบหยิบตัวที่ถึงคิว (take) ส่งเข้า Checker.run แล้วรอตัวถัดไปที่ถึงคิว
+    ผลทุกตัวเข้า Pool.update (+ on_result เดิม: export / history ทำงานตามปกติ)
+    """
+    def __init__(self, checker, pool, on_result=None, batch=POOL_BATCH, on_round=None):
+        self.checker, self.pool = checker, pool
+        self.on_result, self.on_round = on_result, on_round
+        self.batch = batch
+        self._wake = threading.Event()
+        self._stopped = False
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        self.checker.stop()
+
+    def kick(self):
+        """มีของใหม่ใน pool (POST /add): ไม่ต้องรอจนถึงเวลาของตัวถัดไป"""
+        self._wake.set()
+
+    def run(self):
+        pending = set()
+        def on_result(p, avg, proxy_data):
+            pending.discard(p)
+            self.pool.update(p, avg, proxy_data)
+            if self.on_result: self.on_result(p, avg, proxy_data)
+        while not self._stopped:
+            batch = self.pool.take(time.time() + POOL_SLACK, self.batch)
+            if not batch:
+                nxt = self.pool.next_due()
+                self._wake.wait(60 if nxt is None else min(60, max(0.05, nxt - time.time())))
+                self._wake.clear()
+                continue
+            pending = set(batch)
+            st = time.time()
+            self.checker.run(batch, on_result)
+            if pending: self.pool.requeue(pending, 0 if self._stopped else self.pool.interval_min)
+            self.pool.rounds += 1
+            if self.on_round: self.on_round(len(batch), self.checker.alive, time.time() - st)
+
+def parse_listen(addr, default_port=POOL_PORT):
+    """
+    'host:port' / ':port' / '[::1]:port' / 'host' -> (host, port) ของ server ทุกตัว (daemon / gateway / metrics / shard)
+    ไม่ระบุ host = 127.0.0.1: เปิดให้เครื่องอื่นต้องเขียน 0.0.0.0 เอง
+    """
+    addr = addr.strip()
+    if addr.startswith("["):  # [v6]:port
+        host, _, rest = addr[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else rest
+    elif addr.count(":") > 1:  # bare v6 address, no port
+        host, port = addr, ""
+    else:
+        host, _, port = addr.rpartition(":") if ":" in addr else (addr, "", "")
+    if port and not port.isdigit():
+        raise ValueError(f"bad port in {addr!r}")
+    return host or "127.0.0.1", int(port or default_port)
+
+def _query(path):
+    sp = urlsplit(path)
+    return sp.path, {k: v[-1] for k, v in parse_qs(sp.query).items()}
+
+def _answer(pool, daemon, method, path, body):
+    route, q = _query(path)
+    if route == "/best":
+        try:
+            n = int(q.get("n", 10))
+            max_latency = float(q["max_latency"]) if q.get("max_latency") else None
+        except ValueError:
+            return 400, "application/json", b'{"error":"bad n / max_latency"}'
+        rows = pool.best(n, q.get("country"), q.get("anon"), max_latency)
+        if q.get("format") == "text":
+            return 200, "text/plain", "".join(r["proxy"] + "\n" for r in rows).encode()
+        return 200, "application/json", json.dumps({"count": len(rows), "proxies": rows}, ensure_ascii=False,
+                                                   separators=(",", ":")).encode()
+    if route == "/stats":
+        return 200, "application/json", json.dumps(pool.stats(), separators=(",", ":")).encode()
+    if route == "/add" and method == "POST":
+        n = pool.add(body.decode("utf-8", "replace").splitlines())
+        if n and daemon is not None: daemon.kick()
+        return 200, "application/json", json.dumps({"added": n, "size": len(pool)}).encode()
+    return 404, "application/json", b'{"error":"use /best, /stats or POST /add"}'
+
+def _authorized(headers, token):
+    kind, _, cred = headers.get("authorization", "").partition(" ")
+    return kind.lower() == "bearer" and hmac.compare_digest(cred.strip().encode("latin-1"), token.encode())
+
+def _respond(writer, status, ctype, out, close, extra=b""):
+    writer.write(b"HTTP/1.1 %d %s\r\nContent-Type: %s\r\nCache-Control: no-store\r\nContent-Length: %d\r\n"
+                 b"%sConnection: %s\r\n\r\n" % (status, b"OK" if status == 200 else b"Error", ctype.encode(), len(out),
+                                                  extra, b"close" if close else b"keep-alive") + out)
+
+async def _serve_conn(reader, writer, answer, conns, token=""):
+    conns.add(writer)
+    try:
+        while True:  # keep-alive
+            try:
+                raw = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                return
+            lines = raw.decode("latin-1").split("\r\n")
+            method, _, rest = lines[0].partition(" ")
+            path, _, version = rest.rpartition(" ")
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    k, v = line.split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+            length = int(headers["content-length"]) if headers.get("content-length", "").isdigit() else 0
+            # refused before the body is read: the connection is closed, never left mid-body
+            if token and not _authorized(headers, token):
+                _respond(writer, 401, "application/json", b'{"error":"bearer token required"}', True,
+                         b'WWW-Authenticate: Bearer realm="hydra"\r\n')
+                await writer.drain(); return
+            if length > MAX_BODY:
+                _respond(writer, 413, "application/json", b'{"error":"body over %d bytes"}' % MAX_BODY, True)
+                await writer.drain(); return
+            body = await reader.readexactly(length) if length else b""
+            status, ctype, out = answer(method, path, body)
+            close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+            _respond(writer, status, ctype, out, close)
+            await writer.drain()
+            if close:
+                return
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        conns.discard(writer)
+        writer.close()
+
+class PoolServer:
+    """
+    HTTP query ของ pool (/best /stats POST /add) บน event loop ของตัวเองใน thread แยก แบบเดียวกับ JudgeServer
+    token: ทุก request ต้องมี Authorization: Bearer <token> - host ที่ไม่ใช่ loopback ไม่มี token = ValueError
+    """
+    def __init__(self, pool, host="127.0.0.1", port=POOL_PORT, daemon=None, token=POOL_TOKEN):
+        if not token and not is_loopback(host):
+            # anyone who can reach the port could read the pool and POST /add into the check queue
+            raise ValueError(f"{host} is reachable from other hosts: set a bearer token")
+        self.pool, self.host, self.port, self.daemon, self.token = pool, host, port, daemon, token
+        self._loop = self._server = self._thread = None
+        self._conns = set()
+
+    def answer(self, method, path, body):
+        """request หนึ่งตัว -> (status, content type, body) - subclass เปลี่ยน route ได้ (hydra_telemetry.MetricsServer)"""
+        return _answer(self.pool, self.daemon, method, path, body)
+
+    @property
+    def url(self):
+        return f"http://[{self.host}]:{self.port}" if ":" in self.host else f"http://{self.host}:{self.port}"
+
+    def start(self):
+        ready, err = threading.Event(), []
+        def main():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._server = self._loop.run_until_complete(asyncio.start_server(
+                    lambda r, w: _serve_conn(r, w, self.answer, self._conns, self.token),
+                    self.host, self.port, limit=MAX_HEAD, backlog=1024))
+            except OSError as e:
+                err.append(e); ready.set(); return
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+            self._server.close()
+            for w in list(self._conns):
+                w.close()
+            tasks = asyncio.all_tasks(self._loop)
+            if tasks:  # gather() with nothing to wait for has no loop to bind to
+                self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+        self._thread = threading.Thread(target=main, daemon=True)
+        self._thread.start()
+        ready.wait()
+        if err:
+            raise err[0]
+        return self
+
+    def stop(self):
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
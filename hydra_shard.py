@@ -0,0 +1,394 @@
+import argparse, hmac, json, math, multiprocessing, os, queue, secrets, socket, sys, threading, time
+from collections import Counter
+
+from hydra_core import is_loopback
+from hydra_input import proxy_key, key_hash
+from hydra_pool import parse_listen
+
+# --- Sharded checking: a coordinator hashes the proxy stream over worker processes / boxes, results merge back ---
+# protocol = NDJSON over TCP (host:port) or a Unix socket (unix:/path); workers dial the coordinator
+# remote box: python hydra_shard.py worker --connect 10.0.0.5:7700 --token SECRET
+
+SHARD_PORT = 7700
+SHARD_WINDOW = 1000            # lines buffered at a worker before its engine takes them (credit-based flow control)
+SHARD_ACK = 100                # a worker acknowledges taken lines in batches of this (or whenever its buffer runs dry)
+SHARD_CONNECT_TIMEOUT = 30     # local worker processes must dial back within this
+SHARD_TOKEN = os.environ.get("HYDRA_SHARD_TOKEN", "")
+
+def parse_address(addr):
+    """'host:port' / ':port' / '[v6]:port' / 'unix:/path' -> (family, sockaddr) - ไม่ระบุ host = 127.0.0.1"""
+    if addr.startswith("unix:"):
+        return socket.AF_UNIX, addr[len("unix:"):]
+    host, port = parse_listen(addr, SHARD_PORT)
+    return (socket.AF_INET6 if ":" in host else socket.AF_INET), (host, port)
+
+def exposed(addr):
+    """address ที่เครื่องอื่นต่อเข้ามาได้ (TCP ที่ไม่ใช่ loopback) - ต้องมี token"""
+    family, sa = parse_address(addr)
+    return family != socket.AF_UNIX and not is_loopback(sa[0])
+
+def listen(addr):
+    family, sa = parse_address(addr)
+    srv = socket.socket(family, socket.SOCK_STREAM)
+    if family == socket.AF_UNIX:
+        try: os.unlink(sa)
+        except OSError: pass
+    else:
+        srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    srv.bind(sa); srv.listen(64)
+    return srv
+
+def dial(addr, timeout=SHARD_CONNECT_TIMEOUT):
+    family, sa = parse_address(addr)
+    s = socket.socket(family, socket.SOCK_STREAM)
+    s.settimeout(timeout)
+    s.connect(sa)
+    s.settimeout(None)
+    if family != socket.AF_UNIX: s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return s
+
+def bound_address(srv, addr):
+    """address ที่ worker ในเครื่องใช้ dial กลับ (port=0 -> port ที่ OS ให้มา, 0.0.0.0 -> 127.0.0.1)"""
+    if srv.family == socket.AF_UNIX:
+        return addr
+    host, port = srv.getsockname()[:2]
+    if host in ("0.0.0.0", "::", ""):
+        host = "127.0.0.1" if srv.family == socket.AF_INET else "::1"
+    return f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+
+class Channel:
+    """
+    ข้อความ JSON ทีละบรรทัดบน socket เดียว: send() เรียกได้จากทุก thread (thread writer รวมเป็น batch ก่อนเขียน)
+    วน iterate = ข้อความที่เข้ามา จนอีกฝั่งปิด
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.broken = False
+        self._q = queue.SimpleQueue()
+        self._rf = sock.makefile("rb")
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def send(self, msg):
+        self._q.put(msg)
+
+    def _write_loop(self):
+        while True:
+            batch = [self._q.get()]
+            try:
+                while True: batch.append(self._q.get_nowait())
+            except queue.Empty:
+                pass
+            end = None in batch
+            data = "".join(json.dumps(m, ensure_ascii=False, separators=(",", ":")) + "\n" for m in batch if m is not None)
+            try:
+                if data: self.sock.sendall(data.encode("utf-8"))
+            except OSError:
+                self.broken = True; return
+            if end: return
+
+    def __iter__(self):
+        try:
+            for raw in self._rf:
+                yield json.loads(raw)
+        except (OSError, ValueError):
+            pass
+
+    def close(self):
+        self._q.put(None); self._writer.join(5)
+        try: self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+        self.sock.close()
+
+# ---------- worker ----------
+
+def serve(chan, geo_db=None):
+    """
+    ฝั่ง worker: รับ config -> Checker ของตัวเอง, บรรทัดที่ได้รับเช็คเป็นรอบ (จบรอบเมื่อได้ end), ผลส่งกลับทีละตัว
+    pause / resume / stop จาก coordinator สั่ง Checker ตรงๆ (reader ไม่เคย block จึงได้ stop ทันที)
+    """
+    from hydra_core import Checker
+    from hydra_geo import GeoCache, GeoResolver, OfflineGeoDB
+    msgs = iter(chan)
+    config = next(msgs, None)
+    if not config or config.get("op") != "config":
+        return
+    db = OfflineGeoDB(geo_db) if geo_db and os.path.exists(geo_db) else None
+    # in-memory exit-IP cache: local shards would race each other on one cache file
+    checker = Checker(geo=GeoResolver(GeoCache(None), db), **config["checker"])
+    checker.limits = {h: tuple(v) for h, v in config["limits"].items()}
+    END, CLOSE = object(), object()
+    inq = queue.SimpleQueue()
+
+    def reader():
+        for msg in msgs:
+            op = msg.get("op")
+            if op == "check": inq.put(msg["p"])
+            elif op == "end": inq.put(END)
+            elif op == "pause": checker.pause()
+            elif op == "resume": checker.resume()
+            elif op == "stop": checker.stop(); break
+            elif op == "close": break
+        else:
+            checker.stop()  # coordinator gone: nobody is left to take the results
+        inq.put(CLOSE)
+    threading.Thread(target=reader, daemon=True).start()
+
+    took = 0
+
+    def ack():
+        nonlocal took
+        if took: chan.send({"op": "took", "n": took}); took = 0
+
+    def round_lines(first):
+        # lines are acknowledged as the engine takes them, not when their result is in: the engine pulls its
+        # next line on its own event loop, so waiting for results to earn more lines would stall it for good
+        nonlocal took
+        item = first
+        while True:
+            took += 1
+            if took >= SHARD_ACK: ack()
+            yield item
+            try:
+                item = inq.get_nowait()
+            except queue.Empty:
+                ack(); item = inq.get()
+            if item is END:
+                ack(); return
+            if item is CLOSE:
+                inq.put(CLOSE); return
+
+    def on_result(p, avg, proxy_data):
+        chan.send({"op": "result", "p": p, "avg": avg, "data": proxy_data})
+
+    while not checker.stop_requested:
+        item = inq.get()
+        if item is CLOSE: break
+        if item is END: continue  # an end with no lines before it (redispatch after a shard died)
+        checker.run(round_lines(item), on_result)
+        chan.send({"op": "done", "checked": checker.checked, "alive": checker.alive,
+                   "waited": checker.limiter.waited if checker.limiter else 0.0})
+
+def worker_main(addr, token=SHARD_TOKEN, nonce="", geo_db=None):
+    chan = Channel(dial(addr))
+    chan.send({"op": "hello", "token": token, "nonce": nonce, "host": socket.gethostname(), "pid": os.getpid()})
+    try:
+        serve(chan, geo_db)
+    finally:
+        chan.close()
+
+# ---------- coordinator ----------
+
+class Shard:
+    __slots__ = ("chan", "name", "local", "pending", "queued", "alive", "stats")
+
+    def __init__(self, chan, hello, local):
+        self.chan = chan
+        self.name = f"{hello.get('host', '?')}:{hello.get('pid', '?')}"
+        self.local = local
+        self.pending = Counter()  # lines sent and not answered yet (re-sent elsewhere if this shard dies)
+        self.queued = 0  # sent and not taken by the worker's engine yet
+        self.alive = True
+        self.stats = {}
+
+def shard_limits(limits, n):
+    """limits ต่อ host หารกันระหว่าง n process ในเครื่องเดียว (ออก IP เดียวกัน = โควต้าเดียวกัน)"""
+    if n <= 1:
+        return limits
+    return {h: (r / n if r else r, max(1, math.ceil(i / n)) if i else i) for h, (r, i) in limits.items()}
+
+class Coordinator:
+    """
+    แบ่ง proxy ตาม hash ของ proxy key ไปยัง worker (process ในเครื่อง + worker จากเครื่องอื่นที่ dial เข้ามา)
+    ผลทุกตัวกลับมาทาง on_result เดียว -> Checker ฝั่งนี้นับ / history / checkpoint / GUI เหมือน run ปกติ
+    shard ที่หลุดกลางทาง: บรรทัดที่ยังไม่ได้ผลถูกส่งให้ shard ที่เหลือ
+    """
+    def __init__(self, checker_config, limits, on_result=None, stopped=lambda: False, pause_event=None,
+                 local=2, listen_addr=None, remote=0, token=None, geo_db=None, window=SHARD_WINDOW):
+        self.config = checker_config
+        self.limits = limits
+        self.on_result = on_result
+        self.stopped = stopped
+        self.pause_event = pause_event
+        self.local = max(0, int(local))
+        self.listen_addr = listen_addr or "127.0.0.1:0"
+        self.remote = max(0, int(remote))
+        self.token = SHARD_TOKEN if token is None else token
+        self.geo_db = geo_db
+        self.window = max(window, 2 * checker_config.get("concurrency", 1))
+        self.shards = []
+        self.procs = []
+        self._cond = threading.Condition()
+        self._distributed = False
+
+    def connect(self):
+        """เปิด worker ในเครื่อง + รอ worker ทุกตัว dial เข้ามา แล้วส่ง config - return False ถ้าโดน STOP ระหว่างรอ"""
+        if not self.token and exposed(self.listen_addr):
+            # anyone who can reach the port would get proxies to check and could feed back results
+            raise ValueError(f"shard listen address {self.listen_addr} is reachable from other hosts: "
+                             f"set a token (--shard-token / $HYDRA_SHARD_TOKEN)")
+        srv = listen(self.listen_addr)
+        srv.settimeout(0.2)
+        nonce = secrets.token_hex(8)
+        addr = bound_address(srv, self.listen_addr)
+        ctx = multiprocessing.get_context("spawn")
+        self.procs = [ctx.Process(target=worker_main, args=(addr, self.token, nonce, self.geo_db), daemon=True)
+                      for _ in range(self.local)]
+        for p in self.procs: p.start()
+        deadline = time.monotonic() + SHARD_CONNECT_TIMEOUT
+        try:
+            while len(self.shards) < self.local + self.remote:
+                if self.stopped():
+                    return False
+                if sum(s.local for s in self.shards) < self.local and time.monotonic() > deadline:
+                    raise ConnectionError(f"local shard workers did not connect within {SHARD_CONNECT_TIMEOUT}s")
+                try:
+                    conn, _ = srv.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(SHARD_CONNECT_TIMEOUT)
+                chan = Channel(conn)
+                hello = next(iter(chan), None)
+                conn.settimeout(None)
+                if not hello or hello.get("op") != "hello" or \
+                        not hmac.compare_digest(str(hello.get("token", "")).encode(), self.token.encode()):
+                    chan.close(); continue  # stray / wrong token
+                self.shards.append(Shard(chan, hello, hello.get("nonce") == nonce))
+        finally:
+            srv.close()
+            if srv.family == socket.AF_UNIX:
+                try: os.unlink(parse_address(self.listen_addr)[1])
+                except OSError: pass
+        n_local = sum(s.local for s in self.shards)
+        for s in self.shards:
+            limits = shard_limits(self.limits, n_local) if s.local else self.limits
+            s.chan.send({"op": "config", "checker": self.config, "limits": {h: list(v) for h, v in limits.items()}})
+        return True
+
+    def _pick(self, p):
+        live = [s for s in self.shards if s.alive]
+        if not live:
+            raise ConnectionError("every shard worker disconnected")
+        return live[key_hash(proxy_key(p) or p) % len(live)]
+
+    def dispatch(self, p):
+        """ส่งบรรทัดให้ shard ตาม hash - รอถ้า shard นั้นมีบรรทัดรออยู่เต็ม window แล้ว"""
+        with self._cond:
+            while True:
+                if self.stopped(): return
+                s = self._pick(p)
+                if s.queued < self.window: break
+                self._cond.wait(0.2)
+            s.pending[p] += 1; s.queued += 1
+        s.chan.send({"op": "check", "p": p})
+
+    def _receive(self, s):
+        for msg in s.chan:
+            op = msg.get("op")
+            if op == "result":
+                p = msg["p"]
+                with self._cond:
+                    if s.pending[p] > 1: s.pending[p] -= 1
+                    else: s.pending.pop(p, None)
+                    self._cond.notify_all()
+                if self.on_result: self.on_result(p, msg.get("avg"), msg.get("data"))
+            elif op == "took":
+                with self._cond:
+                    s.queued -= msg["n"]
+                    self._cond.notify_all()
+            elif op == "done":
+                s.stats = msg
+        moved = []
+        with self._cond:
+            # re-pend the dead shard's lines in the same step, so run() never sees "nothing in flight" in between
+            s.alive = False
+            orphans, s.pending, s.queued = list(s.pending.elements()), Counter(), 0
+            if not self.stopped():
+                try:
+                    for p in orphans:
+                        t = self._pick(p)
+                        t.pending[p] += 1; t.queued += 1; moved.append((t, p))
+                except ConnectionError:
+                    pass  # nobody left: run() sees it
+            self._cond.notify_all()
+        for t, p in moved: t.chan.send({"op": "check", "p": p})
+        for t in {t for t, _ in moved}: t.chan.send({"op": "end"})
+
+    def _distribute(self, lines, errors):
+        try:
+            for p in lines:
+                if self.stopped(): break
+                self.dispatch(p)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            with self._cond:
+                self._distributed = True
+                self._cond.notify_all()
+            for s in self.shards:
+                if s.alive: s.chan.send({"op": "end"})
+
+    def run(self, lines):
+        try:
+            ok = self.connect()
+        except BaseException:
+            self.close(); raise
+        if not ok:
+            self.close(); return
+        errors = []
+        receivers = [threading.Thread(target=self._receive, args=(s,), daemon=True) for s in self.shards]
+        for t in receivers: t.start()
+        threading.Thread(target=self._distribute, args=(lines, errors), daemon=True).start()
+        paused = False
+        try:
+            while True:
+                if self.stopped():
+                    for s in self.shards: s.chan.send({"op": "stop"})
+                    break
+                if self.pause_event is not None and paused == self.pause_event.is_set():
+                    paused = not paused
+                    for s in self.shards: s.chan.send({"op": "pause" if paused else "resume"})
+                with self._cond:
+                    if errors: raise errors[0]
+                    live = [s for s in self.shards if s.alive]
+                    if self._distributed and not any(s.pending for s in live):
+                        break
+                    if not live:
+                        raise ConnectionError("every shard worker disconnected")
+                    self._cond.wait(0.1)
+        finally:
+            self.close()
+            for t in receivers: t.join(5)
+
+    def close(self):
+        for s in self.shards:
+            s.chan.send({"op": "close"}); s.chan.close()
+        for p in self.procs:
+            p.join(5)
+            if p.is_alive(): p.terminate()
+
+def run(lines, checker_config, limits, on_result=None, stopped=lambda: False, pause_event=None,
+        local=2, listen_addr=None, remote=0, token=None, geo_db=None):
+    """เช็คแบบ shard (blocking) - on_result(p, avg, proxy_data) ทุกตัว เหมือน hydra_async.run"""
+    coord = Coordinator(checker_config, limits, on_result, stopped, pause_event, local, listen_addr, remote, token, geo_db)
+    coord.run(lines)
+    return coord
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="hydra_shard", description="HYDRA shard worker: dials a coordinator and checks its share")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("worker", help="check proxies for a coordinator (hydra_cli --listen / --remote)")
+    w.add_argument("--connect", required=True, metavar="ADDR", help="coordinator host:port or unix:/path")
+    w.add_argument("--token", default=SHARD_TOKEN, help="shared secret (default $HYDRA_SHARD_TOKEN)")
+    w.add_argument("--geo-db", default="geoip.csv", help="offline GeoIP range CSV on this box, used if it exists")
+    args = ap.parse_args(argv)
+    try:
+        worker_main(args.connect, args.token, geo_db=args.geo_db)
+    except OSError as e:
+        sys.exit(f"hydra_shard: {e}")
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
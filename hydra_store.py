@@ -0,0 +1,130 @@
+import heapq, math
+from array import array
+from collections import Counter
+
+from hydra_geo import ip_to_int
+from hydra_metrics import LatencyHistogram
+
+# --- Columnar result store: one array per field + interned strings, summaries kept up to date as results arrive ---
+
+TOP_K = 1000  # fastest proxies kept ranked while the run goes (no full sort at the end)
+NAN = float("nan")
+
+class Interner:
+    """string -> รหัส int เล็กๆ (country / ISP / target ... ซ้ำกันเป็นแสนครั้ง เก็บ string จริงแค่ครั้งเดียว)"""
+    __slots__ = ("codes", "strings")
+
+    def __init__(self):
+        self.codes = {"": 0}
+        self.strings = [""]
+
+    def code(self, s):
+        s = s or ""
+        c = self.codes.get(s)
+        if c is None:
+            c = self.codes[s] = len(self.strings)
+            self.strings.append(s)
+        return c
+
+    def __getitem__(self, code):
+        return self.strings[code]
+
+def _tri(v):
+    return -1 if v is None else int(bool(v))
+
+def _untri(v):
+    return None if v < 0 else bool(v)
+
+def _num(v):
+    return NAN if v is None else float(v)
+
+def _unnum(v):
+    return None if math.isnan(v) else v
+
+def _int_to_ip(n):
+    return f"{n >> 24}.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+class ResultStore:
+    """
+    ผลของตัวที่ alive แบบ column: array ต่อ field, string ซ้ำๆ เป็นรหัสจาก Interner (~150 byte/ตัว รวม proxy string แทน ~900 ของ tuple + dict)
+    นับ country / anonymous, top-k ตาม latency และ histogram ไปพร้อมกับ add() -> สรุปตอนจบไม่ต้องวน / sort ทั้งก้อน
+    """
+    INT_COLS = ("country", "country_code", "city", "isp", "anon_type", "target")
+
+    def __init__(self, top_k=TOP_K):
+        self.strings = Interner()
+        self.proxy = []
+        self.latency, self.handshake, self.p95 = array("d"), array("d"), array("d")
+        self.success = array("f")
+        self.cols = {k: array("I") for k in self.INT_COLS}
+        self.anonymous, self.target_ok, self.amazon_blocked = array("b"), array("b"), array("b")
+        self.target_status = array("H")
+        self.exit_ip = array("I")  # IPv4 as int, 0 = none
+        self._exit_other = {}      # row -> exit IP that is not IPv4
+        self.country_counts = Counter()  # country code -> rows
+        self.anon_count = 0
+        self.latency_hist = LatencyHistogram()
+        self.top_k = top_k
+        self._top = []  # max-heap of the k fastest: (-latency, row)
+
+    def __len__(self):
+        return len(self.proxy)
+
+    def add(self, p, avg, d):
+        d = d or {}
+        i = len(self.proxy)
+        self.proxy.append(p)
+        self.latency.append(avg)
+        self.handshake.append(_num(d.get("handshake")))
+        self.p95.append(_num(d.get("latency_p95")))
+        self.success.append(_num(d.get("success_ratio")))
+        for k, col in self.cols.items():
+            col.append(self.strings.code(d.get(k, "Unknown" if k == "country" else "")))
+        self.anonymous.append(_tri(d.get("anonymous")))
+        self.target_ok.append(_tri(d.get("target_ok")))
+        self.amazon_blocked.append(_tri(d.get("amazon_blocked")))
+        self.target_status.append(d.get("target_status") or 0)
+        ip = d.get("exit_ip") or ""
+        try:
+            self.exit_ip.append(ip_to_int(ip) if ip else 0)
+        except (OSError, TypeError):
+            self.exit_ip.append(0); self._exit_other[i] = ip
+        self.country_counts[self.cols["country"][i]] += 1
+        if d.get("anonymous"): self.anon_count += 1
+        self.latency_hist.add(avg)
+        if len(self._top) < self.top_k:
+            heapq.heappush(self._top, (-avg, i))
+        elif avg < -self._top[0][0]:
+            heapq.heapreplace(self._top, (-avg, i))
+
+    def row(self, i):
+        """แถวที่ i เป็น dict รูปแบบเดียวกับ proxy_data (field ที่ save / badge / planner ใช้)"""
+        s = self.strings
+        d = {"proxy": self.proxy[i], "latency": self.latency[i], "handshake": _unnum(self.handshake[i]) or 0.0,
+             "latency_p95": _unnum(self.p95[i]), "success_ratio": _unnum(self.success[i]),
+             "anonymous": _untri(self.anonymous[i])}
+        d.update((k, s[col[i]]) for k, col in self.cols.items())
+        d.update(target_ok=_untri(self.target_ok[i]), target_status=self.target_status[i] or None,
+                 exit_ip=self._exit_other.get(i) or (_int_to_ip(self.exit_ip[i]) if self.exit_ip[i] else ""))
+        if self.amazon_blocked[i] >= 0:
+            d["amazon_blocked"] = bool(self.amazon_blocked[i])
+        return d
+
+    def __iter__(self):
+        """(p, avg, proxy_data) ทีละแถว ตามลำดับที่ได้ผล"""
+        for i in range(len(self.proxy)):
+            yield self.proxy[i], self.latency[i], self.row(i)
+
+    def fastest(self, n=None):
+        """index ของตัวที่เร็วที่สุด n ตัว (จาก top-k ที่เก็บไว้, n > top_k ค่อย sort ทั้งหมด)"""
+        n = len(self.proxy) if n is None else min(n, len(self.proxy))
+        if n <= len(self._top):
+            return [i for _, i in sorted((-neg, i) for neg, i in self._top)[:n]]
+        return sorted(range(len(self.proxy)), key=self.latency.__getitem__)[:n]
+
+    def top_countries(self, n=3):
+        return [(self.strings[c], k) for c, k in self.country_counts.most_common(n)]
+
+    def pool_rows(self):
+        """(latency, success_ratio, latency_p95) ของทุกแถว สำหรับ hydra_plan.PoolModel"""
+        return ((lat, _unnum(ok), _unnum(p95)) for lat, ok, p95 in zip(self.latency, self.success, self.p95))
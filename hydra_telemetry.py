@@ -0,0 +1,111 @@
+import json, os, threading, time
+from urllib.parse import urlsplit
+
+from hydra_pool import PoolServer
+
+# --- Live telemetry of a running check: Prometheus text / JSON on a local port, or a periodic NDJSON dump ---
+# python hydra_cli.py proxies.txt -c 500 --engine async --metrics 127.0.0.1:9464
+# curl http://127.0.0.1:9464/metrics
+
+METRICS_PORT = 9464
+DUMP_PATH = "hydra_metrics.ndjson"
+DUMP_INTERVAL = 10.0  # seconds between dump lines
+METRICS_TOKEN = os.environ.get("HYDRA_METRICS_TOKEN", "")  # bearer token a scraper must present
+QUANTILES = (("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99"))
+
+def snapshot(checker):
+    """
+    ภาพรวมของ run ที่กำลังวิ่ง เป็น dict เดียว (ใช้ทั้ง /metrics.json, NDJSON dump และ prometheus())
+    ตัวนับเริ่มใหม่ทุก run (daemon: ทุก round) - alive / dead ไม่รวมตัวที่เอามาจาก history (reused)
+    """
+    snap = checker.metrics.snapshot()
+    snap.update(ts=time.time(), engine=checker.engine, target=checker.target_key, checked=checker.checked,
+                concurrency=checker.adapt.limit if checker.adapt is not None else checker.concurrency,
+                rate_limit_wait=checker.limiter.waited if checker.limiter is not None else 0.0,
+                paused=not checker.pause_event.is_set(), stopping=checker.stop_requested)
+    snap.update(checker.traffic.data())
+    return snap
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _sample(name, labels, v):
+    lbl = ",".join(f'{k}="{_escape(x)}"' for k, x in labels.items())
+    v = v if isinstance(v, int) else f"{v:.6f}".rstrip("0").rstrip(".")  # counters stay exact, no 1e+06
+    return f"hydra_{name}{{{lbl}}} {v}\n" if lbl else f"hydra_{name} {v}\n"
+
+def prometheus(snap):
+    """snapshot -> Prometheus text exposition (gauge / counter, summary ต่อ phase)"""
+    out = []
+    def metric(name, kind, help_, samples):
+        # samples: [(labels, value)], summary: [(name suffix, labels, value)]
+        out.append(f"# HELP hydra_{name} {help_}\n# TYPE hydra_{name} {kind}\n")
+        out.extend(_sample(name + s[0], s[1], s[2]) if len(s) == 3 else _sample(name, *s) for s in samples)
+    metric("checked_total", "counter", "proxies finished (alive + dead + reused)", [({}, snap["checked"])])
+    metric("results_total", "counter", "finished proxies by result",
+           [({"result": r}, snap[r]) for r in ("alive", "dead", "reused")])
+    metric("errors_total", "counter", "dead proxies by error class", [({"class": c}, n) for c, n in snap["errors"].items()])
+    metric("internal_errors_total", "counter", "exceptions that escaped a check (bugs, not proxy failures)",
+           [({}, snap["internal_errors"])])
+    metric("in_flight", "gauge", "proxies being probed right now", [({}, snap["in_flight"])])
+    metric("enriching", "gauge", "alive proxies in the anonymity / geo / matrix stage", [({}, snap["enriching"])])
+    metric("queued", "gauge", "proxies handed to the engine, waiting for a probe slot", [({}, snap["queued"])])
+    metric("concurrency", "gauge", "probe concurrency limit (adaptive: the current limit)", [({}, snap["concurrency"])])
+    metric("completions_per_second", "gauge", "finished proxies per second over the last few seconds",
+           [({}, snap["per_second"])])
+    metric("paused", "gauge", "1 while the run is paused", [({}, int(snap["paused"]))])
+    metric("rate_limit_wait_seconds_total", "counter", "time spent waiting for per-host rate limit tokens",
+           [({}, snap["rate_limit_wait"])])
+    metric("bytes_sent_total", "counter", "HTTP bytes sent through the proxies", [({}, snap["bytes_sent"])])
+    metric("bytes_received_total", "counter", "HTTP bytes received through the proxies", [({}, snap["bytes_recv"])])
+    metric("requests_total", "counter", "HTTP requests sent through the proxies", [({}, snap["requests"])])
+    phases = snap["phases"].items()
+    metric("phase_seconds", "summary", "time per stage (probe / enrich) and per phase of an alive proxy's probe",
+           [("", {"phase": ph, "quantile": q}, s[k]) for ph, s in phases for q, k in QUANTILES]
+           + [(sfx, {"phase": ph}, v) for ph, s in phases for sfx, v in (("_sum", s["mean"] * s["count"]),
+                                                                        ("_count", s["count"]))])
+    return "".join(out)
+
+class MetricsServer(PoolServer):
+    """
+    /metrics (Prometheus) และ /metrics.json ของ checker ที่กำลังวิ่ง - HTTP loop เดียวกับ PoolServer
+    host ที่ไม่ใช่ loopback ต้องมี token (Prometheus: authorization / bearer_token ใน scrape config)
+    """
+    def __init__(self, checker, host="127.0.0.1", port=METRICS_PORT, token=METRICS_TOKEN):
+        super().__init__(None, host, port, token=token)
+        self.checker = checker
+
+    def answer(self, method, path, body):
+        route = urlsplit(path).path
+        if route == "/metrics":
+            return 200, "text/plain; version=0.0.4", prometheus(snapshot(self.checker)).encode()
+        if route == "/metrics.json":
+            return 200, "application/json", json.dumps(snapshot(self.checker), separators=(",", ":")).encode()
+        return 404, "application/json", b'{"error":"use /metrics or /metrics.json"}'
+
+class MetricsDump:
+    """snapshot ต่อท้ายไฟล์ NDJSON ทุก interval วินาที (ไม่ต้องมี scraper) - stop() เขียนบรรทัดสุดท้ายของ run ให้"""
+    def __init__(self, checker, path=DUMP_PATH, interval=DUMP_INTERVAL):
+        self.checker, self.path, self.interval = checker, path, interval
+        self._f = open(path, "a", encoding="utf-8")
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._done.wait(self.interval):
+            self.write()
+
+    def write(self):
+        self._f.write(json.dumps(snapshot(self.checker), separators=(",", ":")) + "\n")
+        self._f.flush()
+
+    def stop(self):
+        self._done.set()
+        if self._thread is not None: self._thread.join()
+        self.write()
+        self._f.close()
@@ -0,0 +1,28 @@
+import asyncio, os, sys, threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # flat hydra_*.py modules
+
+from hydra_bench import Farm, farm_spec, profile, proxy_line, closed_port
+
+@pytest.fixture(scope="session")
+def farm():
+    """bench farm ใน process นี้ (event loop ใน thread แยก): ไม่มีตัว dead / blackhole / drop, latency ~1ms"""
+    spec = farm_spec(latency=0.001, spread=0.0, jitter=0.0, dead=0.0, blackhole=0.0, fail=0.0,
+                     transparent=0.0, blocked=0.0)
+    loop = asyncio.new_event_loop()
+    ports = loop.run_until_complete(Farm(spec).start())
+    t = threading.Thread(target=loop.run_forever, daemon=True)
+    t.start()
+
+    def line(proto, nth=0):
+        """บรรทัด proxy ตัวที่ nth ของ farm ที่เป็น proto (http / socks4 / socks5) - return: (i, line)"""
+        found = (i for i in range(1000) if profile(spec, i).proto == proto)
+        for _ in range(nth): next(found)
+        i = next(found)
+        return i, proxy_line(spec, i, [ports], closed_port())
+
+    yield line
+    loop.call_soon_threadsafe(loop.stop)
+    t.join(5)
@@ -0,0 +1,73 @@
+import types
+
+import pytest
+
+import hydra_adapt
+from hydra_adapt import AdaptiveLimit
+
+@pytest.fixture
+def clock(monkeypatch):
+    """เวลาปลอมของ hydra_adapt: window ตัดสินเมื่อเราเลื่อนเวลาเอง"""
+    c = types.SimpleNamespace(t=1000.0)
+    c.monotonic = lambda: c.t
+    c.time = lambda: c.t
+    monkeypatch.setattr(hydra_adapt, "time", c)
+    return c
+
+def window(lim, clock, n=40, latency=0.1, timeouts=0, peak=None):
+    """n probe จบใน window เดียว (in-flight สูงสุด = peak) แล้วคืน limit ใหม่ - rate = n / window"""
+    peak = lim.limit if peak is None else peak
+    for k in range(n):
+        if lim.inflight == 0:
+            for _ in range(min(peak, n - k)): assert lim.acquire()
+        if k == n - 1: clock.t += lim.window
+        lim.release(True, timeout=k < timeouts, latency=None if k < timeouts else latency)
+    return lim.limit
+
+def test_slow_start_doubles_then_plateau_steps_back(clock):
+    lim = AdaptiveLimit(10, hi=1000)
+    assert window(lim, clock, n=40) == 20            # 20/s, slow start
+    assert window(lim, clock, n=40) == 19            # twice the limit, same 20/s: past the knee
+    assert lim.reason.startswith("plateau")
+    assert window(lim, clock, n=80) == 20            # more throughput: additive +step, no more doubling
+    assert lim.reason.startswith("probe up")
+
+def test_timeouts_back_off_multiplicatively(clock):
+    lim = AdaptiveLimit(10, hi=1000)
+    window(lim, clock, n=40)
+    assert window(lim, clock, n=40, timeouts=20) == 14   # 50% timeouts vs a 0% baseline: x0.7
+    assert lim.reason.startswith("timeouts")
+    assert not lim.slow_start
+
+def test_latency_inflation_backs_off(clock):
+    lim = AdaptiveLimit(10, hi=1000)
+    window(lim, clock, n=40, latency=0.1)
+    assert window(lim, clock, n=40, latency=0.2) == 14
+    assert lim.reason == "latency x2.0"
+
+def test_input_bound_window_keeps_the_limit(clock):
+    lim = AdaptiveLimit(10, hi=1000)
+    assert window(lim, clock, n=40, peak=5) == 10
+    assert lim.reason.startswith("input-bound")
+
+def test_limit_is_clamped(clock):
+    changes = []
+    lim = AdaptiveLimit(10, hi=15, on_change=lambda old, new, why: changes.append((old, new, why)))
+    assert window(lim, clock, n=40) == 15
+    assert changes == [(10, 15, "at max 15")]
+    assert len(lim.log) == 1
+
+def test_too_few_samples_do_not_decide(clock):
+    lim = AdaptiveLimit(10, hi=1000)
+    assert window(lim, clock, n=hydra_adapt.ADAPT_MIN_SAMPLES - 1) == 10
+    assert lim.reason == "start"
+
+def test_hold_discards_the_window(clock):
+    lim = AdaptiveLimit(10, hi=1000)
+    for _ in range(10): lim.acquire()
+    for _ in range(10): lim.release(True, latency=0.1)
+    lim.hold()  # PAUSE: what ran before does not count
+    clock.t += 10
+    for _ in range(10): lim.acquire()
+    for _ in range(10): lim.release(True, latency=0.1)
+    assert lim.limit == 10 and lim.inflight == 0
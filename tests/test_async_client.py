@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+import hydra_async as ha
+from hydra_bench import closed_port, exit_ip
+from hydra_core import error_class, error_text
+
+TARGET = "http://target.test/get"  # the farm relays every request to its own target, DNS never runs
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 10))
+
+async def get_twice(line):
+    sess = ha.ProxySession(line, timeout=5)
+    try:
+        first = await sess.fetch(TARGET)
+        second = await sess.fetch(TARGET)
+    finally:
+        sess.close()
+    return first, second, sess.traffic
+
+@pytest.mark.parametrize("proto", ["http", "socks4", "socks5"])
+def test_fetch_through_each_proxy_type(farm, proto):
+    i, line = farm(proto)
+    first, second, traffic = run(get_twice(line))
+    assert first.status_code == 200 and first.json()["origin"] == exit_ip(i)
+    assert first.handshake > 0 and second.handshake == 0.0  # keep-alive: the second request reuses the tunnel
+    assert second.json()["origin"] == exit_ip(i)
+    assert traffic.requests == 2 and traffic.bytes_recv > len(first.content)
+
+def test_https_style_tunnel_with_http_connect(farm):
+    i, line = farm("http")
+    scheme, host, port, user, pwd = ha.split_proxy(line)
+    assert (scheme, user, pwd) == ("http", f"b{i}", "x")
+
+    async def go():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            await ha.proxy_handshake(reader, writer, scheme, "target.test", 443, user, pwd)
+            writer.write(b"GET /get HTTP/1.1\r\nHost: target.test\r\nConnection: close\r\n\r\n")
+            return await reader.read()
+        finally:
+            writer.close()
+    raw = run(go())
+    assert raw.startswith(b"HTTP/1.1 200") and exit_ip(i).encode() in raw
+
+@pytest.mark.parametrize("proto, message", [("http", "http connect: 407"), ("socks5", "socks5: auth failed")])
+def test_bad_credentials_are_proxy_auth(farm, proto, message):
+    _, line = farm(proto)
+    bad = line.replace("://b", "://nobody", 1)
+
+    async def go():
+        scheme, host, port, user, pwd = ha.split_proxy(bad)
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            await ha.proxy_handshake(reader, writer, scheme, "target.test", 443, user, pwd)
+        finally:
+            writer.close()
+    with pytest.raises(ha.ProxyError, match=message) as e:
+        run(go())
+    assert error_class(error_text(e.value)) == "proxy_auth"
+
+def test_dead_proxy_is_refused():
+    sess = ha.ProxySession(f"socks5h://b1:x@127.0.0.1:{closed_port()}", timeout=5)
+    with pytest.raises(OSError) as e:
+        try:
+            run(sess.fetch(TARGET))
+        finally:
+            sess.close()
+    assert error_class(error_text(e.value)) == "refused"
+
+def test_failed_enrichment_falls_back_per_proxy(farm, monkeypatch):
+    (_, good), (_, bad) = farm("socks5"), farm("socks5", 1)
+    real = ha.drive_enrich_async
+
+    async def flaky(steps, sess, *args):
+        if sess.proxy_url == ha.parse_proxy(bad):
+            raise RuntimeError("enrich blew up")
+        return await real(steps, sess, *args)
+    monkeypatch.setattr(ha, "drive_enrich_async", flaky)
+    results = {}
+    run(ha.run_checks([good, bad], "Custom URL", TARGET, concurrency=2,
+                      on_result=lambda p, avg, d: results.__setitem__(p, (avg, d))))
+    assert results[good][0] is not None  # the other proxy's enrichment still completes
+    assert results[bad][0] is None and results[bad][1]["error"] == "other"
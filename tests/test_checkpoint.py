@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from hydra_checkpoint import Checkpoint
+
+LINES = [f"10.0.0.{i}:8080" for i in range(5)]
+
+@pytest.fixture
+def paths(tmp_path):
+    src = tmp_path / "proxies.txt"
+    src.write_text("\n".join(LINES) + "\n")
+    return str(tmp_path / "ck.json"), str(src)
+
+def first_run(path, src):
+    """เสร็จ 0, 1, 3 (2 และ 4 ยังไม่ได้ผล) แล้วตายกลางทาง"""
+    ck = Checkpoint(path, src, target="t")
+    ck.open()
+    handed = list(ck.track(LINES))
+    assert handed == LINES
+    for i in (0, 3, 1):
+        ck.record(LINES[i], 0.1 * (i + 1), {"n": i})
+    assert ck.low_water == 2  # 3 is done but 2 is not: the mark stops at the gap
+    ck.close()
+    return ck
+
+def test_low_water_mark_survives_close(paths):
+    path, src = paths
+    first_run(path, src)
+    assert Checkpoint(path, src, target="t").stored() == 2
+
+def test_resume_replays_and_skips_done_lines(paths):
+    path, src = paths
+    first_run(path, src)
+    ck = Checkpoint(path, src, target="t")
+    replayed = []
+    ck.open(lambda p, avg, d: replayed.append((p, d["n"])))
+    assert sorted(replayed) == [(LINES[0], 0), (LINES[1], 1), (LINES[3], 3)]
+    assert ck.resumed == 3
+    assert list(ck.track(LINES)) == [LINES[2], LINES[4]]
+    ck.record(LINES[2], 0.5, {"n": 2}); ck.record(LINES[4], None, {"n": 4})
+    assert ck.low_water == 5
+    ck.close(complete=True)
+    assert not os.path.exists(path) and not os.path.exists(ck.results_path)
+
+def test_different_target_starts_over(paths):
+    path, src = paths
+    first_run(path, src)
+    ck = Checkpoint(path, src, target="other")
+    assert ck.stored() is None
+    ck.open()
+    assert ck.resumed == 0 and list(ck.track(LINES)) == LINES
+    ck.close(complete=True)
+
+def test_torn_last_line_is_cut(paths):
+    path, src = paths
+    ck = first_run(path, src)
+    with open(ck.results_path, "a", encoding="utf-8") as f:
+        f.write('{"proxy": "10.0.0.2:8080", "lat')
+    ck = Checkpoint(path, src, target="t")
+    ck.open()
+    assert ck.resumed == 3
+    assert list(ck.track(LINES)) == [LINES[2], LINES[4]]
+    ck.close()
@@ -0,0 +1,61 @@
+import socket
+
+import pytest
+
+from hydra_core import TIMEOUT_ERRORS, Checker, error_class, error_text, probe_error
+from hydra_telemetry import MetricsServer
+
+@pytest.mark.parametrize("err, cls", [
+    ("stopped", "stopped"),
+    ("captcha (status 503)", "captcha"),
+    ("status 503", "http_5xx"),
+    ("status 404", "http_4xx"),
+    ("status 200", "status"),
+    ("ProxyError: ... NameResolutionError: Failed to resolve 'x.invalid'", "dns"),
+    ("gaierror: [Errno -2] Name or service not known", "dns"),
+    ("ProxyError: socks5: auth failed", "proxy_auth"),
+    ("ProxyError: http connect: 407", "proxy_auth"),
+    ("status 407", "proxy_auth"),
+    ("ProxyError: ('Unable to connect to proxy', OSError('Tunnel connection failed: 407 Proxy Authentication Required'))",
+     "proxy_auth"),
+    ("ConnectionRefusedError: [Errno 111] Connect call failed ('127.0.0.1', 14071)", "refused"),
+    ("ReadTimeout: HTTPConnectionPool(host='h', port=80): Read timed out. (read timeout=5)", "read_timeout"),
+    ("TimeoutError: read timed out", "read_timeout"),
+    ("ConnectTimeout: ... (connect timeout=5)", "connect_timeout"),
+    ("TimeoutError: tls handshake timed out", "connect_timeout"),
+    ("SSLError: [SSL: CERTIFICATE_VERIFY_FAILED] certificate verify failed", "tls"),
+    ("ConnectionRefusedError: [Errno 111] Connect call failed ('127.0.0.1', 1)", "refused"),
+    ("ConnectionResetError: [Errno 104] Connection reset by peer", "reset"),
+    ("ProxyError: socks4: rejected (91)", "proxy"),
+    ("", "other"),
+    (None, "other"),
+])
+def test_error_class(err, cls):
+    assert error_class(err) == cls
+
+def test_timeouts_are_congestion():
+    assert set(TIMEOUT_ERRORS) == {"connect_timeout", "read_timeout"}
+
+def test_error_text_keeps_the_type_name():
+    assert error_text(TimeoutError()) == "TimeoutError"
+    assert error_text(ValueError("bad")) == "ValueError: bad"
+
+def test_probe_error():
+    assert probe_error(None, {"error": "boom"}) == "boom"
+    assert probe_error(503, {"amazon_signal": "captcha"}) == "captcha (status 503)"
+    assert probe_error(403, {}) == "status 403"
+    assert probe_error(None, None) == "failed"
+
+def test_exposed_metrics_need_a_token():
+    with pytest.raises(ValueError, match="token"):
+        MetricsServer(Checker(), "0.0.0.0", 0, token="")
+    srv = MetricsServer(Checker(), "127.0.0.1", 0, token="s3cret").start()
+    try:
+        def get(auth):
+            with socket.create_connection((srv.host, srv.port), timeout=5) as s:
+                s.sendall(b"GET /metrics HTTP/1.1\r\nHost: x\r\n%sConnection: close\r\n\r\n" % auth)
+                return b"".join(iter(lambda: s.recv(65536), b""))
+        assert get(b"").startswith(b"HTTP/1.1 401")
+        assert b"hydra_" in get(b"Authorization: Bearer s3cret\r\n")
+    finally:
+        srv.stop()
@@ -0,0 +1,40 @@
+import pytest
+
+from hydra_export import ExportSink, export_format, read_export
+
+ROWS = [
+    ("1.1.1.1:80", 0.25, {"anonymous": True, "anon_type": "Elite", "country": "Thailand", "exit_ip": "9.9.9.9",
+                          "target_ok": True, "target_status": 200, "bytes_recv": 1234,
+                          "matrix": {"google": {"ok": True, "latency": 0.3}}}),
+    ("2.2.2.2:80", None, {"error": "refused"}),
+]
+
+@pytest.mark.parametrize("name", ["out.ndjson", "out.csv", "out.csv.gz"])
+def test_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    sink = ExportSink(path)
+    for r in ROWS: sink.write(*r)
+    sink.close()
+    got = list(read_export(path))
+    assert [r["proxy"] for r in got] == ["1.1.1.1:80", "2.2.2.2:80"]
+    alive, dead = got
+    assert (alive["alive"], alive["latency"], alive["anonymous"]) == (True, 0.25, True)
+    assert (alive["target_status"], alive["bytes_recv"]) == (200, 1234)
+    assert alive["matrix"] == {"google": {"ok": True, "latency": 0.3}}
+    assert (dead["alive"], dead["latency"], dead["error"], dead["matrix"]) == (False, None, "refused", None)
+
+def test_alive_only(tmp_path):
+    path = str(tmp_path / "out.ndjson")
+    sink = ExportSink(path, alive_only=True)
+    for r in ROWS: sink.write(*r)
+    sink.close()
+    assert [r["proxy"] for r in read_export(path)] == ["1.1.1.1:80"]
+    assert sink.rows == 1
+
+def test_export_format():
+    assert export_format("a.JSONL") == ("ndjson", False)
+    assert export_format("a.csv.gz") == ("csv", True)
+    with pytest.raises(ValueError):
+        export_format("a.parquet.gz")
+    with pytest.raises(ValueError):
+        export_format("a.txt")
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+import hydra_async as ha
+from hydra_bench import exit_ip
+from hydra_gateway import Gateway
+
+TARGET = "http://target.test/get"
+
+@pytest.fixture
+def gateway(farm):
+    def start(auth=""):
+        i, line = farm("socks5")
+        gw = Gateway("127.0.0.1", 0, warm=0, auth=auth).start()
+        gw.update(line, 0.01, {})
+        started.append(gw)
+        return i, gw
+    started = []
+    yield start
+    for gw in started: gw.stop()
+
+def get(proxy_url):
+    async def go():
+        sess = ha.ProxySession(proxy_url, timeout=5)
+        try:
+            return await sess.fetch(TARGET)
+        finally:
+            sess.close()
+    return asyncio.run(asyncio.wait_for(go(), 10))
+
+def test_loopback_gateway_needs_no_credential(gateway):
+    i, gw = gateway()
+    assert get(f"socks5h://127.0.0.1:{gw.port}").json()["origin"] == exit_ip(i)
+    assert get(f"http://127.0.0.1:{gw.port}").json()["origin"] == exit_ip(i)
+
+def test_remote_listen_needs_a_credential():
+    with pytest.raises(ValueError, match="credential"):
+        Gateway("0.0.0.0", 0, auth="")
+    Gateway("0.0.0.0", 0, auth="user:pass")  # constructed, never started
+
+@pytest.mark.parametrize("scheme", ["http", "socks5h"])
+def test_credential_is_checked(gateway, scheme):
+    i, gw = gateway(auth="user:s3cret")
+    assert get(f"{scheme}://user:s3cret@127.0.0.1:{gw.port}").json()["origin"] == exit_ip(i)
+    for bad in ("", "user:wrong@", "other:s3cret@"):
+        if scheme == "http":
+            assert get(f"http://{bad}127.0.0.1:{gw.port}").status_code == 407
+        else:
+            with pytest.raises(ha.ProxyError):
+                get(f"socks5h://{bad}127.0.0.1:{gw.port}")
+    assert gw.routed == 1
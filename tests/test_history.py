@@ -0,0 +1,50 @@
+import pytest
+
+from hydra_history import History
+
+TTL = 100
+
+@pytest.fixture
+def history(tmp_path):
+    h = History(str(tmp_path / "h.db"), ttl=TTL, backoff_max=10 * TTL)
+    yield h
+    h.close()
+
+def record(h, p, avg, data):
+    h.start(); h.record("t", p, avg, data); h.flush()
+    return h.db.execute("SELECT fails, checks, next_check - checked_at FROM results WHERE proxy = ?", (p,)).fetchone()
+
+def test_dead_entries_back_off_exponentially(history):
+    p = "1.2.3.4:8080"
+    waits = [record(history, p, None, {"error": "refused"}) for _ in range(6)]
+    assert [w[0] for w in waits] == [1, 2, 3, 4, 5, 6]
+    assert [w[1] for w in waits] == [1, 2, 3, 4, 5, 6]
+    assert [round(w[2]) for w in waits] == [TTL, 2 * TTL, 4 * TTL, 8 * TTL, 10 * TTL, 10 * TTL]  # capped
+
+def test_alive_resets_the_backoff(history):
+    p = "1.2.3.4:8080"
+    for _ in range(3): record(history, p, None, {"error": "refused"})
+    fails, checks, wait = record(history, p, 0.25, {"exit_ip": "5.6.7.8"})
+    assert (fails, checks, round(wait)) == (0, 4, TTL)
+    assert history.db.execute("SELECT count(*) FROM checks").fetchone()[0] == 4
+
+def test_same_proxy_written_differently_is_one_row(history):
+    record(history, "1.2.3.4:8080:u:p", None, {"error": "x"})
+    fails, checks, _ = record(history, "http://u:p@1.2.3.4:8080", None, {"error": "x"})
+    assert (fails, checks) == (2, 2)
+
+def test_split_answers_fresh_rows_from_the_db(history):
+    history.start()
+    history.record("t", "1.1.1.1:80", 0.5, {"exit_ip": "9.9.9.9"})
+    history.record("t", "2.2.2.2:80", None, {"error": "refused"})
+    history.record("other", "3.3.3.3:80", 0.1, {})
+    history.flush()
+    checked_at = history.db.execute("SELECT max(checked_at) FROM results").fetchone()[0]
+    lines = ["1.1.1.1:80", "2.2.2.2:80", "3.3.3.3:80", "http://1.1.1.1"]
+    got = dict(history.split(lines, "t", now=checked_at + TTL / 2))
+    assert got["1.1.1.1:80"][0] == 0.5 and got["1.1.1.1:80"][1]["exit_ip"] == "9.9.9.9"
+    assert got["2.2.2.2:80"] == (None, {"error": "refused", "cached_at": pytest.approx(checked_at, abs=1)})
+    assert got["3.3.3.3:80"] is None  # another target's history does not count
+    assert got["http://1.1.1.1"][0] == 0.5  # same key as 1.1.1.1:80
+    assert history.fresh == 3
+    assert all(v is None for _, v in history.split(lines, "t", now=checked_at + TTL + 1))  # expired
@@ -0,0 +1,111 @@
+import asyncio, json, socket, threading
+from urllib.parse import urlsplit
+
+import pytest
+
+import hydra_cli, hydra_core, hydra_judge
+from hydra_core import ENGINES, JUDGE_KEY, Checker, is_loopback
+from hydra_judge import JudgeServer, judge_body, unreachable
+
+async def _relay(reader, writer, xff):
+    # minimal forward / CONNECT proxy: only dials loopback (the test box has no DNS), transparent ones add XFF
+    async def pipe(r, w):
+        try:
+            while data := await r.read(65536):
+                w.write(data); await w.drain()
+        except ConnectionError:
+            pass
+        finally:
+            w.close()
+    try:
+        line, *headers = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")[:-2]
+        method, target, _ = line.split()
+        if method == "CONNECT":
+            host, _, port = target.rpartition(":")
+        else:
+            sp = urlsplit(target); host, port = sp.hostname, sp.port or 80
+        if not is_loopback(host):
+            writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"); writer.close()
+            return
+        up_r, up_w = await asyncio.open_connection(host, int(port))
+        if method == "CONNECT":
+            writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+        else:
+            keep = [h for h in headers if h.partition(":")[0].strip().lower() not in ("connection", "proxy-connection")]
+            keep += ["Connection: close"] + (["X-Forwarded-For: 198.51.100.9"] if xff else [])
+            up_w.write(("\r\n".join([line] + keep) + "\r\n\r\n").encode("latin-1"))
+        await asyncio.gather(pipe(reader, up_w), pipe(up_r, writer))
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        writer.close()
+
+@pytest.fixture(scope="module")
+def relays():
+    """proxy ในเครื่อง 2 ตัว: (anonymous, transparent)"""
+    loop = asyncio.new_event_loop()
+    async def start(xff):
+        srv = await asyncio.start_server(lambda r, w: _relay(r, w, xff), "127.0.0.1", 0)
+        return f"http://127.0.0.1:{srv.sockets[0].getsockname()[1]}"
+    async def both():
+        return await asyncio.gather(start(False), start(True))
+    lines = loop.run_until_complete(both())
+    t = threading.Thread(target=loop.run_forever, daemon=True); t.start()
+    yield lines
+    loop.call_soon_threadsafe(loop.stop); t.join(5)
+
+@pytest.fixture
+def judge_url(monkeypatch):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); port = s.getsockname()[1]
+    url = f"http://127.0.0.1:{port}/judge"
+    monkeypatch.setitem(hydra_core.TARGET_PRESETS[JUDGE_KEY], "url", url)
+    yield url
+    srv = hydra_judge._local.pop(port, None)
+    if srv is not None: srv.stop()
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_checker_against_the_local_judge(relays, judge_url, engine):
+    anon, transparent = relays
+    results = {}
+    Checker(JUDGE_KEY, concurrency=4, engine=engine, prescreen=False, probe_timeout=5, enrich_timeout=2) \
+        .run([anon, transparent], on_result=lambda p, avg, d: results.__setitem__(p, (avg, d)))
+    assert urlsplit(judge_url).port in hydra_judge._local  # started in-process by the run
+    (avg, d), (t_avg, t_d) = results[anon], results[transparent]
+    assert avg is not None and t_avg is not None
+    assert (d["exit_ip"], d["anon_type"], d["anonymous"]) == ("127.0.0.1", "Anonymous", True)
+    assert (t_d["exit_ip"], t_d["anon_type"], t_d["anonymous"]) == ("127.0.0.1", "Transparent", False)
+
+def test_farm_judge_answers_per_proxy_exit_ip(farm, judge_url, monkeypatch):
+    # the bench target answers /judge with judge_body: the exit IP comes from the answer, not the socket
+    from hydra_bench import exit_ip
+    monkeypatch.setitem(hydra_core.TARGET_PRESETS[JUDGE_KEY], "url", "http://judge.test/judge")
+    lines = dict(farm(proto, n) for proto in ("http", "socks5") for n in (0, 1))
+    results = {}
+    Checker(JUDGE_KEY, concurrency=4, engine="async", prescreen=False, probe_timeout=5, enrich_timeout=2) \
+        .run(list(lines.values()), on_result=lambda p, avg, d: results.__setitem__(p, d))
+    assert {i: results[p]["exit_ip"] for i, p in lines.items()} == {i: exit_ip(i) for i in lines}
+    assert all(d["anon_type"] == "Anonymous" for d in results.values())
+
+def test_judge_body():
+    body = json.loads(judge_body("203.0.113.5", {"x-forwarded-for": "10.0.0.1", "via": "1.1 squid", "accept": "*/*"}))
+    assert body == {"ip": "203.0.113.5", "anon": "Transparent",
+                    "headers": {"X-Forwarded-For": "10.0.0.1", "Via": "1.1 squid"}}
+    assert json.loads(judge_body("203.0.113.5", {"accept": "*/*"}))["anon"] == "Anonymous"
+
+def test_loopback_judge_refuses_remote_proxies():
+    local = "http://127.0.0.1:8899/judge"
+    assert unreachable(local, ["127.0.0.1:8080", "socks5://u:p@localhost:1080", "", "http://[::1"]) is None
+    assert "203.0.113.5" in unreachable(local, ["127.0.0.1:8080", "203.0.113.5:8080:user:pass"])
+    assert unreachable("http://judge.example.com:8899/judge", ["203.0.113.5:8080"]) is None
+    assert unreachable(local, ["127.0.0.1:1"] * 5 + ["203.0.113.5:8080"], sample=5) is None  # only the sample is read
+
+def test_cli_refuses_a_loopback_judge_for_remote_proxies(tmp_path):
+    src = tmp_path / "proxies.txt"
+    src.write_text("203.0.113.5:8080\n")
+    with pytest.raises(SystemExit) as e:
+        hydra_cli.main([str(src), "-t", "JDG"])
+    assert "HYDRA_JUDGE_URL" in str(e.value.code)
+
+def test_public_address_goes_into_the_url():
+    assert JudgeServer("0.0.0.0", 8899, public="203.0.113.7").url == "http://203.0.113.7:8899/judge"
+    assert JudgeServer("::", 8899, public="2001:db8::7").url == "http://[2001:db8::7]:8899/judge"
+    assert JudgeServer("127.0.0.1", 8899).url == "http://127.0.0.1:8899/judge"
@@ -0,0 +1,96 @@
+import asyncio, threading, time
+
+import pytest
+
+from hydra_core import new_session, parse_proxy, probe_matrix, probe_proxy
+from hydra_limit import Cancelled, HostLimiter, TokenBucket
+
+def test_token_bucket_reserves_ahead():
+    b = TokenBucket(60)  # 1 token/s, burst 1
+    assert b.reserve() == 0.0
+    assert b.reserve() == pytest.approx(1.0, abs=0.05)
+    assert b.reserve() == pytest.approx(2.0, abs=0.05)  # queued behind the previous reservation
+    assert b.waited == pytest.approx(3.0, abs=0.1)
+
+def test_token_bucket_burst():
+    b = TokenBucket(600, burst=5)
+    assert [b.reserve() for _ in range(5)] == [0.0] * 5
+    assert b.reserve() == pytest.approx(0.1, abs=0.02)
+
+def test_host_limiter_only_limits_listed_hosts():
+    lim = HostLimiter({"slow.test": (60, None), "free.test": (None, None)})
+    with lim.hold("http://slow.test/a"): pass
+    st = time.monotonic()
+    for _ in range(20):
+        with lim.hold("http://free.test/a"): pass
+        with lim.hold("http://other.test/a"): pass
+    assert time.monotonic() - st < 0.5
+    assert lim.waited == 0.0
+
+def test_host_limiter_waits_for_token():
+    lim = HostLimiter({"slow.test": (120, None)})  # 2/s, burst 2
+    st = time.monotonic()
+    for _ in range(3):
+        with lim.hold("http://SLOW.test:8080/x"): pass
+    assert 0.4 <= time.monotonic() - st < 1.0  # third request waits for a token
+    assert lim.waited == pytest.approx(0.5, abs=0.05)
+
+def test_host_limiter_inflight_cap():
+    lim = HostLimiter({"cap.test": (None, 2)})
+    inside, peak, lock = [0], [0], threading.Lock()
+
+    def work():
+        with lim.hold("http://cap.test/"):
+            with lock:
+                inside[0] += 1; peak[0] = max(peak[0], inside[0])
+            time.sleep(0.05)
+            with lock: inside[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert peak[0] == 2
+
+def test_host_limiter_cancel_wakes_waiters():
+    lim = HostLimiter({"slow.test": (1, None)})  # one token per minute
+    with lim.hold("http://slow.test/"): pass
+    threading.Timer(0.1, lim.cancel).start()
+    st = time.monotonic()
+    with pytest.raises(Cancelled):
+        with lim.hold("http://slow.test/"): pass
+    assert time.monotonic() - st < 1.0
+
+def test_host_limiter_async_inflight_cap():
+    lim = HostLimiter({"cap.test": (None, 3)})
+    inside, peak = [0], [0]
+
+    async def work():
+        async with lim.hold_async("http://cap.test/"):
+            inside[0] += 1; peak[0] = max(peak[0], inside[0])
+            await asyncio.sleep(0.02)
+            inside[0] -= 1
+
+    async def main():
+        await asyncio.gather(*(work() for _ in range(10)))
+    asyncio.run(main())
+    assert peak[0] == 3
+
+def test_limiter_wait_is_not_latency(farm):
+    _, line = farm("http")
+    lim = HostLimiter({"target.test": (60, None)})  # 1/s, burst 1: the 2nd and 3rd probes wait ~1s each
+    st = time.monotonic()
+    (sess, stats, _), err = probe_proxy(line, "Custom URL", "http://target.test/get", limiter=lim)
+    sess.close()
+    assert err is None and time.monotonic() - st >= 1.8 and lim.waited > 1.8
+    assert stats["latency_p95"] < 0.3  # only the requests are timed, not the queue in front of them
+    assert stats["timings"]["body"] < 0.3 and stats["timings"]["ttfb"] < 0.3
+
+def test_matrix_latency_excludes_limiter_wait(farm):
+    _, line = farm("socks5")
+    lim = HostLimiter({"target.test": (60, None)})
+    with lim.hold("http://target.test/"): pass  # the bucket is drained: the matrix probe waits ~1s
+    with new_session() as sess:
+        sess.proxies = dict.fromkeys(("http", "https"), parse_proxy(line))
+        grid = probe_matrix(sess, [("Custom URL", "http://target.test/get")], limiter=lim)
+    cell = grid["http://target.test/get"]
+    assert cell["ok"] and lim.waited > 0.9 and cell["latency"] < 0.3
@@ -0,0 +1,70 @@
+import socket
+
+import pytest
+
+from hydra_pool import MAX_BODY, POOL_PORT, Pool, PoolServer, parse_listen
+from hydra_shard import SHARD_PORT, bound_address, listen, parse_address
+
+@pytest.mark.parametrize("addr, want", [
+    ("127.0.0.1:8877", ("127.0.0.1", 8877)),
+    ("0.0.0.0:9000", ("0.0.0.0", 9000)),
+    (":9000", ("127.0.0.1", 9000)),        # no host: loopback, never everything
+    ("", ("127.0.0.1", POOL_PORT)),
+    ("example.lan", ("example.lan", POOL_PORT)),
+    ("[::1]:9000", ("::1", 9000)),
+    ("[::]", ("::", POOL_PORT)),
+    ("::1", ("::1", POOL_PORT)),
+])
+def test_parse_listen(addr, want):
+    assert parse_listen(addr) == want
+
+def test_parse_listen_rejects_a_bad_port():
+    with pytest.raises(ValueError):
+        parse_listen("127.0.0.1:http")
+
+def test_shard_address_shares_the_parser():
+    assert parse_address(":") == (socket.AF_INET, ("127.0.0.1", SHARD_PORT))
+    assert parse_address("[::1]:7701") == (socket.AF_INET6, ("::1", 7701))
+    assert parse_address("unix:/tmp/h.sock") == (socket.AF_UNIX, "/tmp/h.sock")
+
+def test_bound_address_dials_back_on_loopback():
+    srv = listen("0.0.0.0:0")
+    try:
+        host, _, port = bound_address(srv, "0.0.0.0:0").rpartition(":")
+        assert host == "127.0.0.1" and int(port) == srv.getsockname()[1]
+    finally:
+        srv.close()
+
+def request(srv, raw):
+    with socket.create_connection((srv.host, srv.port), timeout=5) as s:
+        s.sendall(raw)
+        return b"".join(iter(lambda: s.recv(65536), b""))
+
+@pytest.fixture
+def pool_server():
+    started = []
+    def start(token=""):
+        srv = PoolServer(Pool(), "127.0.0.1", 0, token=token).start()
+        started.append(srv)
+        return srv
+    yield start
+    for srv in started: srv.stop()
+
+def test_exposed_pool_server_needs_a_token():
+    with pytest.raises(ValueError, match="token"):
+        PoolServer(Pool(), "0.0.0.0", 0, token="")
+    PoolServer(Pool(), "0.0.0.0", 0, token="s3cret")  # constructed, never started
+
+def test_pool_server_checks_the_bearer_token(pool_server):
+    srv = pool_server(token="s3cret")
+    get = b"GET /stats HTTP/1.1\r\nHost: x\r\nConnection: close\r\n%s\r\n"
+    assert request(srv, get % b"").startswith(b"HTTP/1.1 401")
+    assert request(srv, get % b"Authorization: Bearer wrong\r\n").startswith(b"HTTP/1.1 401")
+    assert request(srv, get % b"Authorization: Bearer s3cret\r\n").startswith(b"HTTP/1.1 200")
+
+def test_pool_add_is_capped(pool_server):
+    srv = pool_server()
+    add = b"POST /add HTTP/1.1\r\nHost: x\r\nContent-Length: %d\r\nConnection: close\r\n\r\n"
+    assert request(srv, add % (MAX_BODY + 1)).startswith(b"HTTP/1.1 413")
+    out = request(srv, add % 15 + b"127.0.0.1:3128\n")
+    assert out.startswith(b"HTTP/1.1 200") and out.endswith(b'{"added": 1, "size": 1}')
@@ -0,0 +1,41 @@
+import json, socket, threading
+
+import pytest
+
+from hydra_shard import Coordinator, dial, exposed
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def test_exposed():
+    assert exposed("0.0.0.0:7700") and exposed("10.0.0.5:7700") and exposed("[::]:7700")
+    assert not exposed("127.0.0.1:7700") and not exposed("localhost:0") and not exposed("[::1]:7700")
+    assert not exposed("unix:/tmp/hydra.sock")
+
+def test_exposed_listen_needs_a_token():
+    coord = Coordinator({"concurrency": 1}, {}, local=0, listen_addr="0.0.0.0:0", remote=1, token="")
+    with pytest.raises(ValueError, match="token"):
+        coord.connect()
+
+def hello(addr, token):
+    s = dial(addr, timeout=5)
+    s.sendall((json.dumps({"op": "hello", "token": token, "nonce": "", "host": "test", "pid": 1}) + "\n").encode())
+    return s
+
+def test_only_the_right_token_gets_a_config():
+    addr = f"127.0.0.1:{free_port()}"
+    coord = Coordinator({"concurrency": 1}, {}, local=0, listen_addr=addr, remote=1, token="s3cret")
+    done = []
+    t = threading.Thread(target=lambda: done.append(coord.connect()), daemon=True); t.start()
+    for _ in range(50):  # wait for the listener
+        try: bad = hello(addr, "wrong"); break
+        except OSError: t.join(0.05)
+    assert bad.makefile("rb").readline() == b""  # dropped without a word
+    good = hello(addr, "s3cret")
+    t.join(5)
+    assert done == [True] and len(coord.shards) == 1
+    assert json.loads(good.makefile("rb").readline())["op"] == "config"
+    for s in (bad, good): s.close()
+    for sh in coord.shards: sh.chan.close()
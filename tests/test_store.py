@@ -0,0 +1,41 @@
+from hydra_store import ResultStore
+
+def fill(store, n=50):
+    for i in range(n):
+        lat = ((i * 37) % n + 1) / 100  # every latency once, out of order
+        store.add(f"10.0.0.{i}:80", lat, {"country": "TH" if i % 3 else "JP", "country_code": "TH" if i % 3 else "JP",
+                                         "anonymous": i % 2 == 0, "exit_ip": f"1.2.3.{i}", "success_ratio": 1.0})
+    return store
+
+def test_fastest_from_the_top_k():
+    store = fill(ResultStore(top_k=10))
+    lats = [store.latency[i] for i in store.fastest(5)]
+    assert lats == sorted(lats) and lats[0] == 0.01 and len(lats) == 5
+
+def test_fastest_beyond_top_k_sorts_everything():
+    store = fill(ResultStore(top_k=10))
+    all_rows = store.fastest()
+    assert len(all_rows) == 50
+    assert [store.latency[i] for i in all_rows] == sorted(store.latency)
+    assert store.fastest(20) == all_rows[:20]
+
+def test_summaries_kept_while_adding():
+    store = fill(ResultStore())
+    assert store.top_countries(2) == [("TH", 33), ("JP", 17)]
+    assert store.anon_count == 25
+    assert len(store) == 50
+
+def test_row_round_trip():
+    store = ResultStore()
+    store.add("socks5://u:p@10.0.0.1:1080", 0.2, {"country": "Thailand", "country_code": "TH", "anonymous": True,
+                                                  "anon_type": "Elite", "exit_ip": "100.64.0.1", "target_ok": False,
+                                                  "target_status": 403, "amazon_blocked": True, "handshake": 0.05})
+    store.add("10.0.0.2:80", 0.3, {"exit_ip": "2001:db8::1"})
+    p, avg, d = next(iter(store))
+    assert (p, avg) == ("socks5://u:p@10.0.0.1:1080", 0.2)
+    assert d["exit_ip"] == "100.64.0.1" and d["anon_type"] == "Elite" and d["anonymous"] is True
+    assert (d["target_ok"], d["target_status"], d["amazon_blocked"]) == (False, 403, True)
+    assert d["handshake"] == 0.05 and d["latency_p95"] is None
+    d = store.row(1)
+    assert d["exit_ip"] == "2001:db8::1"  # not IPv4: kept on the side
+    assert d["country"] == "Unknown" and d["anonymous"] is None and "amazon_blocked" not in d